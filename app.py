@@ -1,110 +1,364 @@
 """
 API Gateway - Flask
 Roteamento para todas as Lambdas do sistema de agendamento
+
+O app é criado por `create_app()`. Importar este módulo não importa o
+Flask nem as Lambdas, não abre banco, fila ou SNS e não inicia threads:
+    - as Lambdas são importadas na primeira chamada (lambdas.sob_demanda)
+    - o banco abre na primeira operação (db_manager.iniciar)
+    - a fila é criada ao registrar o processador, cujos workers só sobem
+      com a primeira mensagem
+    - o SNS é importado e criado na primeira notificação
+
+Execução:
+    python app.py
+    gunicorn 'app:create_app()' -w 4 --threads 16
 """
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from lambdas.acesso_cliente import handler as acesso_cliente_handler
-from lambdas.define_agendamento import handler as define_agendamento_handler
-from lambdas.valida_agendamento import handler as valida_agendamento_handler
-from lambdas.notificar_atividade_agendamento import handler as notificar_handler
-from queue.sqs_simulator import sqs_queue
+from lambdas import sob_demanda
+from fila import sqs_simulator
+from database import db_manager
+from observabilidade.metricas import registro, CONTENT_TYPE as CONTENT_TYPE_METRICAS
+from observabilidade import log
+from datetime import date, timedelta
+import atexit
 import json
+import signal
+import sys
+import threading
+import time
+
+# Handlers das Lambdas (módulos importados na primeira chamada)
+acesso_cliente_handler = sob_demanda('acesso_cliente')
+define_agendamento_handler = sob_demanda('define_agendamento')
+valida_agendamento_handler = sob_demanda('valida_agendamento')
+valida_agendamento_lote_handler = sob_demanda('valida_agendamento', 'handler_lote')
+notificar_handler = sob_demanda('notificar_atividade_agendamento')
+notificar_lote_handler = sob_demanda('notificar_atividade_agendamento', 'handler_lote')
+importar_clientes_handler = sob_demanda('importacao_lote', 'handler_clientes')
+importar_agendamentos_handler = sob_demanda('importacao_lote', 'handler_agendamentos')
+
+# Paginação das listagens
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
 
-app = Flask(__name__)
-CORS(app)
+# Máximo de dias por consulta de disponibilidade
+DIAS_MAXIMO = 31
+
+_requisicoes = registro.contador(
+    'http_requisicoes_total', 'Requisições atendidas pelo gateway', rotulos=('rota', 'metodo', 'status')
+)
+_duracao_requisicao = registro.histograma(
+    'http_duracao_segundos', 'Duração das requisições no gateway', rotulos=('rota',)
+)
+
+def observar_requisicao(rota, metodo, status, duracao):
+    """Métricas de uma requisição (usada também pelo gateway ASGI)"""
+    _requisicoes.inc(rota=rota, metodo=metodo, status=status)
+    _duracao_requisicao.observar(duracao, rota=rota)
 
 def processar_fila_sqs():
     """Processa mensagens da fila SQS e chama ValidaAgendamento"""
-    def callback(mensagem):
-        # Chama Lambda ValidaAgendamento
-        resultado = valida_agendamento_handler(mensagem)
-        
+    def confirmado(resultado):
+        return resultado['statusCode'] == 200 and resultado['body'].get('success')
+
+    def notificar_se_confirmado(resultado):
         # Se o agendamento foi confirmado, chama NotificarAtividadeAgendamento
-        if resultado['statusCode'] == 200 and resultado['body'].get('success'):
+        if confirmado(resultado):
             dados_agendamento = {
                 'dados': resultado['body'].get('dados')
             }
             notificar_handler(dados_agendamento)
+
+    def falhou(resultado):
+        # Erro ao gravar (500): a mensagem não é confirmada e a fila a reentrega
+        return resultado['statusCode'] >= 500
+
+    def callback(mensagem):
+        # Chama Lambda ValidaAgendamento
+        resultado = valida_agendamento_handler(mensagem)
+        if falhou(resultado):
+            raise RuntimeError(resultado['body'].get('message'))
+        notificar_se_confirmado(resultado)
+
+    def callback_lote(mensagens):
+        # Valida o lote inteiro com uma única escrita no banco e notifica
+        # os confirmados de uma vez
+        resultados = valida_agendamento_lote_handler(mensagens)
+        eventos = [
+            {'dados': resultado['body'].get('dados')}
+            for resultado in resultados
+            if confirmado(resultado)
+        ]
+        if eventos:
+            notificar_lote_handler(eventos)
+        # Posições das mensagens que falharam (não confirmadas na fila)
+        return [posicao for posicao, resultado in enumerate(resultados) if falhou(resultado)]
     
-    # Inicia o processador da fila
-    sqs_queue.start_processor(callback)
+    # Registra o processador da fila (os workers sobem com a primeira mensagem)
+    sqs_simulator.obter_fila().start_processor(callback, batch_callback=callback_lote, sob_demanda=True)
 
-# Inicia o processador da fila ao iniciar a aplicação
-processar_fila_sqs()
+def encerrar_aplicacao():
+    """Para o processador da fila, grava as escritas pendentes, entrega as notificações (e os resumos) e esvazia o log"""
+    if sqs_simulator.fila_criada():
+        sqs_simulator.obter_fila().stop_processor()
+    db_manager.flush()
+    # O SNS só existe se alguma Lambda de notificação foi carregada
+    sns_simulator = sys.modules.get('sns.sns_simulator')
+    if sns_simulator is not None:
+        sns_simulator.encerrar(timeout=5)
+    log.flush()
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Endpoint de health check"""
-    return jsonify({'status': 'ok', 'message': 'API Gateway funcionando'}), 200
+_iniciada = False
+_lock_inicio = threading.RLock()
 
-@app.route('/cliente/acesso', methods=['POST'])
-def acesso_cliente():
-    """
-    Endpoint: AcessoCliente Lambda
-    Cria ou verifica acesso do cliente
-    """
+def iniciar_aplicacao():
+    """Registra o processador da fila e o encerramento (usada por create_app e pelo gateway ASGI)"""
+    global _iniciada
+    if _iniciada:
+        return
+    with _lock_inicio:
+        if _iniciada:
+            return
+        processar_fila_sqs()
+        atexit.register(encerrar_aplicacao)
+        _iniciada = True
+
+# Lógica das rotas independente do framework: recebe os dados já lidos da
+# requisição e devolve (corpo, status). Usada por este app Flask e pelo
+# gateway assíncrono (asgi.py)
+
+def chamar_lambda(handler, ler_dados):
+    """Lê o corpo com ler_dados() e chama a Lambda"""
     try:
-        dados = request.get_json()
-        resultado = acesso_cliente_handler(dados)
-        return jsonify(resultado['body']), resultado['statusCode']
+        resultado = handler(ler_dados())
+        return resultado['body'], resultado['statusCode']
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'message': f'Erro no gateway: {str(e)}'
-        }), 500
+        }, 500
 
-@app.route('/agendamento/definir', methods=['POST'])
-def definir_agendamento():
+def com_chave_idempotencia(dados, chave):
+    """Repassa o cabeçalho Idempotency-Key para a Lambda (o corpo tem precedência)"""
+    if chave and isinstance(dados, dict):
+        dados.setdefault('idempotency_key', chave)
+    return dados
+
+def _ler_paginacao(args):
+    """Lê limite e cursor da query string (ValueError se inválidos)"""
+    limite = int(args.get('limite', LIMITE_PADRAO))
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise ValueError(f'limite deve estar entre 1 e {LIMITE_MAXIMO}')
+    cursor = args.get('cursor')
+    return limite, int(cursor) if cursor else None
+
+def filtros_agendamento(args):
+    return {
+        campo: args.get(campo)
+        for campo in ('barbeiro', 'data_inicio', 'data_fim', 'cliente_email')
+    }
+
+def listar(chave, iterar, filtros, args):
     """
-    Endpoint: DefineAgendamento Lambda
-    Define um agendamento e envia para a fila
+    Lista paginada por cursor ou, com formato=ndjson, em streaming
+
+    Com formato=ndjson o corpo é um gerador de linhas (um documento JSON por linha)
     """
     try:
-        dados = request.get_json()
-        resultado = define_agendamento_handler(dados)
-        return jsonify(resultado['body']), resultado['statusCode']
-    except Exception as e:
-        return jsonify({
+        if args.get('formato') == 'ndjson':
+            cursor = args.get('cursor')
+            iterador = iterar(cursor=int(cursor) if cursor else None, **filtros)
+            return (json.dumps(documento, ensure_ascii=False) + '\n' for documento in iterador), 200
+
+        limite, cursor = _ler_paginacao(args)
+    except ValueError as e:
+        return {
             'success': False,
-            'message': f'Erro no gateway: {str(e)}'
-        }), 500
+            'message': f'Parâmetros inválidos: {str(e)}'
+        }, 400
 
-@app.route('/agendamento/listar', methods=['GET'])
-def listar_agendamentos():
-    """
-    Endpoint auxiliar para listar agendamentos
-    """
     try:
-        from database.db_manager import db_agendamentos
-        agendamentos = db_agendamentos.all()
-        return jsonify({
+        itens, proximo_cursor = db_manager.paginar(iterar(cursor=cursor, **filtros), limite)
+        return {
             'success': True,
-            'agendamentos': agendamentos
-        }), 200
+            chave: itens,
+            'proximo_cursor': proximo_cursor
+        }, 200
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'message': f'Erro ao listar: {str(e)}'
-        }), 500
+        }, 500
 
-@app.route('/cliente/listar', methods=['GET'])
-def listar_clientes():
-    """
-    Endpoint auxiliar para listar clientes
-    """
+def consultar_disponibilidade(args):
+    """Horários livres por barbeiro e data (ver /agendamento/disponiveis)"""
     try:
-        from database.db_manager import db_clientes
-        clientes = db_clientes.all()
-        return jsonify({
+        inicio = date.fromisoformat(args.get('data', ''))
+        dias = int(args.get('dias', 1))
+        if not 1 <= dias <= DIAS_MAXIMO:
+            raise ValueError(f'dias deve estar entre 1 e {DIAS_MAXIMO}')
+    except ValueError as e:
+        return {
+            'success': False,
+            'message': f'Parâmetros inválidos: {str(e)}'
+        }, 400
+
+    try:
+        barbeiros = args.get('barbeiro')
+        barbeiros = barbeiros.split(',') if barbeiros else db_manager.listar_barbeiros()
+        datas = [(inicio + timedelta(days=i)).isoformat() for i in range(dias)]
+
+        disponibilidade = {
+            barbeiro: {data: db_manager.get_horarios_disponiveis(barbeiro, data) for data in datas}
+            for barbeiro in barbeiros
+        }
+        return {
             'success': True,
-            'clientes': clientes
-        }), 200
+            'disponibilidade': disponibilidade
+        }, 200
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
-            'message': f'Erro ao listar: {str(e)}'
-        }), 500
+            'message': f'Erro ao consultar: {str(e)}'
+        }, 500
+
+def status_health():
+    return {
+        'status': 'ok',
+        'message': 'API Gateway funcionando',
+        'cache_clientes': db_manager.estatisticas_cache_clientes()
+    }
+
+def create_app():
+    """
+    Cria o app Flask com as rotas do gateway
+
+    O Flask só é importado aqui; banco, fila e Lambdas continuam sendo
+    abertos sob demanda (ver o início do módulo)
+    """
+    from flask import Flask, Response, g, request, jsonify, stream_with_context
+    from flask_cors import CORS
+
+    app = Flask(__name__)
+    CORS(app)
+
+    @app.before_request
+    def _iniciar_cronometro():
+        g.inicio_requisicao = time.perf_counter()
+
+    @app.after_request
+    def _registrar_metricas(resposta):
+        rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+        observar_requisicao(rota, request.method, resposta.status_code,
+                            time.perf_counter() - g.inicio_requisicao)
+        return resposta
+
+    def _responder(corpo, status):
+        """Converte (corpo, status) na resposta do Flask"""
+        if isinstance(corpo, dict):
+            return jsonify(corpo), status
+        return Response(stream_with_context(corpo), mimetype='application/x-ndjson')
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        """Endpoint de health check (inclui as estatísticas do cache de clientes)"""
+        return jsonify(status_health()), 200
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Métricas no formato texto do Prometheus"""
+        return Response(registro.exportar(), content_type=CONTENT_TYPE_METRICAS)
+
+    @app.route('/cliente/acesso', methods=['POST'])
+    def acesso_cliente():
+        """
+        Endpoint: AcessoCliente Lambda
+        Cria ou verifica acesso do cliente
+        """
+        return _responder(*chamar_lambda(acesso_cliente_handler, request.get_json))
+
+    @app.route('/cliente/bulk', methods=['POST'])
+    def importar_clientes():
+        """
+        Endpoint: ImportacaoLote Lambda
+        Cadastra uma lista de clientes ({"clientes": [...]}) com uma única escrita
+        no banco; o resultado traz o status de cada linha
+        """
+        return _responder(*chamar_lambda(importar_clientes_handler, request.get_json))
+
+    @app.route('/agendamento/definir', methods=['POST'])
+    def definir_agendamento():
+        """
+        Endpoint: DefineAgendamento Lambda
+        Define um agendamento e envia para a fila
+
+        Cabeçalho opcional Idempotency-Key: repetições com a mesma chave nos
+        últimos 5 minutos recebem a resposta original (a chave é do cliente;
+        reutilizada com outro pedido retorna 422)
+        """
+        def ler_dados():
+            return com_chave_idempotencia(request.get_json(), request.headers.get('Idempotency-Key'))
+        return _responder(*chamar_lambda(define_agendamento_handler, ler_dados))
+
+    @app.route('/agendamento/bulk', methods=['POST'])
+    def importar_agendamentos():
+        """
+        Endpoint: ImportacaoLote Lambda
+        Grava uma lista de agendamentos já confirmados ({"agendamentos": [...]})
+        direto no banco, sem fila e sem notificação
+        """
+        return _responder(*chamar_lambda(importar_agendamentos_handler, request.get_json))
+
+    @app.route('/agendamento/listar', methods=['GET'])
+    def listar_agendamentos():
+        """
+        Endpoint auxiliar para listar agendamentos
+
+        Query string:
+            limite (padrão 100, máx 1000), cursor (proximo_cursor da página anterior),
+            barbeiro, data_inicio, data_fim, cliente_email,
+            formato=ndjson (streaming de todos os resultados)
+        """
+        filtros = filtros_agendamento(request.args)
+        return _responder(*listar('agendamentos', db_manager.iterar_agendamentos, filtros, request.args))
+
+    @app.route('/cliente/listar', methods=['GET'])
+    def listar_clientes():
+        """
+        Endpoint auxiliar para listar clientes
+
+        Query string: limite, cursor e formato=ndjson (como em /agendamento/listar)
+        """
+        return _responder(*listar('clientes', db_manager.iterar_clientes, {}, request.args))
+
+    @app.route('/agendamento/disponiveis', methods=['GET'])
+    def horarios_disponiveis():
+        """
+        Endpoint auxiliar com os horários livres por barbeiro e data
+
+        Query string:
+            data: YYYY-MM-DD (obrigatório, primeiro dia da consulta)
+            dias: quantidade de dias a partir de data (padrão 1, máx 31)
+            barbeiro: um ou mais barbeiros separados por vírgula
+                (padrão: todos os que já têm agendamentos)
+        """
+        return _responder(*consultar_disponibilidade(request.args))
+
+    iniciar_aplicacao()
+    return app
+
+_app = None
+
+def __getattr__(nome):
+    # `app:app` (gunicorn, flask run, benchmarks) continua funcionando: o app
+    # é criado no primeiro acesso
+    global _app
+    if nome == 'app':
+        with _lock_inicio:
+            if _app is None:
+                _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
 
 if __name__ == '__main__':
     print("="*60)
@@ -112,11 +366,18 @@ if __name__ == '__main__':
     print("="*60)
     print("\nEndpoints disponíveis:")
     print("  POST /cliente/acesso - Criar/verificar acesso do cliente")
+    print("  POST /cliente/bulk - Importar clientes em lote")
     print("  POST /agendamento/definir - Definir agendamento")
-    print("  GET  /agendamento/listar - Listar agendamentos")
-    print("  GET  /cliente/listar - Listar clientes")
+    print("  POST /agendamento/bulk - Importar agendamentos em lote")
+    print("  GET  /agendamento/listar - Listar agendamentos (paginado)")
+    print("  GET  /cliente/listar - Listar clientes (paginado)")
+    print("  GET  /agendamento/disponiveis - Horários livres por barbeiro e data")
     print("  GET  /health - Health check")
+    print("  GET  /metrics - Métricas (Prometheus)")
     print("\n" + "="*60 + "\n")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # SIGTERM encerra via sys.exit para que os hooks do atexit rodem
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,299 @@
+"""
+API Gateway assíncrono (ASGI)
+Serve as mesmas rotas de app.py em um event loop. As Lambdas, o banco e a
+fila são síncronos, então cada chamada roda em um pool de threads e o loop
+fica livre para aceitar outras conexões enquanto elas esperam
+
+Não depende do Flask: importar este módulo só carrega a lógica das rotas
+de app.py (as Lambdas, o banco e a fila abrem sob demanda)
+
+Execução (um processo por worker):
+    uvicorn asgi:app --workers 4
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker -w 4
+"""
+from app import (
+    acesso_cliente_handler, define_agendamento_handler, importar_clientes_handler,
+    importar_agendamentos_handler, chamar_lambda, com_chave_idempotencia,
+    listar, status_health, filtros_agendamento, consultar_disponibilidade, iniciar_aplicacao,
+    encerrar_aplicacao, observar_requisicao
+)
+from database import db_manager
+from observabilidade.metricas import registro, CONTENT_TYPE as CONTENT_TYPE_METRICAS
+from observabilidade.log import obter_logger
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+import asyncio
+import json
+import os
+import time
+
+# Threads que executam as chamadas bloqueantes (Lambdas, banco, fila)
+THREADS_EXECUTOR = int(os.environ.get('GATEWAY_THREADS', 64))
+
+# Tamanho máximo do corpo de uma requisição (bytes); maior nas importações em lote
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+TAMANHO_MAXIMO_CORPO_LOTE = 32 * 1024 * 1024
+
+# Linhas NDJSON geradas por ida à thread do streaming
+LINHAS_POR_BLOCO = 500
+
+log = obter_logger('gateway')
+
+_executor = ThreadPoolExecutor(max_workers=THREADS_EXECUTOR, thread_name_prefix='gateway')
+
+CABECALHOS_CORS = [(b'access-control-allow-origin', b'*')]
+
+
+async def _em_executor(funcao, *args):
+    """Executa uma função bloqueante no pool sem travar o event loop"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, funcao, *args)
+
+
+# Rotas: cada uma recebe (args, cabecalhos, corpo) e devolve (corpo da resposta, status)
+
+async def _health(args, cabecalhos, corpo):
+    return status_health(), 200
+
+async def _metrics(args, cabecalhos, corpo):
+    return registro.exportar(), 200
+
+async def _acesso_cliente(args, cabecalhos, corpo):
+    return await _em_executor(chamar_lambda, acesso_cliente_handler, lambda: json.loads(corpo))
+
+async def _definir_agendamento(args, cabecalhos, corpo):
+    chave = cabecalhos.get(b'idempotency-key', b'').decode('latin-1')
+    return await _em_executor(
+        chamar_lambda, define_agendamento_handler,
+        lambda: com_chave_idempotencia(json.loads(corpo), chave)
+    )
+
+async def _importar_clientes(args, cabecalhos, corpo):
+    return await _em_executor(chamar_lambda, importar_clientes_handler, lambda: json.loads(corpo))
+
+async def _importar_agendamentos(args, cabecalhos, corpo):
+    return await _em_executor(chamar_lambda, importar_agendamentos_handler, lambda: json.loads(corpo))
+
+async def _listar_agendamentos(args, cabecalhos, corpo):
+    return await _em_executor(
+        listar, 'agendamentos', db_manager.iterar_agendamentos, filtros_agendamento(args), args
+    )
+
+async def _listar_clientes(args, cabecalhos, corpo):
+    return await _em_executor(listar, 'clientes', db_manager.iterar_clientes, {}, args)
+
+async def _horarios_disponiveis(args, cabecalhos, corpo):
+    return await _em_executor(consultar_disponibilidade, args)
+
+ROTAS = {
+    '/health': ('GET', _health),
+    '/metrics': ('GET', _metrics),
+    '/cliente/acesso': ('POST', _acesso_cliente),
+    '/cliente/bulk': ('POST', _importar_clientes),
+    '/agendamento/definir': ('POST', _definir_agendamento),
+    '/agendamento/bulk': ('POST', _importar_agendamentos),
+    '/agendamento/listar': ('GET', _listar_agendamentos),
+    '/cliente/listar': ('GET', _listar_clientes),
+    '/agendamento/disponiveis': ('GET', _horarios_disponiveis),
+}
+
+ROTAS_LOTE = {'/cliente/bulk', '/agendamento/bulk'}
+
+
+def _ler_query_string(scope):
+    """Query string como dict (primeiro valor de cada parâmetro, como request.args.get)"""
+    args = {}
+    for chave, valor in parse_qsl(scope.get('query_string', b'').decode('utf-8'), keep_blank_values=True):
+        args.setdefault(chave, valor)
+    return args
+
+
+async def _ler_corpo(receive, tamanho_maximo=TAMANHO_MAXIMO_CORPO):
+    """Lê o corpo completo; None se o cliente desconectou (ValueError se excedeu o tamanho máximo)"""
+    partes = []
+    tamanho = 0
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'http.disconnect':
+            return None
+        parte = mensagem.get('body', b'')
+        tamanho += len(parte)
+        if tamanho > tamanho_maximo:
+            raise ValueError(f'Corpo da requisição excede {tamanho_maximo} bytes')
+        partes.append(parte)
+        if not mensagem.get('more_body'):
+            return b''.join(partes)
+
+
+async def _enviar_json(send, corpo, status, cabecalhos=()):
+    dados = json.dumps(corpo).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(dados)).encode()),
+            *CABECALHOS_CORS,
+            *cabecalhos
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': dados})
+
+
+async def _enviar_texto(send, texto, content_type):
+    dados = texto.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', content_type.encode()),
+            (b'content-length', str(len(dados)).encode()),
+            *CABECALHOS_CORS
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': dados})
+
+
+def _proximo_bloco(linhas):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            break
+    return bloco
+
+
+async def _enviar_ndjson(send, linhas):
+    """
+    Streaming NDJSON; o gerador é consumido em blocos por uma thread só dele
+
+    Todos os next() (e o close) rodam na mesma thread: o cursor do SQLite
+    pertence à conexão da thread que o abriu. Se o gerador falhar no meio,
+    a exceção sobe sem o fechamento do corpo e o servidor corta a conexão,
+    para o cliente não tomar a lista truncada como completa.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gateway-ndjson')
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson'), *CABECALHOS_CORS]
+    })
+    try:
+        while True:
+            bloco = await loop.run_in_executor(executor, _proximo_bloco, linhas)
+            if not bloco:
+                break
+            await send({
+                'type': 'http.response.body',
+                'body': ''.join(bloco).encode('utf-8'),
+                'more_body': True
+            })
+    finally:
+        await loop.run_in_executor(executor, linhas.close)
+        executor.shutdown(wait=False)
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem['type'] == 'lifespan.startup':
+            iniciar_aplicacao()
+            await send({'type': 'lifespan.startup.complete'})
+        elif mensagem['type'] == 'lifespan.shutdown':
+            # Mesmo encerramento do app Flask (fila, banco e notificações)
+            await _em_executor(encerrar_aplicacao)
+            _executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _despachar(scope, receive, send, metodo, cabecalhos):
+    """Encaminha a requisição HTTP para a rota"""
+    if metodo == 'OPTIONS':
+        # Preflight de CORS (o app Flask usa flask_cors)
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                *CABECALHOS_CORS,
+                (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+                (b'access-control-allow-headers', cabecalhos.get(b'access-control-request-headers', b'*')),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    rota = ROTAS.get(scope['path'])
+    if rota is None:
+        await _enviar_json(send, {'success': False, 'message': 'Rota não encontrada'}, 404)
+        return
+    metodo_rota, funcao = rota
+    if metodo != metodo_rota:
+        await _enviar_json(send, {'success': False, 'message': 'Método não permitido'}, 405,
+                           [(b'allow', metodo_rota.encode())])
+        return
+
+    try:
+        tamanho_maximo = TAMANHO_MAXIMO_CORPO_LOTE if scope['path'] in ROTAS_LOTE else TAMANHO_MAXIMO_CORPO
+        corpo = await _ler_corpo(receive, tamanho_maximo)
+    except ValueError as e:
+        await _enviar_json(send, {'success': False, 'message': str(e)}, 413)
+        return
+    if corpo is None:
+        return
+
+    resposta, status = await funcao(_ler_query_string(scope), cabecalhos, corpo)
+    if isinstance(resposta, dict):
+        await _enviar_json(send, resposta, status)
+    elif isinstance(resposta, str):
+        await _enviar_texto(send, resposta, CONTENT_TYPE_METRICAS)
+    else:
+        await _enviar_ndjson(send, resposta)
+
+
+async def app(scope, receive, send):
+    """Aplicação ASGI"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    # Servidores sem lifespan: registra o processador da fila na primeira requisição
+    iniciar_aplicacao()
+
+    metodo = scope['method']
+    inicio = time.perf_counter()
+    # Status da resposta iniciada (None enquanto nada foi enviado)
+    enviado = {'status': None}
+
+    async def enviar(mensagem):
+        if mensagem['type'] == 'http.response.start':
+            enviado['status'] = mensagem['status']
+        await send(mensagem)
+
+    status = None
+    try:
+        await _despachar(scope, receive, enviar, metodo, dict(scope.get('headers', [])))
+        status = enviado['status']
+    except Exception as e:
+        status = 500
+        log.error('erro ao atender requisição', rota=scope['path'], metodo=metodo, exc_info=e)
+        if enviado['status'] is not None:
+            # Resposta já iniciada (streaming): só resta abortar a conexão
+            raise
+        await _enviar_json(send, {'success': False, 'message': f'Erro no gateway: {str(e)}'}, 500)
+    finally:
+        if status is not None:
+            rota = scope['path'] if scope['path'] in ROTAS else 'desconhecida'
+            observar_requisicao(rota, metodo, status, time.perf_counter() - inicio)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Instale o uvicorn para executar o gateway ASGI: pip install uvicorn")
+
+    uvicorn.run('asgi:app', host='0.0.0.0', port=int(os.environ.get('PORT', 8000)),
+                workers=int(os.environ.get('GATEWAY_WORKERS', 1)))
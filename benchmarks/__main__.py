@@ -0,0 +1,5 @@
+"""Atalho: python -m benchmarks (ver benchmarks/executar.py)"""
+from benchmarks.executar import main
+import sys
+
+sys.exit(main())
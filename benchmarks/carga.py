@@ -0,0 +1,78 @@
+"""
+Geração de cargas sintéticas para os benchmarks
+Clientes, barbeiros e pedidos de agendamento reprodutíveis (semente fixa)
+"""
+from database.ocupacao import HORARIOS
+from datetime import date, timedelta
+import math
+import random
+
+DATA_INICIAL = date(2030, 1, 1)
+
+
+def gerar_clientes(quantidade):
+    """Eventos de /cliente/acesso"""
+    return [
+        {
+            'nome': f'Cliente{indice}',
+            'sobrenome': 'Benchmark',
+            'email': f'cliente{indice}@benchmark.local',
+            'celular': f'119{indice:08d}'
+        }
+        for indice in range(quantidade)
+    ]
+
+
+def gerar_pedidos(clientes, barbeiros, pedidos, hotspot=0.0, conflito=0.0, semente=42):
+    """
+    Eventos de /agendamento/definir
+
+    Args:
+        clientes: lista de eventos de gerar_clientes
+        barbeiros: quantidade de barbeiros
+        pedidos: quantidade de pedidos
+        hotspot: fração dos pedidos concentrada no primeiro barbeiro e dia
+            (os horários livres do hotspot acabam rápido e o resto vira conflito)
+        conflito: fração dos pedidos que repete um horário já pedido por
+            outro cliente (deve ser rejeitado com 409)
+        semente: semente do gerador aleatório
+
+    Returns:
+        list: eventos com cliente_email, barbeiro, data e horario
+    """
+    aleatorio = random.Random(semente)
+    nomes = [f'Barbeiro{indice}' for indice in range(barbeiros)]
+    # Dias suficientes para que os pedidos sem conflito tenham horário livre
+    dias = max(1, math.ceil(pedidos / (barbeiros * len(HORARIOS))) + 1)
+    hotspot_data = DATA_INICIAL.isoformat()
+    livres = [
+        (barbeiro, (DATA_INICIAL + timedelta(days=dia)).isoformat(), horario)
+        for barbeiro in nomes for dia in range(dias) for horario in HORARIOS
+    ]
+    # O dia do hotspot fica fora do sorteio dos pedidos comuns
+    livres = [slot for slot in livres if (slot[0], slot[1]) != (nomes[0], hotspot_data)]
+    aleatorio.shuffle(livres)
+
+    eventos = []
+    pedidos_por_slot = {}
+    for _ in range(pedidos):
+        sorteio = aleatorio.random()
+        if eventos and sorteio < conflito:
+            slot = aleatorio.choice(eventos)
+            slot = (slot['barbeiro'], slot['data'], slot['horario'])
+        elif sorteio < conflito + hotspot:
+            slot = (nomes[0], hotspot_data, aleatorio.choice(HORARIOS))
+        else:
+            slot = livres.pop()
+
+        # Cliente diferente dos que já pediram o horário (não é um retry idempotente)
+        ja_pediram = pedidos_por_slot.setdefault(slot, set())
+        cliente = aleatorio.choice(clientes)['email']
+        if len(ja_pediram) < len(clientes):
+            while cliente in ja_pediram:
+                cliente = aleatorio.choice(clientes)['email']
+        ja_pediram.add(cliente)
+
+        barbeiro, data, horario = slot
+        eventos.append({'cliente_email': cliente, 'barbeiro': barbeiro, 'data': data, 'horario': horario})
+    return eventos
@@ -0,0 +1,387 @@
+"""
+Benchmark do fluxo de agendamento, sem servidor e sem rede
+
+Cada cenário roda em um processo próprio, dentro de um diretório temporário
+(os bancos e a fila começam vazios): cadastra os clientes, dispara os
+pedidos de agendamento por várias threads e espera a fila processar tudo.
+
+Mede, por pedido, o tempo desde o envio até:
+    enfileirado - resposta do DefineAgendamento (pedido aceito na fila)
+    validado    - resposta do ValidaAgendamento (confirmado ou conflito)
+    notificado  - NotificarAtividadeAgendamento publicou no SNS (confirmados)
+
+Uso:
+    python -m benchmarks                          # todos os cenários
+    python -m benchmarks --cenario hotspot --modo http
+    python -m benchmarks --salvar benchmarks/baseline.json
+    python -m benchmarks --comparar benchmarks/baseline.json --tolerancia 0.2
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CENARIOS = {
+    'padrao': {'clientes': 200, 'barbeiros': 10, 'pedidos': 2000, 'hotspot': 0.0, 'conflito': 0.0},
+    'conflitos': {'clientes': 200, 'barbeiros': 10, 'pedidos': 2000, 'hotspot': 0.0, 'conflito': 0.3},
+    'hotspot': {'clientes': 200, 'barbeiros': 10, 'pedidos': 2000, 'hotspot': 0.5, 'conflito': 0.0},
+    'muitos_clientes': {'clientes': 5000, 'barbeiros': 50, 'pedidos': 5000, 'hotspot': 0.1, 'conflito': 0.1},
+}
+
+ETAPAS = ('enfileirado', 'validado', 'notificado')
+
+# Tempo máximo de espera pelo processamento da fila (s)
+TIMEOUT_PROCESSAMENTO = 300
+
+
+def percentil(valores, p):
+    """Percentil pelo método nearest-rank (valores já ordenados)"""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def resumir(latencias):
+    """Contagem e p50/p95/p99/máx em milissegundos"""
+    valores = sorted(latencias)
+    resumo = {'quantidade': len(valores)}
+    for p in (50, 95, 99):
+        valor = percentil(valores, p)
+        resumo[f'p{p}_ms'] = round(valor * 1000, 3) if valor is not None else None
+    resumo['max_ms'] = round(valores[-1] * 1000, 3) if valores else None
+    return resumo
+
+
+def _chave(dados):
+    return (dados.get('cliente_email'), dados.get('barbeiro'), dados.get('data'), dados.get('horario'))
+
+
+class Medidor:
+    """Timestamps de cada pedido por etapa, registrados pelos handlers instrumentados"""
+
+    def __init__(self):
+        self.envio = {}
+        self.etapas = {etapa: {} for etapa in ETAPAS}
+        self.confirmados = 0
+        self.conflitos = 0
+        self.erros = 0
+        self._validados = 0
+        self._notificados = 0
+        self._condicao = threading.Condition()
+
+    def marcar(self, etapa, dados):
+        self.etapas[etapa][_chave(dados)] = time.perf_counter()
+
+    def validado(self, dados, resultado):
+        self.marcar('validado', dados)
+        with self._condicao:
+            if resultado['statusCode'] == 200:
+                self.confirmados += 1
+            elif resultado['statusCode'] == 409:
+                self.conflitos += 1
+            else:
+                self.erros += 1
+            self._validados += 1
+            self._condicao.notify_all()
+
+    def notificado(self, dados):
+        self.marcar('notificado', dados)
+        with self._condicao:
+            self._notificados += 1
+            self._condicao.notify_all()
+
+    def esperar_validacao(self, quantidade, timeout):
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self._validados >= quantidade, timeout)
+
+    def esperar_notificacao(self, timeout):
+        """Espera a notificação de todos os confirmados (chamar depois de esperar_validacao)"""
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self._notificados >= self.confirmados, timeout)
+
+    def latencias(self, etapa):
+        return [
+            instante - self.envio[chave]
+            for chave, instante in self.etapas[etapa].items()
+            if chave in self.envio
+        ]
+
+
+def _instrumentar(app_module, medidor):
+    """Envolve os handlers que o processador da fila chama (globais de app.py)"""
+    valida = app_module.valida_agendamento_handler
+    valida_lote = app_module.valida_agendamento_lote_handler
+    notificar = app_module.notificar_handler
+    notificar_lote = app_module.notificar_lote_handler
+
+    def dados_de(mensagem):
+        return json.loads(mensagem) if isinstance(mensagem, str) else mensagem
+
+    def valida_medido(mensagem):
+        resultado = valida(mensagem)
+        medidor.validado(dados_de(mensagem), resultado)
+        return resultado
+
+    def valida_lote_medido(mensagens):
+        resultados = valida_lote(mensagens)
+        for mensagem, resultado in zip(mensagens, resultados):
+            medidor.validado(dados_de(mensagem), resultado)
+        return resultados
+
+    def notificar_medido(evento):
+        resultado = notificar(evento)
+        medidor.notificado(evento.get('dados', {}))
+        return resultado
+
+    def notificar_lote_medido(eventos):
+        resultados = notificar_lote(eventos)
+        for evento in eventos:
+            medidor.notificado(evento.get('dados', {}))
+        return resultados
+
+    app_module.valida_agendamento_handler = valida_medido
+    app_module.valida_agendamento_lote_handler = valida_lote_medido
+    app_module.notificar_handler = notificar_medido
+    app_module.notificar_lote_handler = notificar_lote_medido
+
+
+def executar_cenario(config):
+    """
+    Roda um cenário no processo atual (que deve estar no diretório temporário)
+
+    Returns:
+        dict: configuração, vazão, latências por etapa e memória
+    """
+    # Importados aqui: os módulos abrem os bancos relativos ao diretório atual
+    import app as app_module
+    from benchmarks.carga import gerar_clientes, gerar_pedidos
+    from sns.sns_simulator import obter_notificador
+
+    medidor = Medidor()
+    _instrumentar(app_module, medidor)
+    # Registra o processador da fila (no modo http, create_app também registraria)
+    app_module.iniciar_aplicacao()
+
+    clientes = gerar_clientes(config['clientes'])
+    pedidos = gerar_pedidos(
+        clientes, config['barbeiros'], config['pedidos'],
+        hotspot=config['hotspot'], conflito=config['conflito'], semente=config['semente']
+    )
+
+    if config['modo'] == 'http':
+        cliente_http = app_module.app.test_client()
+
+        def cadastrar(evento):
+            return cliente_http.post('/cliente/acesso', json=evento).status_code
+
+        def definir(evento):
+            return cliente_http.post('/agendamento/definir', json=evento).status_code
+    else:
+        def cadastrar(evento):
+            return app_module.acesso_cliente_handler(evento)['statusCode']
+
+        def definir(evento):
+            return app_module.define_agendamento_handler(evento)['statusCode']
+
+    def enviar(evento):
+        chave = _chave(evento)
+        medidor.envio[chave] = time.perf_counter()
+        status = definir(evento)
+        if status == 200:
+            medidor.marcar('enfileirado', evento)
+        return status
+
+    if config['tracemalloc']:
+        tracemalloc.start()
+    memoria_inicial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with ThreadPoolExecutor(max_workers=config['concorrencia']) as executor:
+        inicio = time.perf_counter()
+        list(executor.map(cadastrar, clientes))
+        fim_cadastro = time.perf_counter()
+
+        inicio_pedidos = time.perf_counter()
+        status = list(executor.map(enviar, pedidos))
+    enfileirados = status.count(200)
+
+    concluido = (medidor.esperar_validacao(enfileirados, TIMEOUT_PROCESSAMENTO)
+                 and medidor.esperar_notificacao(TIMEOUT_PROCESSAMENTO))
+    obter_notificador().flush(timeout=TIMEOUT_PROCESSAMENTO)
+    fim = time.perf_counter()
+
+    resultado = {
+        'config': config,
+        'concluido': concluido,
+        'cadastro': {
+            'clientes': len(clientes),
+            'duracao_s': round(fim_cadastro - inicio, 4),
+            'vazao_por_s': round(len(clientes) / (fim_cadastro - inicio), 1)
+        },
+        'pedidos': {
+            'enviados': len(pedidos),
+            'enfileirados': enfileirados,
+            'confirmados': medidor.confirmados,
+            'conflitos': medidor.conflitos,
+            'erros': medidor.erros,
+            'duracao_s': round(fim - inicio_pedidos, 4),
+            'vazao_por_s': round(len(pedidos) / (fim - inicio_pedidos), 1)
+        },
+        'latencia': {etapa: resumir(medidor.latencias(etapa)) for etapa in ETAPAS},
+        'memoria': {
+            'max_rss_kb_crescimento': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memoria_inicial
+        }
+    }
+    if config['tracemalloc']:
+        atual, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultado['memoria'].update({'tracemalloc_atual_kb': atual // 1024, 'tracemalloc_pico_kb': pico // 1024})
+
+    app_module.encerrar_aplicacao()
+    return resultado
+
+
+def _executar_isolado(config):
+    """Roda o cenário em um processo novo, dentro de um diretório temporário"""
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as diretorio:
+        saida = os.path.join(diretorio, 'resultado.json')
+        ambiente = dict(os.environ, PYTHONPATH=RAIZ + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        # Segmentos do log de notificações também ficam no diretório temporário
+        ambiente['SNS_LOG_DIR'] = os.path.join(diretorio, 'notificacoes')
+        if config['backend']:
+            ambiente['DB_BACKEND'] = config['backend']
+        if config['fila']:
+            ambiente['SQS_BACKEND'] = config['fila']
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.executar', '--interno', json.dumps(config), '--saida', saida],
+            cwd=diretorio, env=ambiente, check=True
+        )
+        with open(saida, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+
+
+def comparar(atual, baseline, tolerancia):
+    """
+    Regressões em relação ao baseline: vazão menor ou p95/p99 maiores que a tolerância
+
+    Returns:
+        list: descrições das regressões encontradas
+    """
+    regressoes = []
+    for nome, resultado in atual.items():
+        referencia = baseline.get(nome)
+        if referencia is None:
+            continue
+        if referencia['config'] != resultado['config']:
+            print(f"[{nome}] configuração diferente da do baseline, comparação ignorada")
+            continue
+
+        vazao, vazao_ref = resultado['pedidos']['vazao_por_s'], referencia['pedidos']['vazao_por_s']
+        if vazao < vazao_ref * (1 - tolerancia):
+            regressoes.append(f"{nome}: vazão {vazao}/s < baseline {vazao_ref}/s")
+
+        for etapa in ETAPAS:
+            for medida in ('p95_ms', 'p99_ms'):
+                valor = resultado['latencia'][etapa][medida]
+                valor_ref = referencia['latencia'].get(etapa, {}).get(medida)
+                if valor is not None and valor_ref and valor > valor_ref * (1 + tolerancia):
+                    regressoes.append(f"{nome}: {etapa} {medida} {valor} > baseline {valor_ref}")
+    return regressoes
+
+
+def _imprimir(nome, resultado):
+    pedidos = resultado['pedidos']
+    print(f"\n[{nome}] {resultado['config']['modo']} - {pedidos['enviados']} pedidos "
+          f"({pedidos['confirmados']} confirmados, {pedidos['conflitos']} conflitos, {pedidos['erros']} erros)")
+    print(f"  cadastro: {resultado['cadastro']['vazao_por_s']} clientes/s")
+    print(f"  pedidos:  {pedidos['vazao_por_s']} pedidos/s ({pedidos['duracao_s']}s)")
+    for etapa, resumo in resultado['latencia'].items():
+        print(f"  {etapa:<12} p50={resumo['p50_ms']}ms p95={resumo['p95_ms']}ms "
+              f"p99={resumo['p99_ms']}ms max={resumo['max_ms']}ms (n={resumo['quantidade']})")
+    print(f"  memória:  {resultado['memoria']}")
+    if not resultado['concluido']:
+        print("  ATENÇÃO: a fila não terminou de processar dentro do timeout")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline do fluxo de agendamento')
+    parser.add_argument('--cenario', choices=sorted(CENARIOS) + ['todos'], default='todos')
+    parser.add_argument('--modo', choices=('handler', 'http'), default='handler',
+                        help='handler: chama as Lambdas direto; http: passa pelo Flask test client')
+    parser.add_argument('--clientes', type=int)
+    parser.add_argument('--barbeiros', type=int)
+    parser.add_argument('--pedidos', type=int)
+    parser.add_argument('--hotspot', type=float)
+    parser.add_argument('--conflito', type=float)
+    parser.add_argument('--concorrencia', type=int, default=8, help='threads enviando pedidos')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--backend', choices=('tinydb', 'sqlite'), help='DB_BACKEND do cenário')
+    parser.add_argument('--fila', choices=('memoria', 'duravel'), help='SQS_BACKEND do cenário')
+    parser.add_argument('--tracemalloc', action='store_true', help='mede alocações (mais lento)')
+    parser.add_argument('--salvar', help='grava os resultados como baseline (JSON)')
+    parser.add_argument('--comparar', help='baseline para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    parser.add_argument('--interno', help=argparse.SUPPRESS)
+    parser.add_argument('--saida', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        # Processo filho: a saída (notificações e log) não interessa ao benchmark,
+        # mas o custo de produzi-la continua sendo medido
+        from observabilidade import log
+        sys.stdout = open(os.devnull, 'w')
+        log.configurar(stream=sys.stdout)
+        resultado = executar_cenario(json.loads(args.interno))
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo)
+        return 0
+
+    nomes = sorted(CENARIOS) if args.cenario == 'todos' else [args.cenario]
+    resultados = {}
+    for nome in nomes:
+        config = dict(CENARIOS[nome])
+        for campo in ('clientes', 'barbeiros', 'pedidos', 'hotspot', 'conflito'):
+            if getattr(args, campo) is not None:
+                config[campo] = getattr(args, campo)
+        config.update({
+            'modo': args.modo, 'concorrencia': args.concorrencia, 'semente': args.semente,
+            'backend': args.backend, 'fila': args.fila, 'tracemalloc': args.tracemalloc
+        })
+        resultados[nome] = _executar_isolado(config)
+        _imprimir(nome, resultados[nome])
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'python': platform.python_version(),
+                'plataforma': platform.platform(),
+                'gerado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'cenarios': resultados
+            }, arquivo, indent=2, ensure_ascii=False)
+        print(f"\nBaseline gravado em {args.salvar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)['cenarios']
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        if regressoes:
+            print(f"\nRegressões (tolerância {args.tolerancia:.0%}):")
+            for regressao in regressoes:
+                print(f"  - {regressao}")
+            return 1
+        print(f"\nSem regressões em relação a {args.comparar} (tolerância {args.tolerancia:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
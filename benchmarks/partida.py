@@ -0,0 +1,159 @@
+"""
+Tempo de partida a frio do gateway
+
+Cada repetição roda em um processo novo, dentro de um diretório temporário
+(bancos e fila vazios), e mede:
+    import_app       - import app (lógica das rotas, sem Flask)
+    import_asgi      - import asgi, depois de app
+    primeira_asgi    - primeira requisição POST /cliente/acesso pelo gateway
+                       ASGI (importa a Lambda e abre o banco)
+    partida_asgi     - soma das três etapas acima: do import até a primeira
+                       resposta, comparada com a meta
+    create_app       - create_app() (inclui a importação do Flask)
+    primeira_flask   - primeira requisição POST /cliente/acesso pelo Flask
+e as threads vivas depois dos imports (nenhuma deve ter sido iniciada).
+O tempo de subida do próprio interpretador (python -c pass) é mostrado à
+parte, como referência
+
+Uso:
+    python -m benchmarks.partida [--repeticoes 5] [--meta 100] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Meta da partida do gateway ASGI (ms, mediana)
+META_MS = 100
+
+ETAPAS = ('import_app', 'import_asgi', 'primeira_asgi', 'partida_asgi', 'create_app', 'primeira_flask')
+
+CLIENTE = {'nome': 'Ana', 'sobrenome': 'Silva', 'email': 'ana@exemplo.com', 'celular': '11999999999'}
+
+
+def _ms(inicio):
+    return round((time.perf_counter() - inicio) * 1000, 2)
+
+
+def _requisicao_asgi(app, metodo, caminho, corpo):
+    """Executa uma requisição na aplicação ASGI e retorna o status"""
+    import asyncio
+
+    mensagens = [{'type': 'http.request', 'body': json.dumps(corpo).encode('utf-8'), 'more_body': False}]
+    enviadas = []
+
+    async def receive():
+        return mensagens.pop(0) if mensagens else {'type': 'http.disconnect'}
+
+    async def send(mensagem):
+        enviadas.append(mensagem)
+
+    scope = {'type': 'http', 'method': metodo, 'path': caminho, 'headers': [], 'query_string': b''}
+    asyncio.run(app(scope, receive, send))
+    return enviadas[0]['status']
+
+
+def medir():
+    """Mede as etapas no processo atual (que deve estar em um diretório vazio)"""
+    import threading
+
+    resultado = {}
+    inicio = time.perf_counter()
+    import app as app_module
+    resultado['import_app'] = _ms(inicio)
+
+    inicio = time.perf_counter()
+    import asgi
+    resultado['import_asgi'] = _ms(inicio)
+    resultado['threads_apos_import'] = sorted(
+        thread.name for thread in threading.enumerate() if thread is not threading.main_thread()
+    )
+
+    inicio = time.perf_counter()
+    status = _requisicao_asgi(asgi.app, 'POST', '/cliente/acesso', CLIENTE)
+    resultado['primeira_asgi'] = _ms(inicio)
+    resultado['partida_asgi'] = round(
+        resultado['import_app'] + resultado['import_asgi'] + resultado['primeira_asgi'], 2
+    )
+
+    inicio = time.perf_counter()
+    flask_app = app_module.create_app()
+    resultado['create_app'] = _ms(inicio)
+
+    inicio = time.perf_counter()
+    resposta = flask_app.test_client().post('/cliente/acesso', json=dict(CLIENTE, email='bia@exemplo.com'))
+    resultado['primeira_flask'] = _ms(inicio)
+
+    resultado['status'] = [status, resposta.status_code]
+    return resultado
+
+
+def _executar_isolado():
+    """Uma repetição em processo novo; retorna as medidas e o tempo do processo"""
+    with tempfile.TemporaryDirectory(prefix='partida-') as diretorio:
+        saida = os.path.join(diretorio, 'resultado.json')
+        ambiente = dict(os.environ, PYTHONPATH=RAIZ + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.partida', '--interno', '--saida', saida],
+            cwd=diretorio, env=ambiente, check=True, stderr=subprocess.DEVNULL
+        )
+        with open(saida, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+
+
+def _interpretador_ms():
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return _ms(inicio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mede a partida a frio do gateway')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--meta', type=float, default=META_MS, help='meta da partida ASGI (ms, mediana)')
+    parser.add_argument('--json', action='store_true', help='imprime o resultado em JSON')
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--saida', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        resultado = medir()
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo)
+        return 0
+
+    execucoes = [_executar_isolado() for _ in range(args.repeticoes)]
+    resumo = {
+        etapa: {
+            'mediana_ms': round(statistics.median(execucao[etapa] for execucao in execucoes), 2),
+            'max_ms': max(execucao[etapa] for execucao in execucoes)
+        }
+        for etapa in ETAPAS
+    }
+    threads = sorted({thread for execucao in execucoes for thread in execucao['threads_apos_import']})
+    interpretador = statistics.median(_interpretador_ms() for _ in range(args.repeticoes))
+    dentro_da_meta = resumo['partida_asgi']['mediana_ms'] <= args.meta and not threads
+
+    if args.json:
+        print(json.dumps({
+            'etapas': resumo, 'threads_apos_import': threads, 'interpretador_ms': interpretador,
+            'meta_ms': args.meta, 'dentro_da_meta': dentro_da_meta
+        }, indent=2))
+    else:
+        print(f"Partida a frio ({args.repeticoes} repetições, mediana / máx)")
+        for etapa, medida in resumo.items():
+            print(f"  {etapa:<15} {medida['mediana_ms']:>8.1f} ms / {medida['max_ms']:.1f} ms")
+        print(f"  interpretador   {interpretador:>8.1f} ms (python -c pass, referência)")
+        print(f"  threads após os imports: {', '.join(threads) or 'nenhuma'}")
+        print(f"  meta partida_asgi <= {args.meta:.0f} ms: {'ok' if dentro_da_meta else 'NÃO ATINGIDA'}")
+    return 0 if dentro_da_meta else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Cache read-through em memória com despejo LRU e expiração por TTL
+Usado para os registros de cliente, lidos a cada pedido de agendamento
+"""
+from collections import OrderedDict
+import threading
+import time
+
+
+class CacheLRU:
+    """
+    Cache chave -> valor com capacidade limitada
+
+    `obter` devolve o valor em cache ou o carrega com a função informada.
+    Valores None (registro inexistente) não são guardados. Ao atingir a
+    capacidade, sai a entrada usada há mais tempo; entradas mais velhas que
+    `ttl` segundos são recarregadas.
+    """
+
+    def __init__(self, capacidade=10000, ttl=300):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        # Incrementada a cada invalidação: um carregamento que começou antes
+        # não grava no cache um valor que pode estar desatualizado
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    def obter(self, chave, carregar):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] > agora:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return entrada[1]
+            self.falhas += 1
+            geracao = self._geracao
+
+        valor = carregar(chave)
+        if valor is None:
+            return None
+
+        with self._lock:
+            if geracao == self._geracao:
+                self._entradas[chave] = (agora + self.ttl, valor)
+                self._entradas.move_to_end(chave)
+                if len(self._entradas) > self.capacidade:
+                    self._entradas.popitem(last=False)
+                    self.despejos += 1
+        return valor
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._entradas.pop(chave, None)
+            self._geracao += 1
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._geracao += 1
+
+    def estatisticas(self):
+        """Contadores de uso do cache"""
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'tamanho': len(self._entradas),
+                'capacidade': self.capacidade,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'despejos': self.despejos,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0
+            }
@@ -1,62 +1,702 @@
 """
 Gerenciador de banco de dados TinyDB
 Simula DynamoDB com duas tabelas: Cliente e Agendamento
+
+O backend é escolhido pela variável de ambiente DB_BACKEND:
+    tinydb (padrão) - arquivos JSON em database/data
+    sqlite          - arquivo SQLite em modo WAL (ver database/sqlite_backend.py)
+
+Importar o módulo não abre nada: as tabelas são abertas (e os índices
+carregados) por `iniciar`, chamada automaticamente na primeira operação
 """
 from tinydb import TinyDB, Query
+from tinydb.table import Document
+from database.indices import IndiceUnico, IndiceAgrupado, IndiceOrdenado
+from database.ocupacao import MapaOcupacao, mascara_de_horarios, horarios_livres
+from database.storage import AtomicJSONStorage, BatchingMiddleware
+from database.particoes import TabelaParticionada, mes_da_data
+from database.cache import CacheLRU
+from observabilidade.metricas import registro
+from observabilidade.log import obter_logger
+from datetime import date
+import atexit
+import contextlib
+import functools
+import heapq
+import itertools
 import os
+import threading
+
+DB_BACKEND = os.environ.get('DB_BACKEND', 'tinydb')
+SQLITE_PATH = os.environ.get('DB_SQLITE_PATH', 'database/data/barbearia.db')
+DATA_DIR = 'database/data'
 
-# Cria diretório se não existir
-os.makedirs('database/data', exist_ok=True)
+# Escritas de clientes são agrupadas: grava no disco a cada N inserts ou após
+# o intervalo (s), e create_cliente(s_lote) só retornam depois da gravação
+# (cadastros concorrentes esperam juntos a mesma, ver _sincronizar_clientes).
+# Agendamentos vão direto para o log da partição do mês, e
+# create_agendamento(s) só retornam depois de gravar no disco (ver
+# _sincronizar_agendamentos)
+FLUSH_MAX_PENDENTES = 100
+FLUSH_INTERVALO = 0.5
 
-# Inicializa as tabelas
-db_clientes = TinyDB('database/data/tabela_cliente.json')
-db_agendamentos = TinyDB('database/data/tabela_agendamento.json')
+# Meses anteriores ao atual são arquivados (gzip somente leitura) em segundo
+# plano, verificando a cada ARQUIVAMENTO_INTERVALO segundos; 0 desliga
+ARQUIVAMENTO_INTERVALO = float(os.environ.get('ARQUIVAMENTO_INTERVALO', 3600))
+
+# Cache dos registros de cliente (capacidade e validade em segundos)
+CACHE_CLIENTES_CAPACIDADE = 10000
+CACHE_CLIENTES_TTL = 300
+
+def _storage(storage_cls):
+    return BatchingMiddleware(
+        storage_cls,
+        max_pendentes=FLUSH_MAX_PENDENTES,
+        intervalo=FLUSH_INTERVALO
+    )
+
+# Tabelas, abertas por iniciar()
+_iniciado = False
+_sqlite = None
+db_clientes = None
+db_agendamentos = None
+
+log = obter_logger('database')
 
 Cliente = Query()
 Agendamento = Query()
 
+_cache_clientes = CacheLRU(capacidade=CACHE_CLIENTES_CAPACIDADE, ttl=CACHE_CLIENTES_TTL)
+
+# Métricas: duração das operações no banco e uso do cache de clientes
+_duracao_operacao = registro.histograma(
+    'db_operacao_segundos', 'Duração das operações do db_manager', rotulos=('operacao',)
+)
+registro.contador('cache_clientes_acertos_total', 'Leituras de cliente atendidas pelo cache',
+                  funcao=lambda: _cache_clientes.acertos)
+registro.contador('cache_clientes_falhas_total', 'Leituras de cliente que foram ao banco',
+                  funcao=lambda: _cache_clientes.falhas)
+registro.medidor('cache_clientes_tamanho', 'Clientes no cache', funcao=lambda: len(_cache_clientes))
+registro.medidor('db_particoes_ativas', 'Meses de agendamentos carregados em memória',
+                 funcao=lambda: len(db_agendamentos.ativas) if db_agendamentos is not None else 0)
+registro.medidor('db_particoes_arquivadas', 'Meses de agendamentos arquivados',
+                 funcao=lambda: len(db_agendamentos.arquivadas) if db_agendamentos is not None else 0)
+
+# Índices secundários em memória (mantidos em sincronia a cada insert)
+_idx_cliente_email = IndiceUnico(lambda c: c['email'])
+_idx_agendamento_slot = IndiceUnico(lambda a: (a['barbeiro'], a['data'], a['horario']))
+_idx_agendamento_dia = IndiceAgrupado(lambda a: (a['barbeiro'], a['data']))
+
+# Índices em ordem de id para paginação por cursor (chave None = tabela inteira)
+_idx_cliente_ordem = IndiceOrdenado(lambda c: None)
+_idx_agendamento_ordem = IndiceOrdenado(lambda a: None)
+_idx_agendamento_cliente = IndiceOrdenado(lambda a: a['cliente_email'])
+_idx_agendamento_barbeiro = IndiceOrdenado(lambda a: a['barbeiro'])
+
+# Máscara de bits dos horários ocupados por (barbeiro, data)
+_mapa_ocupacao = MapaOcupacao()
+
+_INDICES_CLIENTE = (_idx_cliente_email, _idx_cliente_ordem)
+_INDICES_AGENDAMENTO = (
+    _idx_agendamento_slot,
+    _idx_agendamento_dia,
+    _idx_agendamento_ordem,
+    _idx_agendamento_cliente,
+    _idx_agendamento_barbeiro,
+    _mapa_ocupacao
+)
+
+# TinyDB não é thread-safe: escritas de clientes, com a atualização dos
+# índices, são serializadas. Os agendamentos não passam por aqui: a tabela
+# particionada tem o próprio lock de escrita (ver _inserir_agendamentos)
+_lock = threading.RLock()
+
+# Locks por faixa de horários (lock striping) para a reserva atômica de slots:
+# reservas de slots diferentes raramente disputam o mesmo lock. Toda inserção
+# de agendamento segura as listras dos seus slots; o arquivador segura todas
+NUM_LISTRAS = 64
+_listras = [threading.Lock() for _ in range(NUM_LISTRAS)]
+
+def _listra(chave):
+    return hash(chave) % NUM_LISTRAS
+
+@contextlib.contextmanager
+def _segurando_listras(chaves):
+    """Segura as listras dos slots (em ordem crescente, para evitar deadlock entre lotes)"""
+    listras = [_listras[indice] for indice in sorted({_listra(chave) for chave in chaves})]
+    for lock in listras:
+        lock.acquire()
+    try:
+        yield
+    finally:
+        for lock in reversed(listras):
+            lock.release()
+
+def iniciar():
+    """
+    Abre as tabelas do backend configurado, carrega os índices e inicia o
+    arquivador de partições (chamadas repetidas não fazem nada)
+
+    Agendamentos são só inseridos: um log append-only por mês em
+    database/data/agendamentos (ver database/particoes.py); a tabela única
+    antiga é distribuída pelas partições na primeira execução
+    """
+    global _iniciado, _sqlite, db_clientes, db_agendamentos
+    if _iniciado:
+        return
+    with _lock:
+        if _iniciado:
+            return
+        if DB_BACKEND == 'sqlite':
+            from database.sqlite_backend import SQLiteBackend
+            _sqlite = SQLiteBackend(SQLITE_PATH)
+        else:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            db_clientes = TinyDB(os.path.join(DATA_DIR, 'tabela_cliente.json'), storage=_storage(AtomicJSONStorage))
+            db_agendamentos = TabelaParticionada(
+                os.path.join(DATA_DIR, 'agendamentos'),
+                legado=(os.path.join(DATA_DIR, 'tabela_agendamento.jsonl'),
+                        os.path.join(DATA_DIR, 'tabela_agendamento.json'))
+            )
+            _construir_indices()
+            if ARQUIVAMENTO_INTERVALO > 0:
+                threading.Thread(target=_arquivador, name='db-arquivador', daemon=True).start()
+        _iniciado = True
+
+def _com_banco(funcao):
+    """Operação que abre o banco (iniciar) na primeira chamada"""
+    @functools.wraps(funcao)
+    def operacao(*args, **kwargs):
+        if not _iniciado:
+            iniciar()
+        return funcao(*args, **kwargs)
+    return operacao
+
+def _construir_indices():
+    """Carrega os índices a partir do conteúdo atual das tabelas"""
+    with _lock:
+        for indice in _INDICES_CLIENTE:
+            indice.limpar()
+
+        for cliente in db_clientes.all():
+            _indexar_cliente(cliente)
+
+        _construir_indices_agendamento()
+
+def _construir_indices_agendamento():
+    """Índices de agendamento: cobrem só as partições ativas (os meses arquivados são lidos do arquivo)"""
+    with _lock:
+        for indice in _INDICES_AGENDAMENTO:
+            indice.limpar()
+
+        for agendamento in db_agendamentos.documentos_ativos():
+            _indexar_agendamento(agendamento)
+
+def _indexar_cliente(documento):
+    for indice in _INDICES_CLIENTE:
+        indice.adicionar(documento)
+
+def _indexar_agendamento(documento):
+    for indice in _INDICES_AGENDAMENTO:
+        indice.adicionar(documento)
+
+def _reabrir_meses(datas):
+    """Reabre (e reindexa) os meses arquivados das datas, antes de inserir nelas"""
+    for mes in sorted({mes_da_data(data) for data in datas}):
+        if db_agendamentos.arquivada(mes) and db_agendamentos.reabrir(mes, indexar=_indexar_agendamento):
+            log.info('partição reaberta', mes=mes)
+
+def _inserir_agendamentos(documentos):
+    """
+    Insere os agendamentos e os indexa (quem chama segura as listras dos slots)
+
+    A única serialização entre listras diferentes é o lock de escrita da
+    tabela particionada, que cobre só o trabalho em memória
+    """
+    documentos = [
+        {
+            'cliente_email': documento['cliente_email'],
+            'barbeiro': documento['barbeiro'],
+            'data': documento['data'],
+            'horario': documento['horario'],
+            'status': 'confirmado'
+        }
+        for documento in documentos
+    ]
+    _reabrir_meses({documento['data'] for documento in documentos})
+    return db_agendamentos.inserir(documentos, indexar=_indexar_agendamento)
+
+def _sincronizar_agendamentos(datas):
+    """
+    Grava no disco os agendamentos recém-inseridos antes de confirmá-los
+
+    Fora das listras: reservas concorrentes inserem enquanto uma gravação
+    está em andamento e a próxima grava todas de uma vez (group commit)
+    """
+    db_agendamentos.sincronizar({mes_da_data(data) for data in datas})
+
+def _sincronizar_clientes():
+    """
+    Grava no disco os clientes recém-inseridos antes de confirmar o cadastro
+
+    Fora do _lock: cadastros concorrentes inserem enquanto uma gravação está
+    em andamento e a próxima grava todos de uma vez (group commit)
+    """
+    db_clientes.storage.sincronizar()
+
+def _agendamentos_arquivados_dia(barbeiro, data):
+    """Agendamentos do dia se o mês da data está arquivado, senão None"""
+    mes = mes_da_data(data)
+    if not db_agendamentos.arquivada(mes):
+        return None
+    return db_agendamentos.ler_arquivada(mes).buscar_dia(barbeiro, data)
+
+def _slot_ocupado(chave):
+    """
+    Slot já agendado, nos índices ou no mês arquivado (quem chama segura a listra)
+
+    O mês arquivado é lido sem ser reaberto: uma reserva recusada não
+    descomprime o mês de volta para a memória nem apaga o arquivo
+    """
+    if chave in _idx_agendamento_slot:
+        return True
+    barbeiro, data, horario = chave
+    try:
+        arquivados = _agendamentos_arquivados_dia(barbeiro, data)
+    except FileNotFoundError:
+        # Reaberto por outra reserva nesse meio tempo: o mês já está nos índices
+        return chave in _idx_agendamento_slot
+    return arquivados is not None and any(agendamento['horario'] == horario for agendamento in arquivados)
+
+@_com_banco
 def get_cliente_by_email(email):
     """Busca cliente por email"""
-    return db_clientes.search(Cliente.email == email)
+    if _sqlite:
+        return _sqlite.get_cliente_by_email(email)
+    cliente = _idx_cliente_email.buscar(email)
+    return [cliente] if cliente else []
 
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='create_cliente')
 def create_cliente(nome, sobrenome, email, celular):
     """Cria um novo cliente"""
-    cliente = {
-        'nome': nome,
-        'sobrenome': sobrenome,
-        'email': email,
-        'celular': celular
-    }
-    return db_clientes.insert(cliente)
+    if _sqlite:
+        cliente_id = _sqlite.create_cliente(nome, sobrenome, email, celular)
+    else:
+        cliente = {
+            'nome': nome,
+            'sobrenome': sobrenome,
+            'email': email,
+            'celular': celular
+        }
+        with _lock:
+            cliente_id = db_clientes.insert(cliente)
+            _indexar_cliente(Document(cliente, doc_id=cliente_id))
+        _sincronizar_clientes()
+    # Depois da escrita: leituras iniciadas antes não repovoam o cache
+    _cache_clientes.invalidar(email)
+    return cliente_id
+
+@_com_banco
+def get_emails_cadastrados(emails):
+    """Subconjunto dos emails informados que já têm cliente cadastrado"""
+    if _sqlite:
+        return _sqlite.get_emails_cadastrados(emails)
+    return {email for email in emails if email in _idx_cliente_email}
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='create_clientes_lote')
+def create_clientes_lote(clientes):
+    """
+    Cria vários clientes com uma única escrita no storage
+
+    Args:
+        clientes: lista de dicts com nome, sobrenome, email e celular
+
+    Returns:
+        list: para cada cliente, o id criado ou None se o email já estava
+            cadastrado (inclusive por um item anterior do mesmo lote)
+    """
+    if _sqlite:
+        ids = _sqlite.create_clientes_lote(clientes)
+    else:
+        ids = [None] * len(clientes)
+        with _lock:
+            novos = []
+            posicoes = []
+            vistos = set()
+            for posicao, cliente in enumerate(clientes):
+                email = cliente['email']
+                if email in _idx_cliente_email or email in vistos:
+                    continue
+                vistos.add(email)
+                posicoes.append(posicao)
+                novos.append({
+                    'nome': cliente['nome'],
+                    'sobrenome': cliente['sobrenome'],
+                    'email': email,
+                    'celular': cliente['celular']
+                })
+            if novos:
+                criados = db_clientes.insert_multiple(novos)
+                for posicao, documento, cliente_id in zip(posicoes, novos, criados):
+                    _indexar_cliente(Document(documento, doc_id=cliente_id))
+                    ids[posicao] = cliente_id
+        if any(cliente_id is not None for cliente_id in ids):
+            _sincronizar_clientes()
+    for cliente, cliente_id in zip(clientes, ids):
+        if cliente_id is not None:
+            _cache_clientes.invalidar(cliente['email'])
+    return ids
 
+@_com_banco
 def get_agendamento_by_barbeiro_data_horario(barbeiro, data, horario):
     """Busca agendamento por barbeiro, data e horário"""
-    return db_agendamentos.search(
-        (Agendamento.barbeiro == barbeiro) &
-        (Agendamento.data == data) &
-        (Agendamento.horario == horario)
-    )
+    if _sqlite:
+        return _sqlite.get_agendamento_by_barbeiro_data_horario(barbeiro, data, horario)
+    if db_agendamentos.arquivada(mes_da_data(data)):
+        agendamentos = get_agendamentos_by_barbeiro_data(barbeiro, data)
+        return [agendamento for agendamento in agendamentos if agendamento['horario'] == horario][:1]
+    agendamento = _idx_agendamento_slot.buscar((barbeiro, data, horario))
+    return [agendamento] if agendamento else []
 
+@_com_banco
 def get_agendamentos_by_barbeiro_data(barbeiro, data):
-    """Busca todos os agendamentos de um barbeiro em uma data"""
-    return db_agendamentos.search(
-        (Agendamento.barbeiro == barbeiro) &
-        (Agendamento.data == data)
-    )
+    """
+    Busca todos os agendamentos de um barbeiro em uma data
+
+    Só a partição do mês da data é consultada: índice em memória para os
+    meses ativos, o arquivo do mês (mantido em cache) para os arquivados.
+    """
+    if _sqlite:
+        return _sqlite.get_agendamentos_by_barbeiro_data(barbeiro, data)
+    with _lock:
+        arquivados = _agendamentos_arquivados_dia(barbeiro, data)
+        if arquivados is not None:
+            return arquivados
+        return _idx_agendamento_dia.buscar((barbeiro, data))
 
+@_com_banco
+def get_id_agendamento_do_cliente(cliente_email, barbeiro, data, horario):
+    """
+    Id do agendamento do horário se ele é do cliente, senão None
+
+    Usado para reconhecer a reentrega de uma reserva já confirmada (a fila
+    entrega cada mensagem ao menos uma vez)
+    """
+    if _sqlite:
+        return _sqlite.get_id_agendamento_do_cliente(cliente_email, barbeiro, data, horario)
+    for agendamento in get_agendamento_by_barbeiro_data_horario(barbeiro, data, horario):
+        if agendamento['cliente_email'] == cliente_email:
+            return agendamento.doc_id
+    return None
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='create_agendamento')
 def create_agendamento(cliente_email, barbeiro, data, horario):
     """Cria um novo agendamento"""
-    agendamento = {
-        'cliente_email': cliente_email,
-        'barbeiro': barbeiro,
-        'data': data,
-        'horario': horario,
-        'status': 'confirmado'
-    }
-    return db_agendamentos.insert(agendamento)
+    if _sqlite:
+        return _sqlite.create_agendamento(cliente_email, barbeiro, data, horario)
+    with _segurando_listras([(barbeiro, data, horario)]):
+        criado, = _inserir_agendamentos([{
+            'cliente_email': cliente_email, 'barbeiro': barbeiro, 'data': data, 'horario': horario
+        }])
+    _sincronizar_agendamentos((data,))
+    return criado.doc_id
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='create_agendamentos_lote')
+def create_agendamentos_lote(agendamentos):
+    """
+    Cria vários agendamentos com uma única escrita no storage
+
+    Args:
+        agendamentos: lista de dicts com cliente_email, barbeiro, data e horario
+
+    Returns:
+        list: ids dos agendamentos criados, na mesma ordem
+    """
+    if _sqlite:
+        return _sqlite.create_agendamentos_lote(agendamentos)
+    with _segurando_listras([(a['barbeiro'], a['data'], a['horario']) for a in agendamentos]):
+        criados = _inserir_agendamentos(agendamentos)
+    _sincronizar_agendamentos({agendamento['data'] for agendamento in agendamentos})
+    return [agendamento.doc_id for agendamento in criados]
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='reserve_slot')
+def reserve_slot(cliente_email, barbeiro, data, horario, sincronizar=True):
+    """
+    Reserva um horário de forma atômica (compare-and-set)
+
+    Verifica e cria o agendamento como uma única operação: de várias
+    reservas concorrentes para o mesmo (barbeiro, data, horario) apenas uma
+    é confirmada. No TinyDB a verificação usa o lock da faixa do slot, sem
+    lock global; no SQLite, o índice UNIQUE. Reservas de faixas diferentes só
+    se encontram no lock de escrita da tabela, que cobre apenas o id e o
+    insert em memória (custo constante, ver ParticaoAtiva): a gravação no
+    disco acontece fora dele e fora da listra.
+
+    Com sincronizar=False retorna antes da gravação no disco; quem chama
+    deve chamar sincronizar_agendamentos antes de confirmar a reserva.
+
+    Returns:
+        int: id do agendamento criado, ou None se o horário já estava ocupado
+    """
+    if _sqlite:
+        return _sqlite.reserve_slot(cliente_email, barbeiro, data, horario)
+    chave = (barbeiro, data, horario)
+    with _segurando_listras([chave]):
+        # O arquivador segura todas as listras: o mês não é arquivado entre a
+        # verificação e o insert, que só então reabre um mês arquivado
+        if _slot_ocupado(chave):
+            return None
+        criado, = _inserir_agendamentos([{
+            'cliente_email': cliente_email, 'barbeiro': barbeiro, 'data': data, 'horario': horario
+        }])
+    # Fora da listra: reservas concorrentes entram na mesma gravação
+    if sincronizar:
+        _sincronizar_agendamentos((data,))
+    return criado.doc_id
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='reservar_slots_lote')
+def reservar_slots_lote(agendamentos, sincronizar=True):
+    """
+    Reserva vários horários de forma atômica, com uma única escrita no storage
+
+    Args:
+        agendamentos: lista de dicts com cliente_email, barbeiro, data e horario
+        sincronizar: False retorna antes da gravação no disco (ver reserve_slot)
+
+    Returns:
+        list: para cada agendamento, o id criado ou None se o horário já
+            estava ocupado (inclusive por um item anterior do mesmo lote)
+    """
+    if _sqlite:
+        return _sqlite.reservar_slots_lote(agendamentos)
+
+    chaves = [(a['barbeiro'], a['data'], a['horario']) for a in agendamentos]
+    ids = [None] * len(agendamentos)
+    with _segurando_listras(chaves):
+        livres = []
+        vistas = set()
+        for posicao, chave in enumerate(chaves):
+            if chave not in vistas and not _slot_ocupado(chave):
+                vistas.add(chave)
+                livres.append(posicao)
+        if not livres:
+            return ids
+        criados = _inserir_agendamentos([agendamentos[posicao] for posicao in livres])
+    if sincronizar:
+        _sincronizar_agendamentos({chaves[posicao][1] for posicao in livres})
+    for posicao, criado in zip(livres, criados):
+        ids[posicao] = criado.doc_id
+    return ids
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='sincronizar_agendamentos')
+def sincronizar_agendamentos(datas):
+    """
+    Grava no disco as reservas feitas com sincronizar=False nas datas informadas
+
+    Reservas concorrentes aguardando juntas são gravadas de uma vez (group commit).
+    """
+    if _sqlite:
+        # No SQLite cada reserva já é uma transação confirmada
+        return
+    _sincronizar_agendamentos(datas)
 
 def get_cliente_by_email_object(email):
-    """Retorna o objeto completo do cliente"""
-    resultados = db_clientes.search(Cliente.email == email)
-    return resultados[0] if resultados else None
+    """Retorna o objeto completo do cliente (via cache)"""
+    return _cache_clientes.obter(email, _carregar_cliente)
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='buscar_cliente')
+def _carregar_cliente(email):
+    if _sqlite:
+        return _sqlite.get_cliente_by_email_object(email)
+    return _idx_cliente_email.buscar(email)
+
+def estatisticas_cache_clientes():
+    """Acertos, falhas e ocupação do cache de clientes"""
+    return _cache_clientes.estatisticas()
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='listar_clientes')
+def listar_clientes():
+    """Retorna todos os clientes"""
+    if _sqlite:
+        return _sqlite.listar_clientes()
+    return db_clientes.all()
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='listar_agendamentos')
+def listar_agendamentos():
+    """Retorna todos os agendamentos (inclusive dos meses arquivados)"""
+    if _sqlite:
+        return _sqlite.listar_agendamentos()
+    with _lock:
+        return list(db_agendamentos.todos())
+
+@_com_banco
+def iterar_clientes(cursor=None):
+    """
+    Itera os clientes em ordem de id, a partir do cursor (id exclusivo)
+
+    Os clientes são gerados um a um (dicts com o campo 'id'), sem montar a
+    lista inteira em memória.
+    """
+    if _sqlite:
+        yield from _sqlite.iterar_clientes(cursor)
+        return
+    for cliente in _idx_cliente_ordem.a_partir_de(None, cursor):
+        yield dict(cliente, id=cliente.doc_id)
+
+@_com_banco
+def iterar_agendamentos(cursor=None, barbeiro=None, data_inicio=None, data_fim=None, cliente_email=None):
+    """
+    Itera os agendamentos em ordem de id, a partir do cursor (id exclusivo)
+
+    Args:
+        cursor: último id já recebido
+        barbeiro: filtra pelo barbeiro (usa índice)
+        data_inicio, data_fim: intervalo de datas YYYY-MM-DD (inclusivo)
+        cliente_email: filtra pelo cliente (usa índice)
+
+    Yields:
+        dict: agendamento com o campo 'id'
+    """
+    if _sqlite:
+        yield from _sqlite.iterar_agendamentos(cursor, barbeiro, data_inicio, data_fim, cliente_email)
+        return
+
+    # Parte do índice mais seletivo disponível e aplica os demais filtros
+    if cliente_email is not None:
+        candidatos = _idx_agendamento_cliente.a_partir_de(cliente_email, cursor)
+    elif barbeiro is not None:
+        candidatos = _idx_agendamento_barbeiro.a_partir_de(barbeiro, cursor)
+    else:
+        candidatos = _idx_agendamento_ordem.a_partir_de(None, cursor)
+
+    # Meses arquivados que podem ter resultados (pelo manifesto: datas,
+    # barbeiros, clientes e maior id) são intercalados em ordem de id, cada
+    # um aberto só quando a página chega nele; os demais nem são abertos
+    meses = db_agendamentos.meses_arquivados(data_inicio, data_fim, barbeiro, cliente_email, cursor)
+    if meses:
+        candidatos = heapq.merge(
+            candidatos,
+            db_agendamentos.iterar_arquivadas(meses, cursor),
+            key=lambda agendamento: agendamento.doc_id
+        )
+
+    for agendamento in candidatos:
+        if cliente_email is not None and agendamento['cliente_email'] != cliente_email:
+            continue
+        if barbeiro is not None and agendamento['barbeiro'] != barbeiro:
+            continue
+        if data_inicio is not None and agendamento['data'] < data_inicio:
+            continue
+        if data_fim is not None and agendamento['data'] > data_fim:
+            continue
+        yield dict(agendamento, id=agendamento.doc_id)
+
+def paginar(iterador, limite):
+    """
+    Retorna a próxima página de um iterador de documentos com 'id'
+
+    Returns:
+        tuple: (itens, proximo_cursor) - proximo_cursor é None na última página
+    """
+    itens = list(itertools.islice(iterador, limite + 1))
+    if len(itens) > limite:
+        itens = itens[:limite]
+        return itens, itens[-1]['id']
+    return itens, None
+
+@_com_banco
+def get_mascara_ocupacao(barbeiro, data):
+    """Máscara de bits dos horários da grade já ocupados (ver database/ocupacao.py)"""
+    if _sqlite:
+        return mascara_de_horarios(_sqlite.get_horarios_ocupados(barbeiro, data))
+    if db_agendamentos.arquivada(mes_da_data(data)):
+        return mascara_de_horarios(a['horario'] for a in get_agendamentos_by_barbeiro_data(barbeiro, data))
+    return _mapa_ocupacao.mascara(barbeiro, data)
+
+def get_horarios_disponiveis(barbeiro, data):
+    """Horários livres de um barbeiro em uma data"""
+    return list(horarios_livres(get_mascara_ocupacao(barbeiro, data)))
+
+@_com_banco
+def listar_barbeiros():
+    """Barbeiros que já têm algum agendamento"""
+    if _sqlite:
+        return _sqlite.listar_barbeiros()
+    return sorted(set(_idx_agendamento_barbeiro.grupos) | db_agendamentos.barbeiros_arquivados())
+
+@_duracao_operacao.cronometrar(operacao='flush')
+def flush():
+    """Grava no disco todas as escritas pendentes das tabelas"""
+    if not _iniciado:
+        return
+    if _sqlite:
+        return _sqlite.flush()
+    with _lock:
+        db_clientes.storage.flush()
+        db_agendamentos.flush()
+
+def close():
+    """Grava as escritas pendentes e fecha as tabelas"""
+    if not _iniciado:
+        return
+    if _sqlite:
+        return _sqlite.close()
+    _parar_arquivador.set()
+    with _lock:
+        db_clientes.close()
+        db_agendamentos.close()
+
+@_com_banco
+@_duracao_operacao.cronometrar(operacao='arquivar')
+def arquivar_meses_passados(hoje=None):
+    """
+    Compacta as partições dos meses anteriores ao atual em arquivos gzip
+    somente leitura e recarrega os índices só com os meses ativos
+
+    Returns:
+        list: meses arquivados nesta chamada
+    """
+    if _sqlite:
+        return []
+    mes_atual = (hoje or date.today()).isoformat()[:7]
+    if not db_agendamentos.meses_para_arquivar(mes_atual):
+        return []
+    # Todas as listras, em ordem: nenhuma reserva fica entre verificar e inserir
+    for lock in _listras:
+        lock.acquire()
+    try:
+        with _lock:
+            meses = db_agendamentos.meses_para_arquivar(mes_atual)
+            for mes in meses:
+                total = db_agendamentos.arquivar(mes)
+                log.info('partição arquivada', mes=mes, agendamentos=total)
+            _construir_indices_agendamento()
+    finally:
+        for lock in reversed(_listras):
+            lock.release()
+    return meses
+
+_parar_arquivador = threading.Event()
+
+def _arquivador():
+    """Loop da thread: arquiva os meses passados na subida e a cada intervalo"""
+    while True:
+        try:
+            arquivar_meses_passados()
+        except Exception:
+            log.exception('falha ao arquivar partições')
+        if _parar_arquivador.wait(ARQUIVAMENTO_INTERVALO):
+            return
 
+# Garante o flush mesmo quando o módulo é usado fora do app.py
+atexit.register(flush)
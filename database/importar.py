@@ -0,0 +1,108 @@
+"""
+Importação de clientes e agendamentos a partir de arquivos CSV ou NDJSON
+Lê o arquivo em lotes e chama a Lambda ImportacaoLote (mesma validação
+de POST /cliente/bulk e /agendamento/bulk), uma escrita no banco por lote
+
+Uso:
+    python -m database.importar clientes clientes.csv
+    python -m database.importar agendamentos agendamentos.ndjson [--lote 5000] [--formato ndjson]
+
+CSV com cabeçalho (nome,sobrenome,email,celular ou
+cliente_email,barbeiro,data,horario); NDJSON com um objeto JSON por linha.
+Importe os clientes antes dos agendamentos.
+"""
+from lambdas.importacao_lote import handler_clientes, handler_agendamentos, MAX_LINHAS_LOTE
+from database import db_manager
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+
+HANDLERS = {'clientes': handler_clientes, 'agendamentos': handler_agendamentos}
+
+
+def ler_csv(arquivo):
+    """Gera (número da linha no arquivo, dict) a partir de um CSV com cabeçalho"""
+    leitor = csv.DictReader(arquivo)
+    for linha in leitor:
+        yield leitor.line_num, {campo: (valor or '').strip() for campo, valor in linha.items() if campo}
+
+
+def ler_ndjson(arquivo):
+    """Gera (número da linha no arquivo, dict) de um arquivo NDJSON (linhas vazias são ignoradas)"""
+    for numero, texto in enumerate(arquivo, start=1):
+        if not texto.strip():
+            continue
+        try:
+            yield numero, json.loads(texto)
+        except ValueError:
+            # Chega à Lambda como linha inválida
+            yield numero, None
+
+
+def importar(tabela, linhas, tamanho_lote=1000):
+    """
+    Importa as linhas em lotes
+
+    Args:
+        tabela: 'clientes' ou 'agendamentos'
+        linhas: iterável de (número da linha, dict)
+        tamanho_lote: linhas por chamada da Lambda
+
+    Returns:
+        tuple: (totais por status, lista de (número da linha, status, mensagem) rejeitadas)
+    """
+    handler = HANDLERS[tabela]
+    totais = {}
+    rejeitadas = []
+    linhas = iter(linhas)
+    while True:
+        lote = list(itertools.islice(linhas, tamanho_lote))
+        if not lote:
+            break
+        resposta = handler({tabela: [documento for _, documento in lote]})
+        if resposta['statusCode'] != 200:
+            raise RuntimeError(resposta['body']['message'])
+        for (numero, _), resultado in zip(lote, resposta['body']['resultados']):
+            totais[resultado['status']] = totais.get(resultado['status'], 0) + 1
+            if resultado['status'] != 'criado':
+                rejeitadas.append((numero, resultado['status'], resultado['message']))
+
+    db_manager.flush()
+    return totais, rejeitadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa clientes ou agendamentos de um arquivo CSV/NDJSON')
+    parser.add_argument('tabela', choices=sorted(HANDLERS))
+    parser.add_argument('arquivo', help='arquivo .csv ou .ndjson/.jsonl')
+    parser.add_argument('--formato', choices=('csv', 'ndjson'),
+                        help='padrão: pela extensão do arquivo')
+    parser.add_argument('--lote', type=int, default=1000,
+                        help=f'linhas por escrita no banco (máx {MAX_LINHAS_LOTE})')
+    parser.add_argument('--max-erros', type=int, default=20, help='linhas rejeitadas exibidas')
+    args = parser.parse_args()
+
+    if not 1 <= args.lote <= MAX_LINHAS_LOTE:
+        parser.error(f'--lote deve estar entre 1 e {MAX_LINHAS_LOTE}')
+    formato = args.formato or ('csv' if os.path.splitext(args.arquivo)[1].lower() == '.csv' else 'ndjson')
+    ler = ler_csv if formato == 'csv' else ler_ndjson
+
+    with open(args.arquivo, encoding='utf-8', newline='') as arquivo:
+        totais, rejeitadas = importar(args.tabela, ler(arquivo), args.lote)
+
+    print(f"Linhas lidas: {sum(totais.values())}")
+    for status, quantidade in sorted(totais.items()):
+        print(f"  {status}: {quantidade}")
+    for numero, status, mensagem in rejeitadas[:args.max_erros]:
+        print(f"  linha {numero}: {status} - {mensagem}")
+    if len(rejeitadas) > args.max_erros:
+        print(f"  ... mais {len(rejeitadas) - args.max_erros} linhas rejeitadas")
+
+    sys.exit(1 if rejeitadas else 0)
+
+
+if __name__ == '__main__':
+    main()
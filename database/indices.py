@@ -0,0 +1,82 @@
+"""
+Índices secundários em memória para as tabelas TinyDB
+Evitam a varredura completa da tabela (Query) nas buscas mais frequentes
+"""
+import bisect
+
+
+class IndiceUnico:
+    """Índice hash chave -> documento (uma entrada por chave)"""
+
+    def __init__(self, extrair_chave):
+        self.extrair_chave = extrair_chave
+        self.entradas = {}
+
+    def adicionar(self, documento):
+        """Indexa o documento; mantém o primeiro caso a chave já exista"""
+        self.entradas.setdefault(self.extrair_chave(documento), documento)
+
+    def buscar(self, chave):
+        """Retorna o documento da chave ou None"""
+        return self.entradas.get(chave)
+
+    def __contains__(self, chave):
+        return chave in self.entradas
+
+    def limpar(self):
+        self.entradas.clear()
+
+
+class IndiceAgrupado:
+    """Índice hash chave -> {doc_id: documento} (várias entradas por chave)"""
+
+    def __init__(self, extrair_chave):
+        self.extrair_chave = extrair_chave
+        self.grupos = {}
+
+    def adicionar(self, documento):
+        """Indexa o documento no grupo da sua chave"""
+        chave = self.extrair_chave(documento)
+        self.grupos.setdefault(chave, {})[documento.doc_id] = documento
+
+    def buscar(self, chave):
+        """Retorna a lista de documentos do grupo (cópia)"""
+        return list(self.grupos.get(chave, {}).values())
+
+    def limpar(self):
+        self.grupos.clear()
+
+
+class IndiceOrdenado:
+    """
+    Índice chave -> documentos em ordem crescente de doc_id
+
+    Os documentos chegam com ids crescentes (tabelas só de inserção), então
+    cada grupo é mantido ordenado apenas com append. `a_partir_de` localiza
+    o cursor por busca binária (paginação por keyset).
+    """
+
+    def __init__(self, extrair_chave):
+        self.extrair_chave = extrair_chave
+        self.grupos = {}
+
+    def adicionar(self, documento):
+        ids, documentos = self.grupos.setdefault(self.extrair_chave(documento), ([], []))
+        if ids and documento.doc_id <= ids[-1]:
+            posicao = bisect.bisect_left(ids, documento.doc_id)
+            ids.insert(posicao, documento.doc_id)
+            documentos.insert(posicao, documento)
+        else:
+            ids.append(documento.doc_id)
+            documentos.append(documento)
+
+    def a_partir_de(self, chave, cursor=None):
+        """Itera os documentos da chave com doc_id maior que o cursor"""
+        ids, documentos = self.grupos.get(chave, ([], []))
+        posicao = bisect.bisect_right(ids, cursor) if cursor is not None else 0
+        while posicao < len(documentos):
+            yield documentos[posicao]
+            posicao += 1
+
+    def limpar(self):
+        self.grupos.clear()
@@ -0,0 +1,54 @@
+"""
+Migração TinyDB -> SQLite
+Importa database/data/tabela_cliente.json e os agendamentos de todas as
+partições mensais (ativas e arquivadas, ver database/particoes.py) para o SQLite.
+Os arquivos do TinyDB só são lidos: nada é criado, renomeado ou reparado na origem
+
+Uso:
+    python -m database.migrar_sqlite [--origem database/data] [--destino database/data/barbearia.db]
+"""
+from database.storage import AtomicJSONStorage
+from database.particoes import ler_agendamentos
+from database.sqlite_backend import SQLiteBackend
+import argparse
+import os
+
+
+def carregar_tabela(caminho, storage_cls):
+    """Lê a tabela padrão de um arquivo TinyDB ({doc_id: documento})"""
+    if not os.path.exists(caminho):
+        return {}
+    dados = storage_cls(caminho).read() or {}
+    return dados.get('_default', {})
+
+
+def migrar(origem, destino):
+    clientes = carregar_tabela(os.path.join(origem, 'tabela_cliente.json'), AtomicJSONStorage)
+
+    # Partições mensais ou, se ainda não particionada, a tabela única antiga
+    agendamentos = ler_agendamentos(
+        os.path.join(origem, 'agendamentos'),
+        legado=(os.path.join(origem, 'tabela_agendamento.jsonl'), os.path.join(origem, 'tabela_agendamento.json'))
+    )
+
+    backend = SQLiteBackend(destino)
+    try:
+        return backend.importar(clientes, agendamentos)
+    finally:
+        backend.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa as tabelas TinyDB para o SQLite')
+    parser.add_argument('--origem', default='database/data', help='diretório dos arquivos TinyDB')
+    parser.add_argument('--destino', default='database/data/barbearia.db', help='arquivo SQLite')
+    args = parser.parse_args()
+
+    total_clientes, total_agendamentos = migrar(args.origem, args.destino)
+    print(f"Clientes importados: {total_clientes}")
+    print(f"Agendamentos importados: {total_agendamentos}")
+    print(f"Use DB_BACKEND=sqlite DB_SQLITE_PATH={args.destino} para ativar o backend")
+
+
+if __name__ == '__main__':
+    main()
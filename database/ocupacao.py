@@ -0,0 +1,48 @@
+"""
+Mapa de ocupação dos horários de cada barbeiro por dia
+Cada (barbeiro, data) é um inteiro em que o bit i indica se o horário
+HORARIOS[i] está ocupado
+"""
+from functools import lru_cache
+
+# Horários de funcionamento: 08:00 às 18:00 em intervalos de 30min
+HORARIOS = tuple(f"{hora:02d}:{minuto:02d}" for hora in range(8, 18) for minuto in (0, 30))
+BIT_HORARIO = {horario: 1 << posicao for posicao, horario in enumerate(HORARIOS)}
+
+
+def mascara_de_horarios(horarios):
+    """Converte uma coleção de horários na máscara de bits correspondente"""
+    mascara = 0
+    for horario in horarios:
+        mascara |= BIT_HORARIO.get(horario, 0)
+    return mascara
+
+
+@lru_cache(maxsize=4096)
+def horarios_livres(mascara):
+    """Horários da grade cujo bit não está marcado na máscara"""
+    return tuple(horario for horario in HORARIOS if not mascara & BIT_HORARIO[horario])
+
+
+class MapaOcupacao:
+    """
+    Máscara de horários ocupados por (barbeiro, data)
+
+    Segue a interface dos índices de database/indices.py para ser mantido
+    junto com eles a cada insert. Horários fora da grade são ignorados.
+    """
+
+    def __init__(self):
+        self.mascaras = {}
+
+    def adicionar(self, documento):
+        bit = BIT_HORARIO.get(documento['horario'])
+        if bit:
+            chave = (documento['barbeiro'], documento['data'])
+            self.mascaras[chave] = self.mascaras.get(chave, 0) | bit
+
+    def mascara(self, barbeiro, data):
+        return self.mascaras.get((barbeiro, data), 0)
+
+    def limpar(self):
+        self.mascaras.clear()
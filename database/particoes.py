@@ -0,0 +1,492 @@
+"""
+Tabela de agendamentos particionada por mês
+Cada mês (pela data do agendamento) fica em um log append-only próprio,
+database/data/agendamentos/AAAA-MM.jsonl. Os meses que já passaram são
+compactados pelo arquivador em um arquivo gzip somente leitura
+(AAAA-MM.jsonl.gz) e saem da memória, então o conjunto de trabalho fica
+restrito ao mês atual e aos futuros, sem crescer com o histórico
+
+O manifesto.json do diretório registra os meses arquivados (total, menor e
+maior id, datas, barbeiros e clientes de cada um); ele decide qual das
+cópias vale quando o processo cai no meio de um arquivamento ou de uma
+reabertura, e permite pular nas listagens os meses que não podem ter
+resultados
+"""
+from tinydb.table import Document
+from database.storage import AtomicJSONStorage, AppendOnlyStorage, reproduzir_log
+from collections import OrderedDict
+import bisect
+import gzip
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+
+# Agendamentos com data fora do formato AAAA-MM-DD (nunca arquivada)
+PARTICAO_OUTROS = 'outros'
+
+# Tabela do log de cada partição (a tabela padrão do TinyDB, compatível com os logs já gravados)
+TABELA = '_default'
+
+# Meses arquivados mantidos descomprimidos em memória para consultas
+ARQUIVADAS_EM_CACHE = 4
+
+NIVEL_COMPRESSAO = 6
+
+_DATA = re.compile(r'(\d{4}-\d{2})-\d{2}$')
+_ARQUIVO_ATIVO = re.compile(r'(\d{4}-\d{2}|' + PARTICAO_OUTROS + r')\.jsonl$')
+_ARQUIVO_ARQUIVADO = re.compile(r'(\d{4}-\d{2})\.jsonl\.gz$')
+
+
+def mes_da_data(data):
+    """Partição de uma data: 'AAAA-MM' (ou PARTICAO_OUTROS se a data não tem esse formato)"""
+    casamento = _DATA.match(data) if isinstance(data, str) else None
+    return casamento.group(1) if casamento else PARTICAO_OUTROS
+
+
+class ParticaoAtiva:
+    """
+    Mês ativo: documentos em memória e log append-only no disco
+
+    Inserir só acrescenta ao dicionário do mês e enfileira as linhas do log,
+    com custo proporcional aos documentos inseridos (não ao tamanho do mês,
+    como no insert do TinyDB, que copia a tabela inteira). A gravação no
+    disco fica para `gravar`, que junta as inserções pendentes de várias
+    chamadas em um único append.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        # O dicionário do próprio storage: os documentos ficam uma só vez em memória
+        self._documentos = storage.tabela(TABELA)
+        for doc_id, documento in self._documentos.items():
+            self._documentos[doc_id] = Document(documento, doc_id=int(doc_id))
+
+    def inserir(self, documentos):
+        """Acrescenta Documents com ids maiores que os existentes (sem gravar no disco)"""
+        self.storage.anexar(TABELA, documentos)
+
+    def all(self):
+        """Documents em ordem de id"""
+        return list(self._documentos.values())
+
+    def gravar(self):
+        """Grava no disco as inserções pendentes (group commit)"""
+        self.storage.gravar_pendentes()
+
+    def close(self):
+        self.storage.close()
+
+    def __len__(self):
+        return len(self._documentos)
+
+
+class ParticaoArquivada:
+    """Mês arquivado descomprimido para consulta (somente leitura)"""
+
+    def __init__(self, mes, documentos):
+        self.mes = mes
+        # Documents em ordem de id
+        self.documentos = documentos
+        self.ids = [documento.doc_id for documento in documentos]
+        self._por_dia = {}
+        for documento in documentos:
+            self._por_dia.setdefault((documento['barbeiro'], documento['data']), []).append(documento)
+
+    def buscar_dia(self, barbeiro, data):
+        """Agendamentos de um barbeiro em uma data do mês"""
+        return list(self._por_dia.get((barbeiro, data), ()))
+
+
+def _ler_log(caminho):
+    """Tabela padrão de um log append-only ({doc_id: documento}), sem alterar o arquivo"""
+    with open(caminho, 'rb') as arquivo:
+        return reproduzir_log(arquivo)[0].get(TABELA, {})
+
+
+def ler_agendamentos(diretorio, legado=None):
+    """
+    Todos os agendamentos do diretório (ativos e arquivados) sem alterar nada
+
+    Ao contrário de TabelaParticionada, não cria o diretório nem o manifesto,
+    não importa nem renomeia a tabela legada e não descarta cópias deixadas
+    por uma queda: apenas escolhe a cópia que a tabela consideraria válida.
+
+    Returns:
+        dict: {doc_id: Document} em ordem de id
+    """
+    manifesto = None
+    caminho_manifesto = os.path.join(diretorio, 'manifesto.json')
+    if os.path.exists(caminho_manifesto):
+        with open(caminho_manifesto, encoding='utf-8') as arquivo:
+            conteudo = arquivo.read()
+        manifesto = json.loads(conteudo) if conteudo.strip() else None
+    arquivadas = (manifesto or {}).get('arquivadas', {})
+
+    documentos = {}
+    if manifesto is None and legado:
+        # Tabela única ainda não distribuída pelas partições
+        caminho_log, caminho_json = legado
+        if os.path.exists(caminho_log):
+            documentos.update(_ler_log(caminho_log))
+        elif os.path.exists(caminho_json):
+            documentos.update((AtomicJSONStorage(caminho_json).read() or {}).get('_default', {}))
+
+    nomes = sorted(os.listdir(diretorio)) if os.path.isdir(diretorio) else []
+    for nome in nomes:
+        ativo = _ARQUIVO_ATIVO.match(nome)
+        arquivado = _ARQUIVO_ARQUIVADO.match(nome)
+        caminho = os.path.join(diretorio, nome)
+        if ativo and ativo.group(1) not in arquivadas:
+            documentos.update(_ler_log(caminho))
+        elif arquivado and arquivado.group(1) in arquivadas:
+            with gzip.open(caminho, 'rb') as arquivo:
+                for linha in arquivo:
+                    doc_id, documento = json.loads(linha)
+                    documentos[str(doc_id)] = documento
+
+    return {
+        int(doc_id): Document(documentos[doc_id], doc_id=int(doc_id))
+        for doc_id in sorted(documentos, key=int)
+    }
+
+
+class TabelaParticionada:
+    """
+    Agendamentos divididos em uma partição por mês (ver ParticaoAtiva)
+
+    Os ids continuam globais e crescentes (o próximo id considera também os
+    meses arquivados). Inserir em um mês arquivado exige reabri-lo antes
+    (`reabrir`). Inserções, reaberturas e arquivamentos são serializados
+    pelo lock de escrita da própria tabela, que cobre só o trabalho em
+    memória (a gravação no disco fica para `sincronizar`); quem mantém
+    índices passa a função `indexar`, chamada sob esse lock com cada
+    documento na ordem dos ids.
+
+    Args:
+        diretorio: pasta das partições e do manifesto
+        storage: função que recebe o caminho do log e cria o storage de
+            cada partição (padrão: AppendOnlyStorage)
+        legado: caminhos da tabela única antiga (log .jsonl e .json), importada
+            na primeira execução
+    """
+
+    def __init__(self, diretorio, storage=None, legado=None, arquivadas_em_cache=ARQUIVADAS_EM_CACHE):
+        self.diretorio = diretorio
+        self._storage = storage or AppendOnlyStorage
+        self._arquivadas_em_cache = arquivadas_em_cache
+        self._cache = OrderedDict()
+        self._lock_cache = threading.Lock()
+        self._lock_escrita = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+        self._manifesto = AtomicJSONStorage(os.path.join(diretorio, 'manifesto.json'))
+        manifesto = self._manifesto.read()
+        # mes -> {'total', 'min_id', 'max_id', 'datas', 'barbeiros', 'clientes'}
+        self.arquivadas = dict((manifesto or {}).get('arquivadas', {}))
+        self.ativas = {}
+        # mes -> (barbeiros, clientes) em sets, para filtrar os meses arquivados
+        self._filtros_arquivadas = {}
+
+        if manifesto is None:
+            self._gravar_manifesto()
+            if legado:
+                self._importar_legado(*legado)
+
+        for nome in sorted(os.listdir(diretorio)):
+            ativo = _ARQUIVO_ATIVO.match(nome)
+            arquivado = _ARQUIVO_ARQUIVADO.match(nome)
+            if ativo and ativo.group(1) in self.arquivadas:
+                # Queda durante o arquivamento ou a reabertura: vale o gzip
+                os.remove(os.path.join(diretorio, nome))
+            elif ativo and ativo.group(1) not in self.ativas:
+                self._abrir(ativo.group(1))
+            elif arquivado and arquivado.group(1) not in self.arquivadas:
+                # Queda antes de o manifesto registrar o arquivamento: vale o log
+                os.remove(os.path.join(diretorio, nome))
+
+        self._ultimo_id = max(
+            itertools.chain((documento.doc_id for documento in self.documentos_ativos()),
+                            (info['max_id'] for info in self.arquivadas.values())),
+            default=0
+        )
+
+    def _caminho(self, mes, arquivado=False):
+        return os.path.join(self.diretorio, f"{mes}.jsonl.gz" if arquivado else f"{mes}.jsonl")
+
+    def _abrir(self, mes):
+        particao = self.ativas[mes] = ParticaoAtiva(self._storage(self._caminho(mes)))
+        return particao
+
+    def _gravar_manifesto(self):
+        self._manifesto.write({'arquivadas': self.arquivadas})
+
+    def _importar_legado(self, caminho_log, caminho_json):
+        """Distribui a tabela única antiga pelas partições, mantendo os ids"""
+        if not os.path.exists(caminho_log) and not os.path.exists(caminho_json):
+            return
+        storage = AppendOnlyStorage(caminho_log, legado=caminho_json)
+        documentos = (storage.read() or {}).get(TABELA, {})
+        storage.close()
+
+        por_mes = {}
+        for doc_id in sorted(documentos, key=int):
+            documento = documentos[doc_id]
+            por_mes.setdefault(mes_da_data(documento.get('data')), []).append(
+                Document(documento, doc_id=int(doc_id))
+            )
+        for mes, docs in por_mes.items():
+            particao = self._abrir(mes)
+            particao.inserir(docs)
+            particao.gravar()
+
+        for caminho in (caminho_log, caminho_json):
+            if os.path.exists(caminho):
+                os.replace(caminho, f"{caminho}.migrado")
+
+    def arquivada(self, mes):
+        return mes in self.arquivadas
+
+    def inserir(self, documentos, indexar=None):
+        """
+        Insere os documentos com os próximos ids, cada um na partição do seu mês
+
+        Args:
+            documentos: dicts a inserir
+            indexar: função chamada com cada Document criado, ainda sob o lock
+
+        Returns:
+            list: Documents criados (com doc_id), na mesma ordem
+        """
+        with self._lock_escrita:
+            por_mes = {}
+            criados = []
+            for documento in documentos:
+                mes = mes_da_data(documento.get('data'))
+                if mes in self.arquivadas:
+                    raise ValueError(f"Partição {mes} arquivada: reabra antes de inserir")
+                criado = Document(documento, doc_id=self._ultimo_id + len(criados) + 1)
+                por_mes.setdefault(mes, []).append(criado)
+                criados.append(criado)
+            self._ultimo_id += len(criados)
+
+            for mes, docs in por_mes.items():
+                particao = self.ativas[mes] if mes in self.ativas else self._abrir(mes)
+                particao.inserir(docs)
+            if indexar:
+                for criado in criados:
+                    indexar(criado)
+            return criados
+
+    def meses_para_arquivar(self, mes_atual):
+        """Partições ativas anteriores ao mês atual ('AAAA-MM')"""
+        return sorted(mes for mes in self.ativas if mes != PARTICAO_OUTROS and mes < mes_atual)
+
+    def arquivar(self, mes):
+        """Compacta a partição do mês em um gzip somente leitura e a retira da memória"""
+        with self._lock_escrita:
+            return self._arquivar(mes)
+
+    def _arquivar(self, mes):
+        particao = self.ativas[mes]
+        documentos = particao.all()
+
+        caminho = self._caminho(mes, arquivado=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            with gzip.GzipFile(fileobj=arquivo, mode='wb', compresslevel=NIVEL_COMPRESSAO, mtime=0) as comprimido:
+                for documento in documentos:
+                    comprimido.write(json.dumps([documento.doc_id, documento]).encode('utf-8') + b'\n')
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+
+        self.arquivadas[mes] = {
+            'total': len(documentos),
+            'min_id': documentos[0].doc_id if documentos else 0,
+            'max_id': documentos[-1].doc_id if documentos else 0,
+            'datas': [min(documento['data'] for documento in documentos),
+                      max(documento['data'] for documento in documentos)] if documentos else None,
+            'barbeiros': sorted({documento['barbeiro'] for documento in documentos}),
+            'clientes': sorted({documento['cliente_email'] for documento in documentos})
+        }
+        self._gravar_manifesto()
+
+        particao.close()
+        del self.ativas[mes]
+        os.remove(self._caminho(mes))
+        return len(documentos)
+
+    def reabrir(self, mes, indexar=None):
+        """
+        Volta um mês arquivado a partição ativa (ex: agendamento em uma data passada)
+
+        Args:
+            mes: 'AAAA-MM'
+            indexar: função chamada com cada Document do mês, ainda sob o lock
+
+        Returns:
+            bool: False se o mês já não estava arquivado (outra reserva o reabriu)
+        """
+        with self._lock_escrita:
+            if mes not in self.arquivadas:
+                return False
+            documentos = self.ler_arquivada(mes).documentos
+            particao = self._abrir(mes)
+            particao.inserir(documentos)
+            particao.gravar()
+            # Indexa antes de deixar de ser arquivado: quem consulta sem o lock
+            # sempre encontra os documentos em um dos dois lugares
+            if indexar:
+                for documento in documentos:
+                    indexar(documento)
+
+            del self.arquivadas[mes]
+            self._filtros_arquivadas.pop(mes, None)
+            self._gravar_manifesto()
+            os.remove(self._caminho(mes, arquivado=True))
+            with self._lock_cache:
+                self._cache.pop(mes, None)
+            return True
+
+    def _abrir_gzip(self, mes):
+        return gzip.open(self._caminho(mes, arquivado=True), 'rb')
+
+    @staticmethod
+    def _ler_gzip(arquivo):
+        with arquivo:
+            for linha in arquivo:
+                doc_id, documento = json.loads(linha)
+                yield Document(documento, doc_id=doc_id)
+
+    def ler_arquivada(self, mes):
+        """Mês arquivado descomprimido (os últimos ARQUIVADAS_EM_CACHE lidos ficam em memória)"""
+        with self._lock_cache:
+            particao = self._cache.get(mes)
+            if particao is not None:
+                self._cache.move_to_end(mes)
+                return particao
+        particao = ParticaoArquivada(mes, list(self._ler_gzip(self._abrir_gzip(mes))))
+        with self._lock_cache:
+            self._cache[mes] = particao
+            while len(self._cache) > self._arquivadas_em_cache:
+                self._cache.popitem(last=False)
+        return particao
+
+    def iterar_arquivada(self, mes, cursor=None):
+        """Documents de um mês arquivado em ordem de id, lidos do gzip sem carregar o mês inteiro"""
+        with self._lock_cache:
+            particao = self._cache.get(mes)
+        if particao is not None:
+            # Em memória: começa direto no cursor (documentos em ordem de id)
+            inicio = bisect.bisect_right(particao.ids, cursor) if cursor is not None else 0
+            return itertools.islice(particao.documentos, inicio, None)
+        # Aberto já na chamada: uma reabertura concorrente pode remover o arquivo
+        documentos = self._ler_gzip(self._abrir_gzip(mes))
+        return (documento for documento in documentos if cursor is None or documento.doc_id > cursor)
+
+    def _filtros(self, mes, info):
+        filtros = self._filtros_arquivadas.get(mes)
+        if filtros is None:
+            # Manifestos antigos não têm os clientes: o mês pode ter qualquer um
+            clientes = set(info['clientes']) if 'clientes' in info else None
+            filtros = self._filtros_arquivadas[mes] = (set(info['barbeiros']), clientes)
+        return filtros
+
+    def meses_arquivados(self, data_inicio=None, data_fim=None, barbeiro=None, cliente_email=None, cursor=None):
+        """
+        Meses arquivados que podem ter agendamentos que passam nos filtros
+
+        Usa só o manifesto (nenhum arquivo é aberto): intervalo de datas,
+        barbeiros e clientes de cada mês, e o maior id (meses inteiros antes
+        do cursor ficam de fora)
+        """
+        meses = []
+        for mes, info in sorted(self.arquivadas.items()):
+            datas = info.get('datas') or (f"{mes}-00", f"{mes}-99")
+            if data_inicio is not None and datas[1] < data_inicio:
+                continue
+            if data_fim is not None and datas[0] > data_fim:
+                continue
+            if cursor is not None and info['max_id'] <= cursor:
+                continue
+            barbeiros, clientes = self._filtros(mes, info)
+            if barbeiro is not None and barbeiro not in barbeiros:
+                continue
+            if cliente_email is not None and clientes is not None and cliente_email not in clientes:
+                continue
+            meses.append(mes)
+        return meses
+
+    def iterar_arquivadas(self, meses, cursor=None):
+        """
+        Documents dos meses arquivados em ordem de id
+
+        Cada mês só é aberto quando a iteração chega ao seu menor id: uma
+        página que termina antes nem descomprime os meses seguintes.
+        """
+        min_ids = {mes: self.arquivadas.get(mes, {}).get('min_id', 0) for mes in meses}
+        # Do maior para o menor min_id: o próximo a abrir fica no fim
+        pendentes = sorted(meses, key=min_ids.get, reverse=True)
+        abertos = []
+        desempate = itertools.count()
+
+        def abrir(mes):
+            try:
+                documentos = self.iterar_arquivada(mes, cursor)
+            except FileNotFoundError:
+                # Reaberto depois da consulta ao manifesto: os documentos
+                # voltaram para as partições ativas
+                return
+            documento = next(documentos, None)
+            if documento is not None:
+                heapq.heappush(abertos, (documento.doc_id, next(desempate), documento, documentos))
+
+        while pendentes or abertos:
+            if not abertos:
+                abrir(pendentes.pop())
+                continue
+            while pendentes and min_ids[pendentes[-1]] <= abertos[0][0]:
+                abrir(pendentes.pop())
+            _, _, documento, documentos = heapq.heappop(abertos)
+            yield documento
+            proximo = next(documentos, None)
+            if proximo is not None:
+                heapq.heappush(abertos, (proximo.doc_id, next(desempate), proximo, documentos))
+
+    def barbeiros_arquivados(self):
+        return {barbeiro for info in self.arquivadas.values() for barbeiro in info['barbeiros']}
+
+    def documentos_ativos(self):
+        """Documents de todas as partições ativas"""
+        for mes in sorted(self.ativas):
+            yield from self.ativas[mes].all()
+
+    def todos(self):
+        """Todos os Documents (ativos e arquivados) em ordem de id"""
+        ativos = sorted(self.documentos_ativos(), key=lambda documento: documento.doc_id)
+        arquivados = self.iterar_arquivadas(self.arquivadas)
+        return heapq.merge(ativos, arquivados, key=lambda documento: documento.doc_id)
+
+    def __len__(self):
+        return (sum(len(particao) for particao in self.ativas.values())
+                + sum(info['total'] for info in self.arquivadas.values()))
+
+    def flush(self):
+        for particao in list(self.ativas.values()):
+            particao.gravar()
+
+    def sincronizar(self, meses):
+        """Grava no disco as inserções pendentes das partições dos meses"""
+        for mes in meses:
+            particao = self.ativas.get(mes)
+            # Mês arquivado nesse meio tempo: o gzip já tem os documentos
+            if particao is not None:
+                particao.gravar()
+
+    def close(self):
+        with self._lock_escrita:
+            for particao in self.ativas.values():
+                particao.close()
@@ -0,0 +1,269 @@
+"""
+Backend SQLite para o db_manager
+Mesmas tabelas Cliente e Agendamento em um único arquivo SQLite (modo WAL),
+permitindo vários processos (ex: workers do gunicorn) no mesmo arquivo
+"""
+import os
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    sobrenome TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    celular TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS agendamentos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cliente_email TEXT NOT NULL,
+    barbeiro TEXT NOT NULL,
+    data TEXT NOT NULL,
+    horario TEXT NOT NULL,
+    status TEXT NOT NULL,
+    UNIQUE (barbeiro, data, horario)
+);
+
+CREATE INDEX IF NOT EXISTS idx_agendamentos_cliente_email ON agendamentos (cliente_email);
+"""
+
+COLUNAS_CLIENTE = ('nome', 'sobrenome', 'email', 'celular')
+COLUNAS_AGENDAMENTO = ('cliente_email', 'barbeiro', 'data', 'horario', 'status')
+
+# Máximo de parâmetros em um IN (...)
+LIMITE_PARAMETROS = 500
+
+
+class SQLiteBackend:
+    """
+    Implementa as funções do db_manager sobre SQLite
+
+    Cada thread usa a sua própria conexão; o modo WAL permite leituras
+    concorrentes com um escritor, e o índice UNIQUE (barbeiro, data, horario)
+    impede dois agendamentos no mesmo horário mesmo entre processos.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        conexao = self._conexao()
+        conexao.executescript(SCHEMA)
+        conexao.commit()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.path, timeout=30)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+        return conexao
+
+    @staticmethod
+    def _documento(linha, colunas):
+        return {coluna: linha[coluna] for coluna in colunas}
+
+    def get_cliente_by_email(self, email):
+        cliente = self.get_cliente_by_email_object(email)
+        return [cliente] if cliente else []
+
+    def get_cliente_by_email_object(self, email):
+        linha = self._conexao().execute(
+            'SELECT * FROM clientes WHERE email = ?', (email,)
+        ).fetchone()
+        return self._documento(linha, COLUNAS_CLIENTE) if linha else None
+
+    def create_cliente(self, nome, sobrenome, email, celular):
+        conexao = self._conexao()
+        with conexao:
+            cursor = conexao.execute(
+                'INSERT INTO clientes (nome, sobrenome, email, celular) VALUES (?, ?, ?, ?)',
+                (nome, sobrenome, email, celular)
+            )
+        return cursor.lastrowid
+
+    def create_clientes_lote(self, clientes):
+        # INSERT OR IGNORE: emails já cadastrados (ou repetidos no lote) ficam com None
+        conexao = self._conexao()
+        ids = []
+        with conexao:
+            for cliente in clientes:
+                cursor = conexao.execute(
+                    'INSERT OR IGNORE INTO clientes (nome, sobrenome, email, celular) VALUES (?, ?, ?, ?)',
+                    (cliente['nome'], cliente['sobrenome'], cliente['email'], cliente['celular'])
+                )
+                ids.append(cursor.lastrowid if cursor.rowcount else None)
+        return ids
+
+    def get_emails_cadastrados(self, emails):
+        emails = list(emails)
+        cadastrados = set()
+        conexao = self._conexao()
+        # Consultas em blocos (limite de parâmetros por comando do SQLite)
+        for inicio in range(0, len(emails), LIMITE_PARAMETROS):
+            bloco = emails[inicio:inicio + LIMITE_PARAMETROS]
+            linhas = conexao.execute(
+                f"SELECT email FROM clientes WHERE email IN ({','.join('?' * len(bloco))})", bloco
+            )
+            cadastrados.update(email for (email,) in linhas)
+        return cadastrados
+
+    def get_agendamento_by_barbeiro_data_horario(self, barbeiro, data, horario):
+        linhas = self._conexao().execute(
+            'SELECT * FROM agendamentos WHERE barbeiro = ? AND data = ? AND horario = ?',
+            (barbeiro, data, horario)
+        ).fetchall()
+        return [self._documento(linha, COLUNAS_AGENDAMENTO) for linha in linhas]
+
+    def get_agendamentos_by_barbeiro_data(self, barbeiro, data):
+        linhas = self._conexao().execute(
+            'SELECT * FROM agendamentos WHERE barbeiro = ? AND data = ? ORDER BY id',
+            (barbeiro, data)
+        ).fetchall()
+        return [self._documento(linha, COLUNAS_AGENDAMENTO) for linha in linhas]
+
+    def create_agendamento(self, cliente_email, barbeiro, data, horario, status='confirmado'):
+        conexao = self._conexao()
+        with conexao:
+            cursor = conexao.execute(
+                'INSERT INTO agendamentos (cliente_email, barbeiro, data, horario, status) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (cliente_email, barbeiro, data, horario, status)
+            )
+        return cursor.lastrowid
+
+    def create_agendamentos_lote(self, agendamentos):
+        conexao = self._conexao()
+        ids = []
+        with conexao:
+            for agendamento in agendamentos:
+                cursor = conexao.execute(
+                    'INSERT INTO agendamentos (cliente_email, barbeiro, data, horario, status) '
+                    "VALUES (?, ?, ?, ?, 'confirmado')",
+                    (agendamento['cliente_email'], agendamento['barbeiro'],
+                     agendamento['data'], agendamento['horario'])
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def get_horarios_ocupados(self, barbeiro, data):
+        linhas = self._conexao().execute(
+            'SELECT horario FROM agendamentos WHERE barbeiro = ? AND data = ?', (barbeiro, data)
+        )
+        return [horario for (horario,) in linhas]
+
+    def listar_barbeiros(self):
+        linhas = self._conexao().execute('SELECT DISTINCT barbeiro FROM agendamentos ORDER BY barbeiro')
+        return [barbeiro for (barbeiro,) in linhas]
+
+    def get_id_agendamento_do_cliente(self, cliente_email, barbeiro, data, horario):
+        linha = self._conexao().execute(
+            'SELECT id FROM agendamentos WHERE barbeiro = ? AND data = ? AND horario = ? AND cliente_email = ?',
+            (barbeiro, data, horario, cliente_email)
+        ).fetchone()
+        return linha[0] if linha else None
+
+    def reserve_slot(self, cliente_email, barbeiro, data, horario):
+        return self.reservar_slots_lote([{
+            'cliente_email': cliente_email, 'barbeiro': barbeiro, 'data': data, 'horario': horario
+        }])[0]
+
+    def reservar_slots_lote(self, agendamentos):
+        # O índice UNIQUE decide qual reserva vence. Só o conflito de horário
+        # é ignorado (ON CONFLICT do slot, não OR IGNORE): NOT NULL e outras
+        # violações continuam sendo erros e não viram "horário ocupado"
+        conexao = self._conexao()
+        ids = []
+        with conexao:
+            for agendamento in agendamentos:
+                cursor = conexao.execute(
+                    'INSERT INTO agendamentos (cliente_email, barbeiro, data, horario, status) '
+                    "VALUES (?, ?, ?, ?, 'confirmado') "
+                    'ON CONFLICT (barbeiro, data, horario) DO NOTHING',
+                    (agendamento['cliente_email'], agendamento['barbeiro'],
+                     agendamento['data'], agendamento['horario'])
+                )
+                ids.append(cursor.lastrowid if cursor.rowcount else None)
+        return ids
+
+    def listar_clientes(self):
+        linhas = self._conexao().execute('SELECT * FROM clientes ORDER BY id')
+        return [self._documento(linha, COLUNAS_CLIENTE) for linha in linhas]
+
+    def listar_agendamentos(self):
+        linhas = self._conexao().execute('SELECT * FROM agendamentos ORDER BY id')
+        return [self._documento(linha, COLUNAS_AGENDAMENTO) for linha in linhas]
+
+    def iterar_clientes(self, cursor=None):
+        linhas = self._conexao().execute(
+            'SELECT * FROM clientes WHERE id > ? ORDER BY id', (cursor or 0,)
+        )
+        for linha in linhas:
+            yield dict(self._documento(linha, COLUNAS_CLIENTE), id=linha['id'])
+
+    def iterar_agendamentos(self, cursor=None, barbeiro=None, data_inicio=None, data_fim=None,
+                            cliente_email=None):
+        condicoes = ['id > ?']
+        parametros = [cursor or 0]
+        for condicao, valor in (('barbeiro = ?', barbeiro), ('data >= ?', data_inicio),
+                                ('data <= ?', data_fim), ('cliente_email = ?', cliente_email)):
+            if valor is not None:
+                condicoes.append(condicao)
+                parametros.append(valor)
+
+        # Cursor próprio: as linhas são lidas do SQLite conforme a iteração avança
+        linhas = self._conexao().cursor().execute(
+            f"SELECT * FROM agendamentos WHERE {' AND '.join(condicoes)} ORDER BY id", parametros
+        )
+        for linha in linhas:
+            yield dict(self._documento(linha, COLUNAS_AGENDAMENTO), id=linha['id'])
+
+    def importar(self, clientes, agendamentos):
+        """
+        Importa documentos existentes mantendo os ids originais
+
+        Args:
+            clientes: dict {doc_id: documento} da tabela de clientes
+            agendamentos: dict {doc_id: documento} da tabela de agendamentos
+
+        Returns:
+            tuple: (clientes importados, agendamentos importados)
+        """
+        conexao = self._conexao()
+        with conexao:
+            antes = conexao.total_changes
+            conexao.executemany(
+                'INSERT OR IGNORE INTO clientes (id, nome, sobrenome, email, celular) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(int(doc_id),) + tuple(doc.get(c) for c in COLUNAS_CLIENTE)
+                 for doc_id, doc in clientes.items()]
+            )
+            total_clientes = conexao.total_changes - antes
+
+            antes = conexao.total_changes
+            conexao.executemany(
+                'INSERT OR IGNORE INTO agendamentos '
+                '(id, cliente_email, barbeiro, data, horario, status) VALUES (?, ?, ?, ?, ?, ?)',
+                [(int(doc_id),) + tuple(doc.get(c, 'confirmado') if c == 'status' else doc.get(c)
+                                        for c in COLUNAS_AGENDAMENTO)
+                 for doc_id, doc in agendamentos.items()]
+            )
+            total_agendamentos = conexao.total_changes - antes
+        return total_clientes, total_agendamentos
+
+    def flush(self):
+        """Nada a fazer: cada escrita já é confirmada na sua transação"""
+
+    def close(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None:
+            conexao.close()
+            self._local.conexao = None
@@ -0,0 +1,399 @@
+"""
+Storages do TinyDB usados pelo db_manager
+Escrita atômica em JSON e middleware que agrupa várias escritas em um único flush
+"""
+from tinydb.storages import Storage
+from tinydb.middlewares import Middleware
+from observabilidade.metricas import registro
+import json
+import os
+import threading
+
+_duracao_gravacao = registro.histograma(
+    'db_gravacao_segundos', 'Duração de cada gravação das tabelas TinyDB no disco', rotulos=('storage',)
+)
+
+
+class AtomicJSONStorage(Storage):
+    """
+    Storage JSON que nunca deixa o arquivo pela metade
+
+    O conteúdo é gravado em um arquivo temporário, sincronizado no disco e
+    então renomeado sobre o original (os.replace é atômico), de modo que uma
+    queda do processo no meio da escrita preserva a última versão completa.
+    """
+
+    def __init__(self, path, encoding='utf-8', **kwargs):
+        self.path = path
+        self.encoding = encoding
+        self.kwargs = kwargs
+
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def read(self):
+        try:
+            with open(self.path, encoding=self.encoding) as arquivo:
+                conteudo = arquivo.read()
+        except FileNotFoundError:
+            return None
+
+        if not conteudo.strip():
+            return None
+        return json.loads(conteudo)
+
+    def write(self, data):
+        temporario = f"{self.path}.tmp"
+        with open(temporario, 'w', encoding=self.encoding) as arquivo:
+            json.dump(data, arquivo, **self.kwargs)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.path)
+
+
+class BatchingMiddleware(Middleware):
+    """
+    Agrupa escritas do TinyDB e grava tudo de uma vez
+
+    Leituras e escritas operam sobre uma cópia em memória; o storage real só
+    é chamado quando `max_pendentes` escritas se acumulam ou quando
+    `intervalo` segundos se passam desde a primeira escrita pendente. No pior
+    caso uma queda perde apenas essa janela, e `flush()`/`close()` devem ser
+    chamados no encerramento para não perder nada.
+
+    Quem precisa da escrita no disco antes de responder (ex: confirmar um
+    agendamento) chama `sincronizar()`: as chamadas concorrentes são
+    atendidas pela mesma gravação (group commit).
+
+    Uso:
+        TinyDB('arquivo.json', storage=BatchingMiddleware(AtomicJSONStorage))
+    """
+
+    def __init__(self, storage_cls, max_pendentes=100, intervalo=0.5):
+        super().__init__(storage_cls)
+        self.max_pendentes = max_pendentes
+        self.intervalo = intervalo
+        self.cache = None
+        self.pendentes = 0
+        self._lock = threading.RLock()
+        self._timer = None
+        # Escritas recebidas e escritas já gravadas (para o group commit)
+        self._versao = 0
+        self._versao_gravada = 0
+        self._lock_sincronizar = threading.Lock()
+
+    def read(self):
+        with self._lock:
+            if self.cache is None:
+                self.cache = self.storage.read() or {}
+            # Cópia rasa: o TinyDB altera o dicionário recebido antes de
+            # chamar write(), e o flush pode estar serializando o atual
+            return dict(self.cache)
+
+    def write(self, data):
+        with self._lock:
+            self.cache = data
+            self.pendentes += 1
+            self._versao += 1
+
+            if self.pendentes >= self.max_pendentes:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.intervalo, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Grava no storage real todas as escritas pendentes"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self.pendentes:
+                with _duracao_gravacao.cronometrar(storage=type(self.storage).__name__):
+                    self.storage.write(self.cache)
+                self.pendentes = 0
+            self._versao_gravada = self._versao
+
+    def sincronizar(self):
+        """Retorna só depois que as escritas feitas até agora estão no disco"""
+        with self._lock:
+            alvo = self._versao
+        with self._lock_sincronizar:
+            # Uma gravação feita enquanto esta chamada esperava já cobre o alvo
+            if self._versao_gravada < alvo:
+                self.flush()
+
+    def close(self):
+        self.flush()
+        self.storage.close()
+
+
+class AppendOnlyStorage(Storage):
+    """
+    Storage em log JSON-lines somente de anexação
+
+    Feito para tabelas em que os documentos só são inseridos (agendamentos):
+    cada write() anexa ao arquivo apenas os documentos novos, então o custo
+    de um insert não cresce com o tamanho da tabela. Qualquer outra alteração
+    (remoção, truncate ou update sem inserts no mesmo write) é detectada pela
+    contagem de documentos e gravada como um snapshot completo no log.
+
+    Formato de cada linha:
+        {"t": "<tabela>", "id": "<doc_id>", "doc": {...}}   insert
+        {"snapshot": {...}}                                  estado completo
+
+    Na inicialização o estado é reconstruído reproduzindo o log; uma última
+    linha incompleta (queda no meio de um append) é descartada. Quando o
+    número de inserts desde o último snapshot supera o tamanho do próprio
+    snapshot o log é compactado em um único snapshot, mantendo o custo
+    amortizado constante.
+
+    Além da interface de Storage do TinyDB (read/write, que compara o estado
+    inteiro a cada escrita), há uma interface por documento sem o TinyDB:
+    `anexar` acrescenta documentos ao estado e enfileira as suas linhas, com
+    custo proporcional aos documentos inseridos e não ao tamanho da tabela,
+    e `gravar_pendentes` grava as linhas enfileiradas (group commit). As
+    duas interfaces não devem ser misturadas na mesma instância.
+    """
+
+    def __init__(self, path, legado=None, compactar_minimo=1000, sincronizar=True, encoding='utf-8'):
+        self.path = path
+        self.legado = legado
+        self.compactar_minimo = compactar_minimo
+        self.sincronizar = sincronizar
+        self.encoding = encoding
+
+        self._dados = None
+        self._contagem = {}
+        self._ultimo_id = {}
+        self._tamanho_snapshot = 0
+        self._registros_desde_snapshot = 0
+        self._arquivo = None
+
+        # Interface por documento: linhas anexadas ainda não gravadas. _lock
+        # protege o estado em memória; _lock_gravacao ordena as gravações no
+        # arquivo, sem bloquear quem anexa durante o fsync
+        self._pendentes = []
+        self._versao = 0
+        self._versao_gravada = 0
+        self._lock = threading.RLock()
+        self._lock_gravacao = threading.RLock()
+
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def read(self):
+        with self._lock:
+            if self._dados is None:
+                self._dados = self._recuperar()
+                self._recalcular_estatisticas()
+            return dict(self._dados) if self._dados else None
+
+    def tabela(self, nome):
+        """Dicionário {doc_id: documento} da tabela, o próprio usado pelo storage (só leitura: use anexar)"""
+        with self._lock:
+            if self._dados is None:
+                self.read()
+            return self._dados.setdefault(nome, {})
+
+    def anexar(self, tabela, documentos):
+        """
+        Acrescenta documentos à tabela sem gravar no disco (ver gravar_pendentes)
+
+        Args:
+            tabela: nome da tabela
+            documentos: Documents com doc_id maior que o de todos os existentes
+        """
+        if not documentos:
+            return
+        linhas = [json.dumps({'t': tabela, 'id': str(documento.doc_id), 'doc': documento})
+                  for documento in documentos]
+        with self._lock:
+            docs = self.tabela(tabela)
+            for documento in documentos:
+                docs[str(documento.doc_id)] = documento
+            self._contagem[tabela] = len(docs)
+            self._ultimo_id[tabela] = documentos[-1].doc_id
+            self._pendentes.extend(linhas)
+            self._registros_desde_snapshot += len(linhas)
+            self._versao += 1
+
+    def gravar_pendentes(self):
+        """
+        Grava as linhas anexadas até agora e só então retorna
+
+        Chamadas concorrentes são atendidas pela mesma gravação (group commit).
+        """
+        with self._lock:
+            alvo = self._versao
+        with self._lock_gravacao:
+            # Uma gravação feita enquanto esta chamada esperava já cobre o alvo
+            if self._versao_gravada >= alvo:
+                return
+            with self._lock:
+                linhas, self._pendentes = self._pendentes, []
+                versao = self._versao
+                compactar = self._registros_desde_snapshot >= max(self.compactar_minimo, self._tamanho_snapshot)
+            if compactar:
+                # O snapshot já inclui as linhas pendentes
+                self.compactar()
+                return
+            if linhas:
+                self._anexar(linhas)
+            self._versao_gravada = versao
+
+    def write(self, data):
+        with self._lock_gravacao, self._lock:
+            self._write(data)
+
+    def _write(self, data):
+        if self._dados is None:
+            self.read()
+
+        linhas = []
+        precisa_snapshot = bool(set(self._dados) - set(data))
+
+        for tabela, documentos in data.items():
+            if precisa_snapshot:
+                break
+            if documentos is self._dados.get(tabela):
+                continue
+
+            # Documentos novos ficam no fim do dicionário, com ids crescentes
+            ultimo_id = self._ultimo_id.get(tabela, 0)
+            novos = []
+            for doc_id in reversed(documentos):
+                if int(doc_id) <= ultimo_id:
+                    break
+                novos.append(doc_id)
+            novos.reverse()
+
+            if not novos or len(documentos) != self._contagem.get(tabela, 0) + len(novos):
+                precisa_snapshot = True
+                break
+
+            for doc_id in novos:
+                linhas.append(json.dumps({'t': tabela, 'id': doc_id, 'doc': documentos[doc_id]}))
+            self._contagem[tabela] = len(documentos)
+            self._ultimo_id[tabela] = int(novos[-1])
+
+        self._dados = dict(data)
+
+        if precisa_snapshot:
+            self._anexar([json.dumps({'snapshot': data})])
+            self._recalcular_estatisticas()
+            self._tamanho_snapshot = sum(self._contagem.values())
+            self._registros_desde_snapshot = 0
+        elif linhas:
+            self._anexar(linhas)
+            self._registros_desde_snapshot += len(linhas)
+
+        if self._registros_desde_snapshot >= max(self.compactar_minimo, self._tamanho_snapshot):
+            self.compactar()
+
+    def compactar(self):
+        """Reescreve o log como um único snapshot do estado atual"""
+        with self._lock_gravacao, self._lock:
+            if self._dados is None:
+                self.read()
+
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+            temporario = f"{self.path}.tmp"
+            with open(temporario, 'w', encoding=self.encoding) as arquivo:
+                arquivo.write(json.dumps({'snapshot': self._dados}) + '\n')
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            os.replace(temporario, self.path)
+
+            self._tamanho_snapshot = sum(len(docs) for docs in self._dados.values())
+            self._registros_desde_snapshot = 0
+            # O snapshot cobre tudo o que foi anexado
+            self._pendentes = []
+            self._versao_gravada = self._versao
+
+    def close(self):
+        self.gravar_pendentes()
+        with self._lock_gravacao:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+    def _anexar(self, linhas):
+        if self._arquivo is None:
+            self._arquivo = open(self.path, 'a', encoding=self.encoding)
+        self._arquivo.write('\n'.join(linhas) + '\n')
+        self._arquivo.flush()
+        if self.sincronizar:
+            os.fsync(self._arquivo.fileno())
+
+    def _recalcular_estatisticas(self):
+        self._contagem = {tabela: len(docs) for tabela, docs in self._dados.items()}
+        self._ultimo_id = {
+            tabela: max((int(doc_id) for doc_id in docs), default=0)
+            for tabela, docs in self._dados.items()
+        }
+
+    def _recuperar(self):
+        """Reconstrói o estado reproduzindo o log (ou importa o JSON legado)"""
+        if not os.path.exists(self.path):
+            if self.legado and os.path.exists(self.legado):
+                legado = AtomicJSONStorage(self.legado).read() or {}
+                self._dados = legado
+                self.compactar()
+                return legado
+            return {}
+
+        with open(self.path, 'rb') as arquivo:
+            dados, fim_valido, inserts, self._tamanho_snapshot = reproduzir_log(arquivo)
+
+        # Descarta a cauda corrompida para que os próximos appends fiquem íntegros
+        if fim_valido < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as arquivo:
+                arquivo.truncate(fim_valido)
+
+        self._registros_desde_snapshot = inserts
+        return dados
+
+
+def reproduzir_log(arquivo):
+    """
+    Reconstrói o estado de um log do AppendOnlyStorage sem alterar o arquivo
+
+    Args:
+        arquivo: log aberto em modo binário
+
+    Returns:
+        tuple: (dados, bytes da parte íntegra do log, inserts desde o último
+            snapshot, documentos do último snapshot)
+    """
+    dados = {}
+    fim_valido = 0
+    inserts = 0
+    tamanho_snapshot = 0
+
+    for linha in arquivo:
+        # Uma última linha incompleta (queda no meio de um append) é ignorada
+        if not linha.endswith(b'\n'):
+            break
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            break
+
+        if 'snapshot' in registro:
+            dados = registro['snapshot']
+            tamanho_snapshot = sum(len(docs) for docs in dados.values())
+            inserts = 0
+        else:
+            dados.setdefault(registro['t'], {})[registro['id']] = registro['doc']
+            inserts += 1
+        fim_valido += len(linha)
+
+    return dados, fim_valido, inserts, tamanho_snapshot
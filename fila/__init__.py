@@ -0,0 +1 @@
+# Fila package
@@ -0,0 +1,109 @@
+"""
+Buffer FIFO bloqueante usado pelos simuladores
+Consumidores dormem em uma Condition até chegar mensagem (sem polling)
+"""
+from collections import deque
+import threading
+import time
+
+
+class BufferBloqueante:
+    """
+    Fila FIFO thread-safe com espera bloqueante e limite opcional
+
+    Implementada sobre deque + Condition. `fechar()` acorda todos os
+    consumidores em espera, que passam a retornar imediatamente.
+
+    Vários buffers podem compartilhar a mesma Condition (parâmetro
+    `condicao`), permitindo esperar por qualquer um deles com `receber()`.
+    """
+
+    def __init__(self, capacidade=None, condicao=None):
+        self.capacidade = capacidade
+        self._itens = deque()
+        self._condicao = condicao or threading.Condition()
+        self.fechado = False
+
+    def put(self, item, timeout=None):
+        """
+        Adiciona um item, esperando vaga se o buffer tiver capacidade
+
+        Returns:
+            bool: False se não houve vaga dentro do timeout
+        """
+        with self._condicao:
+            if self.capacidade is not None:
+                if not self._condicao.wait_for(lambda: len(self._itens) < self.capacidade, timeout):
+                    return False
+            self._itens.append(item)
+            self._condicao.notify_all()
+            return True
+
+    def put_lote(self, itens, timeout=None):
+        """Adiciona vários itens de uma vez (uma única notificação aos consumidores)"""
+        with self._condicao:
+            if self.capacidade is not None:
+                if not self._condicao.wait_for(
+                    lambda: len(self._itens) + len(itens) <= self.capacidade, timeout
+                ):
+                    return False
+            self._itens.extend(itens)
+            self._condicao.notify_all()
+            return True
+
+    def get(self, timeout=0):
+        """Retorna o próximo item, esperando até `timeout` segundos (None se vazio)"""
+        itens = self.get_lote(1, timeout)
+        return itens[0] if itens else None
+
+    def get_lote(self, max_itens, timeout=0):
+        """Retorna até `max_itens` itens, esperando até `timeout` pelo primeiro"""
+        return receber([self], max_itens, timeout)
+
+    def fechar(self):
+        """Acorda os consumidores em espera e impede novas esperas"""
+        with self._condicao:
+            self.fechado = True
+            self._condicao.notify_all()
+
+    def abrir(self):
+        """Volta a permitir esperas bloqueantes"""
+        with self._condicao:
+            self.fechado = False
+
+    def __len__(self):
+        return len(self._itens)
+
+
+def receber(buffers, max_itens, timeout=0):
+    """
+    Retira até `max_itens` itens do primeiro buffer que tiver mensagens
+
+    Todos os buffers devem compartilhar a mesma Condition. Espera até
+    `timeout` segundos enquanto todos estiverem vazios (e nenhum fechado).
+
+    Returns:
+        list: itens retirados (vazia se nada chegou a tempo)
+    """
+    condicao = buffers[0]._condicao
+    with condicao:
+        def vazio():
+            return not any(buffer._itens for buffer in buffers)
+
+        if timeout and vazio():
+            fim = time.monotonic() + timeout
+            while vazio() and not any(buffer.fechado for buffer in buffers):
+                restante = fim - time.monotonic()
+                if restante <= 0:
+                    break
+                condicao.wait(restante)
+
+        itens = []
+        for buffer in buffers:
+            while buffer._itens and len(itens) < max_itens:
+                itens.append(buffer._itens.popleft())
+            if len(itens) == max_itens:
+                break
+        if itens and any(buffer.capacidade is not None for buffer in buffers):
+            condicao.notify_all()
+        return itens
@@ -0,0 +1,72 @@
+"""
+Deduplicação por chave com janela de tempo
+Equivalente ao MessageDeduplicationId das filas FIFO do SQS: uma chave vista
+nos últimos `ttl` segundos identifica uma repetição do mesmo envio
+"""
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+# Janela de deduplicação do SQS FIFO (5 minutos)
+JANELA_DEDUPLICACAO = 300
+
+
+def chave_deduplicacao(*campos):
+    """Chave derivada do conteúdo (ex: cliente_email, barbeiro, data, horario)"""
+    return hashlib.sha256('\x1f'.join(str(campo) for campo in campos).encode('utf-8')).hexdigest()
+
+
+class CacheDeduplicacao:
+    """
+    Chaves vistas recentemente, com expiração e capacidade limitada
+
+    Como todas as entradas têm o mesmo TTL, a ordem de inserção é a ordem de
+    expiração: as expiradas são removidas do início do OrderedDict. Ao
+    atingir a capacidade, a chave mais antiga é descartada.
+    """
+
+    def __init__(self, ttl=JANELA_DEDUPLICACAO, capacidade=100000):
+        self.ttl = ttl
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expirar(self, agora):
+        while self._entradas:
+            chave, (expira_em, _) = next(iter(self._entradas.items()))
+            if expira_em > agora:
+                break
+            del self._entradas[chave]
+
+    def registrar(self, chave, valor=None):
+        """
+        Registra a chave se ela não foi vista dentro da janela
+
+        Returns:
+            tuple: (True, None) se a chave é nova, ou (False, valor) com o
+                valor guardado no primeiro registro se é uma repetição
+        """
+        agora = time.monotonic()
+        with self._lock:
+            self._expirar(agora)
+            if chave in self._entradas:
+                return False, self._entradas[chave][1]
+            if len(self._entradas) >= self.capacidade:
+                self._entradas.popitem(last=False)
+            self._entradas[chave] = (agora + self.ttl, valor)
+            return True, None
+
+    def atualizar(self, chave, valor):
+        """Troca o valor de uma chave registrada sem renovar a janela"""
+        with self._lock:
+            if chave in self._entradas:
+                self._entradas[chave] = (self._entradas[chave][0], valor)
+
+    def remover(self, chave):
+        """Libera a chave (ex: o envio falhou e pode ser repetido)"""
+        with self._lock:
+            self._entradas.pop(chave, None)
+
+    def __len__(self):
+        return len(self._entradas)
@@ -0,0 +1,443 @@
+"""
+Fila SQS persistente em SQLite
+Mensagens sobrevivem a reinícios do app; recebimento com receipt handle,
+timeout de visibilidade, confirmação explícita (delete), contagem de
+tentativas e dead-letter queue
+"""
+from fila.sqs_simulator import (
+    MAX_BATCH, WAIT_TIME_SECONDS, mensagens_enviadas, mensagens_duplicadas,
+    mensagens_processadas, duracao_processamento, log
+)
+from fila.deduplicacao import JANELA_DEDUPLICACAO
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mensagens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT NOT NULL,
+    corpo TEXT NOT NULL,
+    grupo TEXT,
+    enviado_em REAL NOT NULL,
+    visivel_em REAL NOT NULL,
+    recebimentos INTEGER NOT NULL DEFAULT 0,
+    receipt_handle TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_mensagens_grupo ON mensagens (grupo, id);
+CREATE INDEX IF NOT EXISTS idx_mensagens_receipt ON mensagens (receipt_handle);
+
+CREATE TABLE IF NOT EXISTS dead_letter (
+    id INTEGER PRIMARY KEY,
+    message_id TEXT NOT NULL,
+    corpo TEXT NOT NULL,
+    grupo TEXT,
+    enviado_em REAL NOT NULL,
+    recebimentos INTEGER NOT NULL,
+    movido_em REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS deduplicacao (
+    deduplication_id TEXT PRIMARY KEY,
+    expira_em REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_deduplicacao_expira ON deduplicacao (expira_em);
+"""
+
+# Só a mensagem mais antiga de cada grupo pode ser entregue (ordem FIFO por
+# grupo); mensagens sem grupo não têm restrição
+SQL_VISIVEIS = """
+SELECT id, message_id, corpo, grupo, recebimentos FROM mensagens AS m
+WHERE visivel_em <= ?
+  AND (grupo IS NULL OR id = (SELECT MIN(id) FROM mensagens WHERE grupo = m.grupo))
+ORDER BY id
+LIMIT ?
+"""
+
+
+class DurableSQSSimulator:
+    """
+    Fila durável com a mesma interface do SQSSimulator
+
+    - send_message / send_message_batch só retornam depois que a mensagem
+      foi gravada no disco. As gravações concorrentes são agrupadas por uma
+      thread dedicada em uma única transação (group commit), então há um
+      fsync por grupo e não por mensagem.
+    - receive_message / receive_message_batch retornam dicts no formato do
+      SQS (MessageId, ReceiptHandle, Body, Attributes). A mensagem fica
+      invisível por `visibility_timeout` segundos e volta para a fila se não
+      for confirmada com delete_message.
+    - Depois de `max_receive_count` recebimentos sem confirmação a mensagem
+      vai para a dead-letter queue (ver `listar_dlq`).
+    - O processador confirma cada mensagem cujo callback terminou sem
+      exceção (e que o batch_callback não apontou como falha); as que
+      falharem são reentregues após o timeout.
+    - Os `message_deduplication_id` ficam gravados por `janela_deduplicacao`
+      segundos (inclusive entre reinícios); um envio repetido nesse período
+      é aceito sem gravar a mensagem de novo.
+    """
+
+    def __init__(self, path, num_workers=1, visibility_timeout=30, max_receive_count=5,
+                 wait_time_seconds=WAIT_TIME_SECONDS, janela_deduplicacao=JANELA_DEDUPLICACAO):
+        self.path = path
+        self.janela_deduplicacao = janela_deduplicacao
+        self.num_workers = max(1, num_workers)
+        self.visibility_timeout = visibility_timeout
+        self.max_receive_count = max_receive_count
+        self.wait_time_seconds = wait_time_seconds
+        self.is_processing = False
+        self.processor_threads = []
+        self._processador_pendente = None
+        self._lock_processador = threading.Lock()
+
+        self._local = threading.local()
+        self._disponivel = threading.Condition()
+        self._versao = 0
+        self._fechado = False
+
+        # Group commit: envios pendentes aguardando a thread de gravação
+        self._pendentes = []
+        self._lock_pendentes = threading.Condition()
+        self._gravador = None
+
+        diretorio = os.path.dirname(path)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+        conexao = self._conexao()
+        conexao.executescript(SCHEMA)
+        conexao.commit()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+        return conexao
+
+    # Envio (group commit)
+
+    def _iniciar_gravador(self):
+        with self._lock_pendentes:
+            if self._gravador is None:
+                self._gravador = threading.Thread(target=self._gravar_pendentes, name='sqs-gravador', daemon=True)
+                self._gravador.start()
+
+    def _gravar_pendentes(self):
+        conexao = self._conexao()
+        # Envios precisam chegar ao disco antes de serem confirmados
+        conexao.execute('PRAGMA synchronous=FULL')
+
+        while True:
+            with self._lock_pendentes:
+                self._lock_pendentes.wait_for(lambda: self._pendentes)
+                lote, self._pendentes = self._pendentes, []
+
+            erro = None
+            duplicadas = set()
+            try:
+                agora = time.time()
+                conexao.execute('BEGIN IMMEDIATE')
+                conexao.execute('DELETE FROM deduplicacao WHERE expira_em <= ?', (agora,))
+                novas = []
+                for linhas, _ in lote:
+                    for message_id, corpo, grupo, deduplication_id in linhas:
+                        if deduplication_id is not None and conexao.execute(
+                            'INSERT OR IGNORE INTO deduplicacao (deduplication_id, expira_em) VALUES (?, ?)',
+                            (deduplication_id, agora + self.janela_deduplicacao)
+                        ).rowcount == 0:
+                            duplicadas.add(message_id)
+                            continue
+                        novas.append((message_id, corpo, grupo, agora, agora))
+                conexao.executemany(
+                    'INSERT INTO mensagens (message_id, corpo, grupo, enviado_em, visivel_em) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    novas
+                )
+                conexao.execute('COMMIT')
+            except Exception as e:
+                if conexao.in_transaction:
+                    conexao.execute('ROLLBACK')
+                erro = e
+                duplicadas = set()
+
+            if erro is None:
+                mensagens_enviadas.inc(len(novas))
+                mensagens_duplicadas.inc(len(duplicadas))
+
+            for linhas, pedido in lote:
+                pedido['erro'] = erro
+                pedido['duplicadas'] = {linha[0] for linha in linhas if linha[0] in duplicadas}
+                pedido['evento'].set()
+
+            self._avisar()
+
+    def _enfileirar(self, linhas):
+        """Entrega as linhas ao gravador; retorna os message_ids descartados como duplicados"""
+        self._iniciar_gravador()
+        pedido = {'evento': threading.Event(), 'erro': None, 'duplicadas': set()}
+        with self._lock_pendentes:
+            self._pendentes.append((linhas, pedido))
+            self._lock_pendentes.notify()
+        pedido['evento'].wait()
+        if pedido['erro'] is not None:
+            raise pedido['erro']
+        return pedido['duplicadas']
+
+    def send_message(self, message_body, message_group_id=None, message_deduplication_id=None):
+        """Grava a mensagem na fila; retorna depois de persistida"""
+        message_id = str(uuid.uuid4())
+        grupo = None if message_group_id is None else str(message_group_id)
+        if self._enfileirar([(message_id, message_body, grupo, message_deduplication_id)]):
+            log.info('mensagem duplicada ignorada', deduplication_id=message_deduplication_id)
+        else:
+            log.debug('mensagem gravada na fila', message_id=message_id, grupo=grupo)
+        if self._processador_pendente:
+            self._iniciar_processador_pendente()
+        return True
+
+    def send_message_batch(self, entries):
+        """Grava até 10 mensagens em uma única transação (ver SQSSimulator.send_message_batch)"""
+        if not 1 <= len(entries) <= MAX_BATCH:
+            raise ValueError(f"O lote deve ter entre 1 e {MAX_BATCH} mensagens")
+
+        resultado = {'Successful': [], 'Failed': []}
+        linhas = []
+        for entry in entries:
+            if 'MessageBody' not in entry:
+                resultado['Failed'].append({'Id': entry.get('Id'), 'Message': 'MessageBody ausente'})
+                continue
+            message_id = str(uuid.uuid4())
+            grupo = entry.get('MessageGroupId')
+            linhas.append((message_id, entry['MessageBody'], None if grupo is None else str(grupo),
+                           entry.get('MessageDeduplicationId')))
+            resultado['Successful'].append({'Id': entry.get('Id'), 'MessageId': message_id})
+
+        duplicadas = self._enfileirar(linhas) if linhas else set()
+        log.debug('lote gravado na fila', quantidade=len(linhas) - len(duplicadas))
+        if self._processador_pendente:
+            self._iniciar_processador_pendente()
+        return resultado
+
+    # Recebimento
+
+    def _receber(self, max_messages, visibility_timeout):
+        conexao = self._conexao()
+        agora = time.time()
+        mensagens = []
+
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            for id_, message_id, corpo, grupo, recebimentos in conexao.execute(
+                SQL_VISIVEIS, (agora, max_messages)
+            ).fetchall():
+                if recebimentos >= self.max_receive_count:
+                    conexao.execute(
+                        'INSERT OR REPLACE INTO dead_letter '
+                        '(id, message_id, corpo, grupo, enviado_em, recebimentos, movido_em) '
+                        'SELECT id, message_id, corpo, grupo, enviado_em, recebimentos, ? '
+                        'FROM mensagens WHERE id = ?',
+                        (agora, id_)
+                    )
+                    conexao.execute('DELETE FROM mensagens WHERE id = ?', (id_,))
+                    log.warning('mensagem movida para a DLQ', message_id=message_id, tentativas=recebimentos)
+                    continue
+
+                receipt_handle = uuid.uuid4().hex
+                conexao.execute(
+                    'UPDATE mensagens SET recebimentos = recebimentos + 1, visivel_em = ?, '
+                    'receipt_handle = ? WHERE id = ?',
+                    (agora + visibility_timeout, receipt_handle, id_)
+                )
+                mensagens.append({
+                    'MessageId': message_id,
+                    'ReceiptHandle': receipt_handle,
+                    'Body': corpo,
+                    'Attributes': {
+                        'ApproximateReceiveCount': recebimentos + 1,
+                        'MessageGroupId': grupo
+                    }
+                })
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+        return mensagens
+
+    def _avisar(self):
+        """Acorda os receives em espera (mensagem nova, removida ou fila fechada)"""
+        with self._disponivel:
+            self._versao += 1
+            self._disponivel.notify_all()
+
+    def _proxima_visibilidade(self):
+        linha = self._conexao().execute('SELECT MIN(visivel_em) FROM mensagens').fetchone()
+        return linha[0]
+
+    def receive_message_batch(self, max_messages=MAX_BATCH, wait_time_seconds=0, visibility_timeout=None):
+        """
+        Recebe até `max_messages` mensagens (1 a 10)
+
+        Espera até `wait_time_seconds` se não houver mensagem visível. Cada
+        mensagem recebida precisa ser confirmada com delete_message.
+
+        Returns:
+            list: dicts com MessageId, ReceiptHandle, Body e Attributes
+        """
+        if not 1 <= max_messages <= MAX_BATCH:
+            raise ValueError(f"max_messages deve estar entre 1 e {MAX_BATCH}")
+        if visibility_timeout is None:
+            visibility_timeout = self.visibility_timeout
+
+        fim = time.monotonic() + wait_time_seconds
+        while True:
+            versao = self._versao
+            mensagens = self._receber(max_messages, visibility_timeout)
+            restante = fim - time.monotonic()
+            if mensagens or restante <= 0 or self._fechado:
+                return mensagens
+
+            # Dorme até chegar mensagem nova ou expirar a visibilidade de alguma
+            proxima = self._proxima_visibilidade()
+            if proxima is not None:
+                restante = min(restante, max(proxima - time.time(), 0.001))
+            with self._disponivel:
+                self._disponivel.wait_for(lambda: self._versao != versao or self._fechado, restante)
+
+    def receive_message(self, wait_time_seconds=0, visibility_timeout=None):
+        """Recebe uma mensagem (dict no formato do SQS) ou None"""
+        mensagens = self.receive_message_batch(1, wait_time_seconds, visibility_timeout)
+        return mensagens[0] if mensagens else None
+
+    def delete_message(self, receipt_handle):
+        """Confirma o processamento e remove a mensagem da fila"""
+        return self.delete_message_batch([receipt_handle]) == 1
+
+    def delete_message_batch(self, receipt_handles):
+        """Confirma várias mensagens em uma transação; retorna quantas foram removidas"""
+        conexao = self._conexao()
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            removidas = sum(
+                conexao.execute('DELETE FROM mensagens WHERE receipt_handle = ?', (handle,)).rowcount
+                for handle in receipt_handles
+            )
+            conexao.execute('COMMIT')
+        except Exception:
+            conexao.execute('ROLLBACK')
+            raise
+
+        # A remoção pode liberar a próxima mensagem do mesmo grupo
+        self._avisar()
+        return removidas
+
+    def change_message_visibility(self, receipt_handle, visibility_timeout):
+        """Altera o tempo até a mensagem voltar a ficar visível"""
+        conexao = self._conexao()
+        alteradas = conexao.execute(
+            'UPDATE mensagens SET visivel_em = ? WHERE receipt_handle = ?',
+            (time.time() + visibility_timeout, receipt_handle)
+        ).rowcount
+        self._avisar()
+        return alteradas == 1
+
+    def listar_dlq(self):
+        """Retorna as mensagens da dead-letter queue"""
+        linhas = self._conexao().execute(
+            'SELECT message_id, corpo, grupo, recebimentos, movido_em FROM dead_letter ORDER BY id'
+        ).fetchall()
+        return [
+            {'MessageId': message_id, 'Body': corpo, 'MessageGroupId': grupo,
+             'ReceiveCount': recebimentos, 'MovedAt': movido_em}
+            for message_id, corpo, grupo, recebimentos, movido_em in linhas
+        ]
+
+    def __len__(self):
+        return self._conexao().execute('SELECT COUNT(*) FROM mensagens').fetchone()[0]
+
+    # Processador
+
+    def start_processor(self, callback, batch_callback=None, sob_demanda=False):
+        """
+        Inicia os workers em background (ver SQSSimulator.start_processor)
+
+        Mensagens processadas sem exceção são confirmadas; um lote cujo
+        batch_callback falhar é reentregue por inteiro após o timeout, e as
+        posições que o batch_callback retornar (mensagens que falharam) não
+        são confirmadas e também voltam para a fila. Sob
+        demanda, mensagens pendentes de uma execução anterior iniciam os
+        workers na hora.
+        """
+        if self.is_processing:
+            return
+        if sob_demanda and not len(self):
+            self._processador_pendente = (callback, batch_callback)
+            return
+
+        self.is_processing = True
+        self._fechado = False
+
+        def process_messages():
+            while self.is_processing:
+                mensagens = self.receive_message_batch(
+                    MAX_BATCH if batch_callback else 1,
+                    wait_time_seconds=self.wait_time_seconds
+                )
+                if not mensagens:
+                    continue
+                log.debug('processando mensagens', quantidade=len(mensagens))
+                confirmadas = []
+                try:
+                    with duracao_processamento.cronometrar():
+                        if batch_callback:
+                            falhas = set(batch_callback([mensagem['Body'] for mensagem in mensagens]) or ())
+                        else:
+                            callback(mensagens[0]['Body'])
+                            falhas = set()
+                    confirmadas = [
+                        mensagem['ReceiptHandle'] for posicao, mensagem in enumerate(mensagens)
+                        if posicao not in falhas
+                    ]
+                    if falhas:
+                        mensagens_processadas.inc(len(falhas), resultado='erro')
+                        log.error('mensagens com erro (serão reentregues)', quantidade=len(falhas))
+                    if confirmadas:
+                        mensagens_processadas.inc(len(confirmadas), resultado='sucesso')
+                except Exception as e:
+                    mensagens_processadas.inc(len(mensagens), resultado='erro')
+                    log.error('erro ao processar mensagens (serão reentregues)', quantidade=len(mensagens),
+                              exc_info=e)
+                if confirmadas:
+                    self.delete_message_batch(confirmadas)
+
+        self.processor_threads = []
+        for indice in range(self.num_workers):
+            thread = threading.Thread(target=process_messages, name=f"sqs-worker-{indice}", daemon=True)
+            thread.start()
+            self.processor_threads.append(thread)
+        log.info('processador de mensagens iniciado', workers=self.num_workers, fila='duravel')
+
+    def _iniciar_processador_pendente(self):
+        with self._lock_processador:
+            processador, self._processador_pendente = self._processador_pendente, None
+            if processador:
+                self.start_processor(*processador)
+
+    def stop_processor(self):
+        """Para o processador de mensagens"""
+        self._processador_pendente = None
+        if not self.is_processing:
+            return
+        self.is_processing = False
+        self._fechado = True
+        self._avisar()
+        for thread in self.processor_threads:
+            thread.join(timeout=1)
+        self.processor_threads = []
+        log.info('processador de mensagens parado')
@@ -0,0 +1,278 @@
+"""
+Simulador de SQS (Simple Queue Service)
+Fila de processamento de agendamentos
+"""
+from fila.buffer import BufferBloqueante, receber
+from fila.deduplicacao import CacheDeduplicacao, JANELA_DEDUPLICACAO
+from observabilidade.metricas import registro
+from observabilidade.log import obter_logger
+import itertools
+import os
+import threading
+import zlib
+
+# Tempo máximo de espera de um receive (long polling, como o WaitTimeSeconds do SQS)
+WAIT_TIME_SECONDS = 20
+
+# Limite de mensagens por chamada em lote (mesmo limite do SQS)
+MAX_BATCH = 10
+
+log = obter_logger('sqs')
+
+# Métricas (compartilhadas com a fila durável)
+mensagens_enviadas = registro.contador('sqs_mensagens_enviadas_total', 'Mensagens aceitas pela fila')
+mensagens_duplicadas = registro.contador(
+    'sqs_mensagens_duplicadas_total', 'Envios descartados pela deduplicação'
+)
+mensagens_processadas = registro.contador(
+    'sqs_mensagens_processadas_total', 'Mensagens entregues ao processador', rotulos=('resultado',)
+)
+duracao_processamento = registro.histograma(
+    'sqs_processamento_segundos', 'Duração do callback do processador por lote'
+)
+
+class SQSSimulator:
+    """
+    Fila com um pool de consumidores particionado por grupo
+
+    Cada mensagem pode ter um `message_group_id` (como o MessageGroupId das
+    filas FIFO do SQS). Mensagens do mesmo grupo vão sempre para a mesma
+    partição, e cada partição é consumida por um único worker: dentro de um
+    grupo a ordem é estrita, enquanto grupos diferentes são processados em
+    paralelo. Mensagens sem grupo são distribuídas em rodízio.
+
+    Um `message_deduplication_id` repetido dentro da janela de deduplicação
+    (5 minutos, como no SQS FIFO) é aceito mas não volta a ser enfileirado.
+    """
+
+    def __init__(self, num_workers=1, wait_time_seconds=WAIT_TIME_SECONDS,
+                 janela_deduplicacao=JANELA_DEDUPLICACAO):
+        self.num_workers = max(1, num_workers)
+        self.wait_time_seconds = wait_time_seconds
+        self._deduplicacao = CacheDeduplicacao(ttl=janela_deduplicacao)
+        condicao = threading.Condition()
+        self.particoes = [BufferBloqueante(condicao=condicao) for _ in range(self.num_workers)]
+        self._rodizio = itertools.count()
+        self.is_processing = False
+        self.processor_threads = []
+        # (callback, batch_callback) de um start_processor sob demanda ainda não iniciado
+        self._processador_pendente = None
+        self._lock_processador = threading.Lock()
+
+    def _particao(self, message_group_id):
+        if message_group_id is None:
+            indice = next(self._rodizio)
+        else:
+            indice = zlib.crc32(str(message_group_id).encode('utf-8'))
+        return self.particoes[indice % self.num_workers]
+
+    def _duplicada(self, message_deduplication_id):
+        if message_deduplication_id is None:
+            return False
+        nova, _ = self._deduplicacao.registrar(message_deduplication_id)
+        if not nova:
+            mensagens_duplicadas.inc()
+            log.info('mensagem duplicada ignorada', deduplication_id=message_deduplication_id)
+        return not nova
+
+    def send_message(self, message_body, message_group_id=None, message_deduplication_id=None):
+        """
+        Envia mensagem para a fila
+
+        Args:
+            message_body: corpo da mensagem
+            message_group_id: chave de ordenação (ex: barbeiro)
+            message_deduplication_id: chave de deduplicação (opcional)
+        """
+        if self._duplicada(message_deduplication_id):
+            return True
+        self._particao(message_group_id).put(message_body)
+        mensagens_enviadas.inc()
+        log.debug('mensagem enfileirada', grupo=message_group_id)
+        if self._processador_pendente:
+            self._iniciar_processador_pendente()
+        return True
+
+    def send_message_batch(self, entries):
+        """
+        Envia até 10 mensagens em uma chamada
+
+        Args:
+            entries: lista de dicts com
+                - Id: str (identificador da entrada no lote)
+                - MessageBody: corpo da mensagem
+                - MessageGroupId: chave de ordenação (opcional)
+                - MessageDeduplicationId: chave de deduplicação (opcional)
+
+        Returns:
+            dict: {'Successful': [{'Id': ...}], 'Failed': [{'Id': ..., 'Message': ...}]}
+        """
+        if not 1 <= len(entries) <= MAX_BATCH:
+            raise ValueError(f"O lote deve ter entre 1 e {MAX_BATCH} mensagens")
+
+        por_particao = {}
+        resultado = {'Successful': [], 'Failed': []}
+        for entry in entries:
+            if 'MessageBody' not in entry:
+                resultado['Failed'].append({'Id': entry.get('Id'), 'Message': 'MessageBody ausente'})
+                continue
+            if self._duplicada(entry.get('MessageDeduplicationId')):
+                resultado['Successful'].append({'Id': entry.get('Id')})
+                continue
+            particao = self._particao(entry.get('MessageGroupId'))
+            por_particao.setdefault(id(particao), (particao, []))[1].append(entry['MessageBody'])
+            resultado['Successful'].append({'Id': entry.get('Id')})
+
+        for particao, mensagens in por_particao.values():
+            particao.put_lote(mensagens)
+            mensagens_enviadas.inc(len(mensagens))
+        log.debug('lote enfileirado', quantidade=sum(len(mensagens) for _, mensagens in por_particao.values()))
+        if self._processador_pendente:
+            self._iniciar_processador_pendente()
+        return resultado
+
+    def __len__(self):
+        return sum(len(particao) for particao in self.particoes)
+
+    def receive_message(self, wait_time_seconds=0):
+        """
+        Recebe mensagem da fila
+
+        Args:
+            wait_time_seconds: tempo máximo de espera por uma mensagem
+                (0 = não bloqueante, como o short polling do SQS)
+
+        Returns:
+            A mensagem ou None se a fila continuar vazia
+        """
+        mensagens = receber(self.particoes, 1, wait_time_seconds)
+        return mensagens[0] if mensagens else None
+
+    def receive_message_batch(self, max_messages=MAX_BATCH, wait_time_seconds=0):
+        """
+        Recebe até `max_messages` mensagens (1 a 10) em uma chamada
+
+        Espera até `wait_time_seconds` pela primeira mensagem e retorna as
+        que já estiverem disponíveis, sem esperar o lote completar.
+
+        Returns:
+            list: mensagens recebidas (vazia se a fila continuar vazia)
+        """
+        if not 1 <= max_messages <= MAX_BATCH:
+            raise ValueError(f"max_messages deve estar entre 1 e {MAX_BATCH}")
+        return receber(self.particoes, max_messages, wait_time_seconds)
+
+    def start_processor(self, callback, batch_callback=None, sob_demanda=False):
+        """
+        Inicia os workers de processamento em background (um por partição)
+
+        Args:
+            callback: função chamada com cada mensagem
+            batch_callback: se informada, é chamada com a lista de mensagens
+                disponíveis na partição (até 10) no lugar de `callback`; pode
+                retornar as posições das mensagens que falharam
+            sob_demanda: com a fila vazia, só registra o processador; os
+                workers sobem junto com a primeira mensagem enviada
+        """
+        if self.is_processing:
+            return
+        if sob_demanda and not len(self):
+            self._processador_pendente = (callback, batch_callback)
+            return
+
+        self.is_processing = True
+
+        def process_messages(particao):
+            while self.is_processing:
+                # Bloqueia até chegar mensagem (sem consumir CPU com a fila vazia)
+                mensagens = particao.get_lote(MAX_BATCH if batch_callback else 1,
+                                              timeout=self.wait_time_seconds)
+                if not mensagens:
+                    continue
+                log.debug('processando mensagens', quantidade=len(mensagens))
+                falhas = 0
+                try:
+                    with duracao_processamento.cronometrar():
+                        if batch_callback:
+                            falhas = len(set(batch_callback(mensagens) or ()))
+                        else:
+                            callback(mensagens[0])
+                except Exception as e:
+                    falhas = len(mensagens)
+                    log.error('erro ao processar mensagens', quantidade=len(mensagens), exc_info=e)
+                if falhas:
+                    mensagens_processadas.inc(falhas, resultado='erro')
+                if len(mensagens) > falhas:
+                    mensagens_processadas.inc(len(mensagens) - falhas, resultado='sucesso')
+
+        self.processor_threads = []
+        for indice, particao in enumerate(self.particoes):
+            particao.abrir()
+            thread = threading.Thread(
+                target=process_messages,
+                args=(particao,),
+                name=f"sqs-worker-{indice}",
+                daemon=True
+            )
+            thread.start()
+            self.processor_threads.append(thread)
+        log.info('processador de mensagens iniciado', workers=self.num_workers)
+
+    def _iniciar_processador_pendente(self):
+        with self._lock_processador:
+            processador, self._processador_pendente = self._processador_pendente, None
+            if processador:
+                self.start_processor(*processador)
+
+    def stop_processor(self):
+        """Para o processador de mensagens"""
+        self._processador_pendente = None
+        if not self.is_processing:
+            return
+        self.is_processing = False
+        # Acorda os consumidores que estão bloqueados no receive
+        for particao in self.particoes:
+            particao.fechar()
+        for thread in self.processor_threads:
+            thread.join(timeout=1)
+        self.processor_threads = []
+        log.info('processador de mensagens parado')
+
+# Instância global da fila, criada no primeiro uso (obter_fila)
+_fila = None
+_lock_fila = threading.Lock()
+
+def obter_fila():
+    """
+    Fila global (SQS_WORKERS define o tamanho do pool)
+
+    SQS_BACKEND=duravel usa a fila persistente em SQLite (fila/fila_duravel.py)
+    """
+    global _fila
+    if _fila is None:
+        with _lock_fila:
+            if _fila is None:
+                num_workers = int(os.environ.get('SQS_WORKERS', '4'))
+                if os.environ.get('SQS_BACKEND') == 'duravel':
+                    from fila.fila_duravel import DurableSQSSimulator
+                    _fila = DurableSQSSimulator(
+                        os.environ.get('SQS_PATH', 'fila/data/fila_agendamentos.db'),
+                        num_workers=num_workers
+                    )
+                else:
+                    _fila = SQSSimulator(num_workers=num_workers)
+    return _fila
+
+def fila_criada():
+    return _fila is not None
+
+def __getattr__(nome):
+    # `from fila.sqs_simulator import sqs_queue` continua funcionando (cria a fila)
+    if nome == 'sqs_queue':
+        return obter_fila()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+registro.medidor(
+    'sqs_mensagens_na_fila', 'Mensagens aguardando processamento',
+    funcao=lambda: len(_fila) if _fila is not None else 0
+)
@@ -1,2 +1,25 @@
 # Lambdas package
+"""
+Os módulos das Lambdas são importados sob demanda: o gateway só paga a
+importação (e a abertura de banco, fila ou SNS que ela provoca) das Lambdas
+que de fato recebem chamadas
+"""
+import importlib
 
+_handlers = {}
+
+
+def carregar(nome, funcao='handler'):
+    """Função `funcao` do módulo lambdas.<nome>, importado na primeira chamada"""
+    handler = _handlers.get((nome, funcao))
+    if handler is None:
+        handler = _handlers[(nome, funcao)] = getattr(importlib.import_module(f'lambdas.{nome}'), funcao)
+    return handler
+
+
+def sob_demanda(nome, funcao='handler'):
+    """Handler que só importa o módulo da Lambda quando é chamado"""
+    def handler(*args, **kwargs):
+        return carregar(nome, funcao)(*args, **kwargs)
+    handler.__name__ = handler.__qualname__ = f'{nome}.{funcao}'
+    return handler
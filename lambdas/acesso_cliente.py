@@ -3,7 +3,9 @@ Lambda AcessoCliente
 Verifica se o email já está cadastrado e cria conta se não existir
 """
 from database.db_manager import get_cliente_by_email, create_cliente
+from observabilidade.rastreamento import medir_lambda
 
+@medir_lambda('acesso_cliente')
 def handler(event):
     """
     Processa o acesso/criação de cliente
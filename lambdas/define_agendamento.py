@@ -2,10 +2,18 @@
 Lambda DefineAgendamento
 Recebe dados do agendamento e envia para a fila SQS (ProcessarAgendamento)
 """
-from queue.sqs_simulator import sqs_queue
+from fila.sqs_simulator import obter_fila
+from fila.deduplicacao import CacheDeduplicacao, chave_deduplicacao
 from database.db_manager import get_cliente_by_email_object
+from observabilidade.rastreamento import marcar, medir_lambda, novo_trace
 import json
 
+# (impressão do pedido, resposta) dos agendamentos enviados nos últimos 5
+# minutos, por chave de idempotência (uma repetição recebe a mesma resposta
+# sem ir à fila)
+_idempotencia = CacheDeduplicacao()
+
+@medir_lambda('define_agendamento')
 def handler(event):
     """
     Define um agendamento e envia para a fila de processamento
@@ -16,11 +24,16 @@ def handler(event):
             - barbeiro: str
             - data: str (formato: YYYY-MM-DD)
             - horario: str (formato: HH:MM)
+            - idempotency_key: str (opcional; padrão: derivada dos campos acima)
+            - trace_id: str (opcional; padrão: gerado aqui)
+            - locale: str (opcional; idioma das notificações, ex: en_US)
     
     Returns:
         dict: Resposta com status e mensagem
     """
     try:
+        trace = novo_trace(event.get('trace_id'))
+
         # Extrai dados do evento
         cliente_email = event.get('cliente_email')
         barbeiro = event.get('barbeiro')
@@ -37,56 +50,111 @@ def handler(event):
                 }
             }
         
-        # Verifica se o cliente existe
-        cliente = get_cliente_by_email_object(cliente_email)
-        if not cliente:
-            return {
-                'statusCode': 404,
-                'body': {
-                    'success': False,
-                    'message': f'Cliente com email {cliente_email} não encontrado'
+        # Repetição do mesmo pedido (ex: retry após timeout): devolve a
+        # resposta original sem consultar o banco nem enviar para a fila.
+        # A chave informada vale só para o cliente que a enviou e só para o
+        # mesmo pedido (impressão dos campos)
+        locale = event.get('locale')
+        impressao = chave_deduplicacao(cliente_email, barbeiro, data, horario, locale or '')
+        chave_cliente = event.get('idempotency_key')
+        chave = chave_deduplicacao(cliente_email, chave_cliente) if chave_cliente else impressao
+        nova, anterior = _idempotencia.registrar(chave, (impressao, None))
+        if not nova:
+            impressao_anterior, resposta = anterior
+            if impressao_anterior != impressao:
+                return {
+                    'statusCode': 422,
+                    'body': {
+                        'success': False,
+                        'message': 'A chave de idempotência já foi usada com outro pedido'
+                    }
                 }
-            }
-        
-        # Valida formato do horário (intervalo de 30min)
-        hora, minuto = map(int, horario.split(':'))
-        if minuto not in [0, 30]:
-            return {
-                'statusCode': 400,
-                'body': {
-                    'success': False,
-                    'message': 'Horário deve ser em intervalos de 30 minutos (ex: 09:00, 09:30, 10:00)'
+            if resposta is None:
+                return {
+                    'statusCode': 409,
+                    'body': {
+                        'success': False,
+                        'message': 'Um pedido com a mesma chave de idempotência ainda está em andamento'
+                    }
                 }
+            return {
+                'statusCode': resposta['statusCode'],
+                'body': {**resposta['body'], 'duplicado': True}
+            }
+
+        try:
+            resposta = _enviar(chave, trace, cliente_email, barbeiro, data, horario, locale)
+        except Exception:
+            _idempotencia.remover(chave)
+            raise
+
+        # Só respostas de sucesso são reaproveitadas; erros podem ser corrigidos e repetidos
+        if resposta['statusCode'] == 200:
+            _idempotencia.atualizar(chave, (impressao, resposta))
+        else:
+            _idempotencia.remover(chave)
+        return resposta
+    
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': {
+                'success': False,
+                'message': f'Erro ao processar: {str(e)}'
             }
-        
-        # Prepara mensagem para a fila SQS
-        mensagem = {
-            'cliente_email': cliente_email,
-            'cliente_nome': f"{cliente['nome']} {cliente['sobrenome']}",
-            'cliente_celular': cliente['celular'],
-            'barbeiro': barbeiro,
-            'data': data,
-            'horario': horario
         }
-        
-        # Envia para a fila
-        sqs_queue.send_message(json.dumps(mensagem))
-        
+
+def _enviar(chave, trace, cliente_email, barbeiro, data, horario, locale=None):
+    """Valida o cliente e o horário e envia o agendamento para a fila"""
+    # Verifica se o cliente existe
+    cliente = get_cliente_by_email_object(cliente_email)
+    if not cliente:
         return {
-            'statusCode': 200,
+            'statusCode': 404,
             'body': {
-                'success': True,
-                'message': 'Agendamento enviado para processamento',
-                'agendamento': mensagem
+                'success': False,
+                'message': f'Cliente com email {cliente_email} não encontrado'
             }
         }
     
-    except Exception as e:
+    # Valida formato do horário (intervalo de 30min)
+    hora, minuto = map(int, horario.split(':'))
+    if minuto not in [0, 30]:
         return {
-            'statusCode': 500,
+            'statusCode': 400,
             'body': {
                 'success': False,
-                'message': f'Erro ao processar: {str(e)}'
+                'message': 'Horário deve ser em intervalos de 30 minutos (ex: 09:00, 09:30, 10:00)'
             }
         }
-
+    
+    # Prepara mensagem para a fila SQS
+    mensagem = {
+        'cliente_email': cliente_email,
+        'cliente_nome': f"{cliente['nome']} {cliente['sobrenome']}",
+        'cliente_celular': cliente['celular'],
+        'barbeiro': barbeiro,
+        'data': data,
+        'horario': horario,
+        'trace': trace
+    }
+    if locale:
+        mensagem['locale'] = locale
+    
+    # Envia para a fila (agrupada por barbeiro: mantém a ordem das
+    # validações do mesmo barbeiro e paraleliza barbeiros diferentes)
+    marcar(trace, 'enfileirado')
+    obter_fila().send_message(json.dumps(mensagem), message_group_id=barbeiro,
+                           message_deduplication_id=chave)
+    
+    # O trace é interno ao fluxo: a resposta expõe só o trace_id
+    agendamento = {campo: valor for campo, valor in mensagem.items() if campo != 'trace'}
+    return {
+        'statusCode': 200,
+        'body': {
+            'success': True,
+            'message': 'Agendamento enviado para processamento',
+            'agendamento': agendamento,
+            'trace_id': trace['trace_id']
+        }
+    }
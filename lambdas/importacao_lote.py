@@ -0,0 +1,215 @@
+"""
+Lambda ImportacaoLote
+Importa clientes e agendamentos já existentes (ex: cadastro de uma nova
+barbearia) em lotes: valida todas as linhas, descarta as já cadastradas
+pelos índices de email e de horário e grava o lote com uma única escrita
+no storage
+"""
+from database.db_manager import create_clientes_lote, get_emails_cadastrados, reservar_slots_lote
+from observabilidade.rastreamento import medir_lambda
+from observabilidade.metricas import registro
+from observabilidade.log import obter_logger
+from datetime import date
+
+# Máximo de linhas por chamada (arquivos maiores: importar em várias chamadas)
+MAX_LINHAS_LOTE = 10000
+
+CAMPOS_CLIENTE = ('nome', 'sobrenome', 'email', 'celular')
+CAMPOS_AGENDAMENTO = ('cliente_email', 'barbeiro', 'data', 'horario')
+
+_linhas_importadas = registro.contador(
+    'importacao_linhas_total', 'Linhas recebidas pela importação em lote', rotulos=('tabela', 'resultado')
+)
+
+log = obter_logger('importacao')
+
+
+def _ler_linhas(event, chave):
+    """Lista de linhas do evento ({chave: [...]} ou a própria lista); erro 4xx ou None"""
+    linhas = event.get(chave) if isinstance(event, dict) else event
+    if not isinstance(linhas, list) or not linhas:
+        return None, {
+            'statusCode': 400,
+            'body': {
+                'success': False,
+                'message': f'Informe uma lista não vazia de {chave}'
+            }
+        }
+    if len(linhas) > MAX_LINHAS_LOTE:
+        return None, {
+            'statusCode': 413,
+            'body': {
+                'success': False,
+                'message': f'Máximo de {MAX_LINHAS_LOTE} linhas por importação'
+            }
+        }
+    return linhas, None
+
+
+def _validar_campos(linha, campos):
+    """Mensagem de erro da linha ou None (mesma regra das Lambdas de uma linha só)"""
+    if not isinstance(linha, dict):
+        return 'Linha deve ser um objeto JSON'
+    if not all(linha.get(campo) for campo in campos):
+        return f"Campos obrigatórios: {', '.join(campos)}"
+    return None
+
+
+def _validar_agendamento(linha):
+    erro = _validar_campos(linha, CAMPOS_AGENDAMENTO)
+    if erro:
+        return erro
+    try:
+        date.fromisoformat(linha['data'])
+    except (TypeError, ValueError):
+        return 'Data deve estar no formato YYYY-MM-DD'
+    try:
+        hora, minuto = map(int, linha['horario'].split(':'))
+    except (AttributeError, ValueError):
+        return 'Horário deve estar no formato HH:MM'
+    if minuto not in [0, 30]:
+        return 'Horário deve ser em intervalos de 30 minutos (ex: 09:00, 09:30, 10:00)'
+    return None
+
+
+def _resposta(tabela, resultados):
+    """Resumo da importação com o resultado de cada linha (linha = posição a partir de 1)"""
+    totais = {}
+    for resultado in resultados:
+        totais[resultado['status']] = totais.get(resultado['status'], 0) + 1
+    for status, quantidade in totais.items():
+        _linhas_importadas.inc(quantidade, tabela=tabela, resultado=status)
+    log.info('importação em lote', tabela=tabela, linhas=len(resultados), **totais)
+
+    return {
+        'statusCode': 200,
+        'body': {
+            'success': True,
+            'message': 'Importação concluída',
+            'total': len(resultados),
+            'importados': totais.get('criado', 0),
+            'rejeitados': len(resultados) - totais.get('criado', 0),
+            'resultados': resultados
+        }
+    }
+
+
+@medir_lambda('importar_clientes')
+def handler_clientes(event):
+    """
+    Importa uma lista de clientes
+
+    Args:
+        event: {'clientes': [...]} ou a lista; cada item com nome,
+            sobrenome, email e celular
+
+    Returns:
+        dict: Resposta com os totais e, por linha, o status (criado,
+            duplicado ou invalido) com o id ou a mensagem de erro
+    """
+    try:
+        linhas, erro = _ler_linhas(event, 'clientes')
+        if erro:
+            return erro
+
+        resultados = [None] * len(linhas)
+        validas = []
+        for posicao, linha in enumerate(linhas):
+            mensagem = _validar_campos(linha, CAMPOS_CLIENTE)
+            if mensagem:
+                resultados[posicao] = {'linha': posicao + 1, 'status': 'invalido', 'message': mensagem}
+            else:
+                validas.append(posicao)
+
+        ids = create_clientes_lote([linhas[posicao] for posicao in validas]) if validas else []
+        for posicao, cliente_id in zip(validas, ids):
+            if cliente_id is None:
+                resultados[posicao] = {
+                    'linha': posicao + 1,
+                    'status': 'duplicado',
+                    'message': f"Já existe uma conta criada com o e-mail {linhas[posicao]['email']}"
+                }
+            else:
+                resultados[posicao] = {'linha': posicao + 1, 'status': 'criado', 'id': cliente_id}
+
+        return _resposta('clientes', resultados)
+
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': {
+                'success': False,
+                'message': f'Erro ao processar: {str(e)}'
+            }
+        }
+
+
+@medir_lambda('importar_agendamentos')
+def handler_agendamentos(event):
+    """
+    Importa uma lista de agendamentos já confirmados (sem passar pela fila
+    e sem notificar)
+
+    Args:
+        event: {'agendamentos': [...]} ou a lista; cada item com
+            cliente_email, barbeiro, data (YYYY-MM-DD) e horario (HH:MM)
+
+    Returns:
+        dict: Resposta com os totais e, por linha, o status (criado,
+            conflito, cliente_inexistente ou invalido) com o id ou a
+            mensagem de erro
+    """
+    try:
+        linhas, erro = _ler_linhas(event, 'agendamentos')
+        if erro:
+            return erro
+
+        resultados = [None] * len(linhas)
+        validas = []
+        for posicao, linha in enumerate(linhas):
+            mensagem = _validar_agendamento(linha)
+            if mensagem:
+                resultados[posicao] = {'linha': posicao + 1, 'status': 'invalido', 'message': mensagem}
+            else:
+                validas.append(posicao)
+
+        # Uma consulta para todos os clientes do lote
+        cadastrados = get_emails_cadastrados({linhas[posicao]['cliente_email'] for posicao in validas})
+        reservar = []
+        for posicao in validas:
+            email = linhas[posicao]['cliente_email']
+            if email in cadastrados:
+                reservar.append(posicao)
+            else:
+                resultados[posicao] = {
+                    'linha': posicao + 1,
+                    'status': 'cliente_inexistente',
+                    'message': f'Cliente com email {email} não encontrado'
+                }
+
+        ids = reservar_slots_lote([
+            {campo: linhas[posicao][campo] for campo in CAMPOS_AGENDAMENTO}
+            for posicao in reservar
+        ]) if reservar else []
+        for posicao, agendamento_id in zip(reservar, ids):
+            linha = linhas[posicao]
+            if agendamento_id is None:
+                resultados[posicao] = {
+                    'linha': posicao + 1,
+                    'status': 'conflito',
+                    'message': f"Já existe um agendamento para o barbeiro {linha['barbeiro']} "
+                               f"na data {linha['data']} no horário {linha['horario']}"
+                }
+            else:
+                resultados[posicao] = {'linha': posicao + 1, 'status': 'criado', 'id': agendamento_id}
+
+        return _resposta('agendamentos', resultados)
+
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': {
+                'success': False,
+                'message': f'Erro ao processar: {str(e)}'
+            }
+        }
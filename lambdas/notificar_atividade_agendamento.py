@@ -1,94 +1,184 @@
 """
 Lambda NotificarAtividadeAgendamento
-Prepara a mensagem para o SNS
+Prepara as mensagens e publica no tópico de agendamentos do SNS
 """
-from sns.sns_simulator import sns_notifier
+from sns.sns_simulator import obter_notificador, TOPICO_AGENDAMENTOS
+from sns.templates import catalogo, diretorio_barbeiros
+from observabilidade.rastreamento import marcar, medir_lambda
 
+# Templates na ordem usada por _mensagens
+_NOMES_TEMPLATES = (
+    'cliente_email_assunto', 'cliente_email', 'cliente_sms',
+    'barbeiro_email_assunto', 'barbeiro_email', 'barbeiro_sms'
+)
+
+CAMPOS_RESUMO = ('cliente_nome', 'cliente_email', 'cliente_celular', 'data', 'horario')
+
+# locale -> funções de renderização dos templates (buscadas no catálogo uma vez por locale)
+_renderizadores = {}
+
+def _renderizadores_do_locale(locale):
+    renderizadores = _renderizadores.get(locale)
+    if renderizadores is None:
+        renderizadores = _renderizadores[locale] = tuple(
+            catalogo.obter(nome, locale).renderizar for nome in _NOMES_TEMPLATES
+        )
+    return renderizadores
+
+def _mensagens(dados):
+    """
+    Notificações de um agendamento confirmado: e-mail e SMS para o cliente,
+    e-mail (e SMS, se o celular estiver no diretório) para o barbeiro
+
+    Returns:
+        tuple: (mensagens, atributos de cada mensagem para as políticas de
+            filtro do tópico: evento, canal, publico, barbeiro e data)
+    """
+    contato = diretorio_barbeiros.contato(dados['barbeiro'])
+    # Dados do agendamento nas mensagens (usados pelo resumo, ver sns/resumo.py,
+    # e para mascarar o nome do cliente no log das entregas)
+    agendamento = {campo: dados.get(campo) for campo in CAMPOS_RESUMO}
+    assunto_cliente, email_cliente, sms_cliente, _, _, _ = _renderizadores_do_locale(dados.get('locale'))
+    _, _, _, assunto_barbeiro, email_barbeiro, sms_barbeiro = _renderizadores_do_locale(contato['locale'])
+
+    mensagens = [
+        {
+            'tipo': 'email',
+            'destinatario': dados.get('cliente_email'),
+            'assunto': assunto_cliente(dados),
+            'corpo': email_cliente(dados),
+            'agendamento': agendamento
+        },
+        {
+            'tipo': 'sms',
+            'destinatario': dados.get('cliente_celular'),
+            'mensagem': sms_cliente(dados),
+            'agendamento': agendamento
+        },
+        {
+            'tipo': 'email',
+            'destinatario': contato['email'],
+            'assunto': assunto_barbeiro(dados),
+            'corpo': email_barbeiro(dados),
+            'agendamento': agendamento
+        }
+    ]
+    if contato['celular']:
+        mensagens.append({
+            'tipo': 'sms',
+            'destinatario': contato['celular'],
+            'mensagem': sms_barbeiro(dados),
+            'agendamento': agendamento
+        })
+
+    atributos = [
+        {
+            'evento': 'agendamento_confirmado',
+            'canal': mensagem['tipo'],
+            'publico': 'cliente' if posicao < 2 else 'barbeiro',
+            'barbeiro': dados['barbeiro'],
+            'data': dados.get('data')
+        }
+        for posicao, mensagem in enumerate(mensagens)
+    ]
+    return mensagens, atributos
+
+def _resposta_sem_dados():
+    return {
+        'statusCode': 400,
+        'body': {
+            'success': False,
+            'message': 'Dados do agendamento não fornecidos'
+        }
+    }
+
+def _resposta_enviado():
+    return {
+        'statusCode': 200,
+        'body': {
+            'success': True,
+            'message': 'Notificações enviadas com sucesso'
+        }
+    }
+
+def _resposta_erro(erro):
+    return {
+        'statusCode': 500,
+        'body': {
+            'success': False,
+            'message': f'Erro ao processar: {str(erro)}'
+        }
+    }
+
+@medir_lambda('notificar_atividade_agendamento')
 def handler(event):
     """
     Prepara e envia notificação do agendamento
-    
+
     Args:
         event: Dicionário com os dados do agendamento confirmado
             - dados: dict com informações completas do agendamento
-    
+              (locale opcional: idioma das mensagens do cliente)
+
     Returns:
         dict: Resposta com status e mensagem
     """
     try:
         dados_agendamento = event.get('dados', {})
-        
+
         if not dados_agendamento:
-            return {
-                'statusCode': 400,
-                'body': {
-                    'success': False,
-                    'message': 'Dados do agendamento não fornecidos'
-                }
-            }
-        
-        # Prepara mensagem para SNS
-        mensagem_cliente = {
-            'tipo': 'email',
-            'destinatario': dados_agendamento.get('cliente_email'),
-            'assunto': 'Agendamento Confirmado - Barbearia',
-            'corpo': f"""
-Olá {dados_agendamento.get('cliente_nome')},
+            return _resposta_sem_dados()
 
-Seu agendamento foi confirmado com sucesso!
+        # Publica as notificações no tópico (as assinaturas fazem a entrega)
+        mensagens, atributos = _mensagens(dados_agendamento)
+        obter_notificador().publish_batch(mensagens, TOPICO_AGENDAMENTOS, atributos)
+        marcar(dados_agendamento.get('trace'), 'notificado')
 
-Detalhes:
-- Barbeiro: {dados_agendamento.get('barbeiro')}
-- Data: {dados_agendamento.get('data')}
-- Horário: {dados_agendamento.get('horario')}
+        return _resposta_enviado()
 
-Aguardamos você!
-            """.strip()
-        }
-        
-        mensagem_sms_cliente = {
-            'tipo': 'sms',
-            'destinatario': dados_agendamento.get('cliente_celular'),
-            'mensagem': f"Agendamento confirmado! Barbeiro: {dados_agendamento.get('barbeiro')}, Data: {dados_agendamento.get('data')}, Horário: {dados_agendamento.get('horario')}"
-        }
-        
-        mensagem_barbeiro = {
-            'tipo': 'email',
-            'destinatario': f"{dados_agendamento.get('barbeiro').lower().replace(' ', '')}@barbearia.com",
-            'assunto': 'Novo Agendamento - Barbearia',
-            'corpo': f"""
-Olá {dados_agendamento.get('barbeiro')},
-
-Você tem um novo agendamento!
-
-Detalhes:
-- Cliente: {dados_agendamento.get('cliente_nome')}
-- Email: {dados_agendamento.get('cliente_email')}
-- Celular: {dados_agendamento.get('cliente_celular')}
-- Data: {dados_agendamento.get('data')}
-- Horário: {dados_agendamento.get('horario')}
-            """.strip()
-        }
-        
-        # Envia notificações via SNS
-        sns_notifier.publish(mensagem_cliente)
-        sns_notifier.publish(mensagem_sms_cliente)
-        sns_notifier.publish(mensagem_barbeiro)
-        
-        return {
-            'statusCode': 200,
-            'body': {
-                'success': True,
-                'message': 'Notificações enviadas com sucesso'
-            }
-        }
-    
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'body': {
-                'success': False,
-                'message': f'Erro ao processar: {str(e)}'
-            }
-        }
+        return _resposta_erro(e)
+
+
+@medir_lambda('notificar_atividade_agendamento_lote')
+def handler_lote(eventos):
+    """
+    Prepara e envia as notificações de vários agendamentos confirmados
+
+    As mensagens de todo o lote são renderizadas antes e publicadas juntas.
+
+    Args:
+        eventos: lista de eventos no formato aceito por `handler`
+
+    Returns:
+        list: uma resposta por evento, na mesma ordem
+    """
+    respostas = [None] * len(eventos)
+    mensagens = []
+    atributos = []
+    enviados = []
+
+    for posicao, event in enumerate(eventos):
+        try:
+            dados_agendamento = event.get('dados', {})
+            if not dados_agendamento:
+                respostas[posicao] = _resposta_sem_dados()
+                continue
+            mensagens_evento, atributos_evento = _mensagens(dados_agendamento)
+            mensagens.extend(mensagens_evento)
+            atributos.extend(atributos_evento)
+            enviados.append((posicao, dados_agendamento))
+        except Exception as e:
+            respostas[posicao] = _resposta_erro(e)
+
+    try:
+        obter_notificador().publish_batch(mensagens, TOPICO_AGENDAMENTOS, atributos)
+    except Exception as e:
+        for posicao, _ in enviados:
+            respostas[posicao] = _resposta_erro(e)
+        return respostas
 
+    for posicao, dados_agendamento in enviados:
+        marcar(dados_agendamento.get('trace'), 'notificado')
+        respostas[posicao] = _resposta_enviado()
+    return respostas
@@ -3,36 +3,48 @@ Lambda ValidaAgendamento
 Valida o agendamento verificando conflitos e horários disponíveis
 """
 from database.db_manager import (
-    get_agendamento_by_barbeiro_data_horario,
-    get_agendamentos_by_barbeiro_data,
-    create_agendamento
+    get_horarios_disponiveis,
+    get_id_agendamento_do_cliente,
+    reserve_slot,
+    reservar_slots_lote,
+    sincronizar_agendamentos
 )
+from observabilidade.rastreamento import marcar, medir_lambda
 import json
 
-def gerar_horarios_disponiveis(barbeiro, data, horarios_ocupados):
-    """
-    Gera lista de horários disponíveis para um barbeiro em uma data
-    
-    Args:
-        barbeiro: str
-        data: str
-        horarios_ocupados: list de strings (horários já agendados)
-    
-    Returns:
-        list: Lista de horários disponíveis
-    """
-    # Horários de funcionamento: 08:00 às 18:00 em intervalos de 30min
-    horarios_possiveis = []
-    for hora in range(8, 18):
-        for minuto in [0, 30]:
-            horario = f"{hora:02d}:{minuto:02d}"
-            horarios_possiveis.append(horario)
-    
-    # Remove horários ocupados
-    horarios_disponiveis = [h for h in horarios_possiveis if h not in horarios_ocupados]
-    
-    return horarios_disponiveis
+def _resposta_conflito(barbeiro, data, horario):
+    # Horários livres a partir do mapa de ocupação do barbeiro na data
+    return {
+        'statusCode': 409,
+        'body': {
+            'success': False,
+            'message': f'Já existe um agendamento para o barbeiro {barbeiro} na data {data} no horário {horario}',
+            'horarios_disponiveis': get_horarios_disponiveis(barbeiro, data)
+        }
+    }
 
+def _resposta_confirmado(agendamento_id, dados):
+    # Retorna dados completos para notificação
+    return {
+        'statusCode': 200,
+        'body': {
+            'success': True,
+            'message': 'Agendamento confirmado com sucesso',
+            'agendamento_id': agendamento_id,
+            'dados': dados
+        }
+    }
+
+def _resposta_erro(erro):
+    return {
+        'statusCode': 500,
+        'body': {
+            'success': False,
+            'message': f'Erro ao processar: {str(erro)}'
+        }
+    }
+
+@medir_lambda('valida_agendamento')
 def handler(event):
     """
     Valida um agendamento verificando conflitos
@@ -55,50 +67,98 @@ def handler(event):
             dados = json.loads(event)
         else:
             dados = event
+        trace = dados.get('trace')
+        marcar(trace, 'desenfileirado')
         
         barbeiro = dados.get('barbeiro')
         data = dados.get('data')
         horario = dados.get('horario')
         cliente_email = dados.get('cliente_email')
         
-        # Verifica se já existe agendamento para o mesmo barbeiro, data e horário
-        agendamento_existente = get_agendamento_by_barbeiro_data_horario(barbeiro, data, horario)
+        # Verifica o conflito e confirma o agendamento em uma única operação
+        # atômica: duas mensagens para o mesmo horário nunca são confirmadas
+        agendamento_id = reserve_slot(cliente_email, barbeiro, data, horario, sincronizar=False)
+        if agendamento_id is None:
+            # Reentrega de uma mensagem já processada: o horário é do próprio cliente
+            agendamento_id = get_id_agendamento_do_cliente(cliente_email, barbeiro, data, horario)
+        marcar(trace, 'validado')
         
-        if agendamento_existente:
-            # Busca todos os agendamentos do barbeiro na data para retornar horários disponíveis
-            agendamentos_do_dia = get_agendamentos_by_barbeiro_data(barbeiro, data)
-            horarios_ocupados = [ag['horario'] for ag in agendamentos_do_dia]
-            horarios_disponiveis = gerar_horarios_disponiveis(barbeiro, data, horarios_ocupados)
-            
-            return {
-                'statusCode': 409,
-                'body': {
-                    'success': False,
-                    'message': f'Já existe um agendamento para o barbeiro {barbeiro} na data {data} no horário {horario}',
-                    'horarios_disponiveis': horarios_disponiveis
-                }
-            }
-        
-        # Confirma o agendamento
-        agendamento_id = create_agendamento(cliente_email, barbeiro, data, horario)
+        if agendamento_id is None:
+            return _resposta_conflito(barbeiro, data, horario)
         
-        # Retorna dados completos para notificação
-        return {
-            'statusCode': 200,
-            'body': {
-                'success': True,
-                'message': 'Agendamento confirmado com sucesso',
-                'agendamento_id': agendamento_id,
-                'dados': dados
-            }
-        }
+        # Só confirma depois da gravação no disco
+        sincronizar_agendamentos((data,))
+        marcar(trace, 'persistido')
+        return _resposta_confirmado(agendamento_id, dados)
     
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'body': {
-                'success': False,
-                'message': f'Erro ao processar: {str(e)}'
+        return _resposta_erro(e)
+
+
+@medir_lambda('valida_agendamento_lote')
+def handler_lote(eventos):
+    """
+    Valida um lote de agendamentos (mensagens recebidas juntas da fila)
+
+    Todos os horários do lote são reservados atomicamente com uma única
+    escrita no storage; conflitos com agendamentos existentes ou entre
+    mensagens do mesmo lote (a primeira vence) recebem 409. Um horário que
+    já é do mesmo cliente (mensagem reentregue) é confirmado de novo.
+
+    Args:
+        eventos: lista de eventos no formato aceito por `handler`
+
+    Returns:
+        list: uma resposta por evento, na mesma ordem
+    """
+    respostas = [None] * len(eventos)
+    validos = []
+
+    for posicao, event in enumerate(eventos):
+        try:
+            dados = json.loads(event) if isinstance(event, str) else event
+            marcar(dados.get('trace'), 'desenfileirado')
+            validos.append((posicao, dados))
+        except Exception as e:
+            respostas[posicao] = _resposta_erro(e)
+
+    if not validos:
+        return respostas
+
+    try:
+        ids = reservar_slots_lote([
+            {
+                'cliente_email': dados.get('cliente_email'),
+                'barbeiro': dados.get('barbeiro'),
+                'data': dados.get('data'),
+                'horario': dados.get('horario')
             }
-        }
+            for _, dados in validos
+        ], sincronizar=False)
+        criados = set(ids)
+        for indice, ((_, dados), agendamento_id) in enumerate(zip(validos, ids)):
+            # Reentrega de uma mensagem já processada: o horário é do próprio
+            # cliente (e não de um item anterior deste lote)
+            if agendamento_id is None:
+                existente = get_id_agendamento_do_cliente(dados.get('cliente_email'), dados.get('barbeiro'),
+                                                          dados.get('data'), dados.get('horario'))
+                if existente not in criados:
+                    ids[indice] = existente
+            marcar(dados.get('trace'), 'validado')
+        # Só confirma depois da gravação no disco (uma só para o lote)
+        sincronizar_agendamentos({
+            dados.get('data') for (_, dados), agendamento_id in zip(validos, ids) if agendamento_id is not None
+        })
+    except Exception as e:
+        for posicao, _ in validos:
+            respostas[posicao] = _resposta_erro(e)
+        return respostas
+
+    for (posicao, dados), agendamento_id in zip(validos, ids):
+        if agendamento_id is None:
+            respostas[posicao] = _resposta_conflito(dados.get('barbeiro'), dados.get('data'), dados.get('horario'))
+        else:
+            marcar(dados.get('trace'), 'persistido')
+            respostas[posicao] = _resposta_confirmado(agendamento_id, dados)
 
+    return respostas
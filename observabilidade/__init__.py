@@ -0,0 +1 @@
+# Observabilidade package
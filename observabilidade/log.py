@@ -0,0 +1,274 @@
+"""
+Log estruturado e assíncrono
+Os registros são colocados em um buffer e escritos por uma thread própria,
+em lotes, como uma linha JSON cada; quem loga não espera pela escrita
+
+Configuração por variáveis de ambiente:
+    LOG_LEVEL       - DEBUG, INFO (padrão), WARNING ou ERROR
+    LOG_AMOSTRAGEM  - fração (0 a 1) dos registros abaixo de WARNING que é
+                      mantida (padrão 1: todos)
+    LOG_PII         - 1 desliga a mascaração de dados pessoais
+"""
+from fila.buffer import BufferBloqueante
+from observabilidade.metricas import registro
+from datetime import datetime
+import atexit
+import functools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+# Registros aguardando escrita; com o buffer cheio os novos são descartados
+CAPACIDADE_BUFFER = 10000
+
+# Máximo de registros por escrita no stream
+TAMANHO_LOTE = 500
+
+# Pausa da thread de escrita entre lotes incompletos (s): acumula registros
+# em vez de acordar a cada um
+INTERVALO_ESCRITA = 0.05
+
+# Campos com dados pessoais (mascarados na escrita)
+CAMPOS_PII = frozenset({
+    'email', 'cliente_email', 'celular', 'cliente_celular', 'destinatario',
+    'nome', 'sobrenome', 'cliente_nome'
+})
+
+_RE_EMAIL = re.compile(r'([A-Za-z0-9._%+-])[A-Za-z0-9._%+-]*@([A-Za-z0-9.-]+\.[A-Za-z]{2,})')
+_RE_DIGITO = re.compile(r'\d')
+# Telefones no formato brasileiro: 11988887777, (11) 98888-7777, +55 11 98888-7777
+_RE_TELEFONE = re.compile(r'(?<!\d)(?:\+?\d{2}\s?)?\(?\d{2}\)?\s?9?\d{4}-?\d{2}(\d{2})(?!\d)')
+
+
+# Campos com nomes de pessoas: além do próprio campo, os nomes são mascarados
+# onde aparecerem no texto do registro (ex: corpo de uma notificação)
+CAMPOS_NOME = frozenset({'nome', 'sobrenome', 'cliente_nome'})
+
+# Partes de nome mais curtas que isso (ex: "da", "de") só são mascaradas no nome completo
+TAMANHO_MINIMO_NOME = 3
+
+
+def mascarar(valor, nomes=()):
+    """Mascara e-mails, telefones e os nomes informados dentro de um texto"""
+    if not isinstance(valor, str):
+        return valor
+    # A maioria das mensagens é um texto fixo: evita as substituições sem '@' ou dígitos
+    if '@' in valor:
+        valor = _RE_EMAIL.sub(r'\1***@\2', valor)
+    if _RE_DIGITO.search(valor):
+        valor = _RE_TELEFONE.sub(r'***\1', valor)
+    if nomes:
+        valor = _padrao_nomes(tuple(nomes)).sub(_inicial_mascarada, valor)
+    return valor
+
+
+def _inicial_mascarada(achado):
+    return achado.group()[:1] + '***'
+
+
+@functools.lru_cache(maxsize=1024)
+def _padrao_nomes(nomes):
+    """Regex de cada nome (completo ou cada parte), compilada uma vez por cliente"""
+    partes = set()
+    for nome in nomes:
+        partes.add(nome)
+        partes.update(parte for parte in nome.split() if len(parte) >= TAMANHO_MINIMO_NOME)
+    # Mais longos primeiro: o nome completo vence as suas partes
+    padrao = '|'.join(re.escape(parte) for parte in sorted(partes, key=len, reverse=True))
+    return re.compile(rf'(?<!\w)(?:{padrao})(?!\w)')
+
+
+def _nomes_do_registro(campos):
+    """Nomes de pessoas nos campos do registro (texto ou lista de textos)"""
+    nomes = []
+    for nome in CAMPOS_NOME & campos.keys():
+        valor = campos[nome]
+        for texto in (valor if isinstance(valor, (list, tuple)) else (valor,)):
+            if isinstance(texto, str) and texto.strip():
+                nomes.append(texto.strip())
+    return nomes
+
+
+def _mascarar_campo(nome, valor):
+    """E-mail vira a***@dominio, telefone ***<2 últimos dígitos>, nome a***"""
+    if nome not in CAMPOS_PII or valor is None:
+        return valor
+    if isinstance(valor, (list, tuple)):
+        return [_mascarar_campo(nome, item) for item in valor]
+    texto = str(valor)
+    if '@' in texto:
+        return mascarar(texto)
+    if texto[-2:].isdigit():
+        return '***' + texto[-2:]
+    return texto[:1] + '***'
+
+
+class FiltroAmostragem(logging.Filter):
+    """Mantém só uma fração dos registros abaixo de WARNING"""
+
+    def __init__(self, taxa):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.taxa >= 1 or random.random() < self.taxa
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro: ts, nivel, logger, msg e os campos do evento"""
+
+    def __init__(self, mascarar_pii=True):
+        super().__init__()
+        self.mascarar_pii = mascarar_pii
+
+    def format(self, record):
+        documento = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        campos = getattr(record, 'campos', {})
+        for nome, valor in campos.items():
+            documento[nome] = _mascarar_campo(nome, valor) if self.mascarar_pii else valor
+        if record.exc_info:
+            documento['erro'] = self.formatException(record.exc_info)
+        if self.mascarar_pii:
+            documento['msg'] = mascarar(documento['msg'], _nomes_do_registro(campos))
+        return json.dumps(documento, ensure_ascii=False, default=str)
+
+
+class HandlerAssincrono(logging.Handler):
+    """
+    Handler que só enfileira o registro; a formatação (inclusive a
+    mascaração de PII) e a escrita acontecem na thread de escrita
+
+    Com o buffer cheio o registro é descartado e contado em `descartados`,
+    para que o log nunca bloqueie o fluxo de agendamento. A thread de
+    escrita só é criada com o primeiro registro.
+    """
+
+    def __init__(self, stream=None, capacidade=CAPACIDADE_BUFFER, tamanho_lote=TAMANHO_LOTE,
+                 intervalo=INTERVALO_ESCRITA):
+        super().__init__()
+        self.stream = stream
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.descartados = 0
+        self._buffer = BufferBloqueante(capacidade=capacidade)
+        self._pendentes = 0
+        self._condicao_pendentes = threading.Condition()
+        self._escritor = None
+
+    def _iniciar_escritor(self):
+        with self._condicao_pendentes:
+            if self._escritor is None:
+                self._escritor = threading.Thread(target=self._escrever, name='log-escritor', daemon=True)
+                self._escritor.start()
+
+    def emit(self, record):
+        if self._escritor is None:
+            self._iniciar_escritor()
+        with self._condicao_pendentes:
+            self._pendentes += 1
+        if not self._buffer.put(record, timeout=0):
+            self.descartados += 1
+            self._concluir(1)
+
+    def _escrever(self):
+        while True:
+            lote = self._buffer.get_lote(self.tamanho_lote, timeout=60)
+            if not lote:
+                continue
+            try:
+                linhas = []
+                for record in lote:
+                    try:
+                        linhas.append(self.format(record) + '\n')
+                    except Exception:
+                        self.handleError(record)
+                stream = self.stream or sys.stderr
+                stream.write(''.join(linhas))
+                stream.flush()
+            except Exception:
+                pass
+            finally:
+                self._concluir(len(lote))
+            if len(lote) < self.tamanho_lote:
+                time.sleep(self.intervalo)
+
+    def _concluir(self, quantidade):
+        with self._condicao_pendentes:
+            self._pendentes -= quantidade
+            if self._pendentes <= 0:
+                self._condicao_pendentes.notify_all()
+
+    def flush(self, timeout=5):
+        """Espera a escrita dos registros já enfileirados"""
+        with self._condicao_pendentes:
+            self._condicao_pendentes.wait_for(lambda: self._pendentes <= 0, timeout)
+
+
+class LoggerEstruturado(logging.LoggerAdapter):
+    """
+    Logger com campos nomeados: log.info('mensagem enfileirada', grupo=barbeiro)
+
+    Os argumentos nomeados (exceto exc_info, stack_info e stacklevel) viram
+    campos do JSON.
+    """
+
+    _RESERVADOS = ('exc_info', 'stack_info', 'stacklevel', 'extra')
+
+    def process(self, msg, kwargs):
+        campos = {nome: kwargs.pop(nome) for nome in list(kwargs) if nome not in self._RESERVADOS}
+        kwargs['extra'] = {'campos': campos}
+        return msg, kwargs
+
+
+_handler = None
+_lock = threading.Lock()
+
+
+def configurar(nivel=None, amostragem=None, mascarar_pii=None, stream=None):
+    """Instala o handler assíncrono no logger 'barbearia' (chamadas repetidas só ajustam o nível)"""
+    global _handler
+    nivel = nivel or os.environ.get('LOG_LEVEL', 'INFO')
+    amostragem = float(os.environ.get('LOG_AMOSTRAGEM', 1) if amostragem is None else amostragem)
+    if mascarar_pii is None:
+        mascarar_pii = os.environ.get('LOG_PII') != '1'
+
+    raiz = logging.getLogger('barbearia')
+    raiz.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    with _lock:
+        if _handler is None:
+            _handler = HandlerAssincrono(stream=stream)
+            raiz.addHandler(_handler)
+            raiz.propagate = False
+            atexit.register(_handler.flush)
+            registro.contador(
+                'log_registros_descartados_total', 'Registros de log descartados com o buffer cheio',
+                funcao=lambda: _handler.descartados
+            )
+        elif stream is not None:
+            _handler.stream = stream
+        _handler.setFormatter(FormatadorJSON(mascarar_pii=mascarar_pii))
+        _handler.filters = [FiltroAmostragem(amostragem)] if amostragem < 1 else []
+    return _handler
+
+
+def obter_logger(nome):
+    """Logger estruturado 'barbearia.<nome>'"""
+    if _handler is None:
+        configurar()
+    return LoggerEstruturado(logging.getLogger(f'barbearia.{nome}'), {})
+
+
+def flush(timeout=5):
+    """Espera a escrita dos registros pendentes"""
+    if _handler is not None:
+        _handler.flush(timeout)
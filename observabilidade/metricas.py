@@ -0,0 +1,182 @@
+"""
+Métricas em memória exportadas no formato texto do Prometheus
+Contadores, histogramas e medidores com rótulos; cada atualização custa um
+lock e uma soma, então a instrumentação pode ficar ligada em produção
+"""
+from contextlib import contextmanager
+import bisect
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites (em segundos) dos histogramas de duração
+BUCKETS_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, descricao, rotulos=(), funcao=None):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        # funcao: lida na exportação; retorna um número ou {valores dos rótulos: número}
+        self.funcao = funcao
+        self._valores = {}
+        self._lock = threading.Lock()
+        if not self.rotulos and self.tipo != 'histogram':
+            # Sem rótulos a série existe desde o início (exportada como 0)
+            self._valores[()] = 0
+
+    def _chave(self, rotulos):
+        return tuple(rotulos.get(nome, '') for nome in self.rotulos)
+
+    def _amostras(self):
+        if self.funcao is None:
+            with self._lock:
+                return list(self._valores.items())
+        valor = self.funcao()
+        if isinstance(valor, dict):
+            return [(chave if isinstance(chave, tuple) else (chave,), numero) for chave, numero in valor.items()]
+        return [((), valor)]
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} {self.tipo}']
+        for chave, valor in self._amostras():
+            linhas.append(f'{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(valor)}')
+        return linhas
+
+
+class Contador(_Metrica):
+    """Valor que só cresce (ex: total de requisições)"""
+
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+
+class Medidor(_Metrica):
+    """Valor instantâneo (ex: mensagens na fila); com `funcao`, lido na exportação"""
+
+    tipo = 'gauge'
+
+    def definir(self, valor, **rotulos):
+        with self._lock:
+            self._valores[self._chave(rotulos)] = valor
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, valor=1, **rotulos):
+        self.inc(-valor, **rotulos)
+
+
+class Histograma(_Metrica):
+    """Distribuição de valores em buckets cumulativos (ex: duração em segundos)"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, rotulos=(), buckets=BUCKETS_PADRAO):
+        super().__init__(nome, descricao, rotulos)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        posicao = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._valores.get(chave)
+            if serie is None:
+                # [contagem por bucket (+Inf no fim), soma, total]
+                serie = self._valores[chave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][posicao] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        """Observa a duração do bloco `with`"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} {self.tipo}']
+        with self._lock:
+            series = [(chave, list(contagens), soma, total) for chave, (contagens, soma, total) in self._valores.items()]
+        for chave, contagens, soma, total in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, chave, f'le="{_formatar_numero(limite)}"')
+                linhas.append(f'{self.nome}_bucket{rotulos} {acumulado}')
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f'{self.nome}_sum{rotulos} {_formatar_numero(soma)}')
+            linhas.append(f'{self.nome}_count{rotulos} {total}')
+        return linhas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas exportadas juntas; registrar o mesmo nome devolve a métrica existente"""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, classe, nome, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, *args, **kwargs)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"Métrica {nome} já registrada como {metrica.tipo}")
+            return metrica
+
+    def contador(self, nome, descricao, rotulos=(), funcao=None):
+        return self._registrar(Contador, nome, descricao, rotulos, funcao)
+
+    def medidor(self, nome, descricao, rotulos=(), funcao=None):
+        return self._registrar(Medidor, nome, descricao, rotulos, funcao)
+
+    def histograma(self, nome, descricao, rotulos=(), buckets=BUCKETS_PADRAO):
+        return self._registrar(Histograma, nome, descricao, rotulos, buckets)
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus"""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            try:
+                linhas.extend(metrica.exportar())
+            except Exception as e:
+                linhas.append(f'# ERRO {metrica.nome}: {e}')
+        return '\n'.join(linhas) + '\n'
+
+
+# Registro global (exportado em GET /metrics)
+registro = RegistroMetricas()
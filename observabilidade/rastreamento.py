@@ -0,0 +1,67 @@
+"""
+Rastreamento dos pedidos de agendamento ao longo do fluxo
+Cada mensagem leva um trace_id e o instante (epoch) em que passou por cada
+etapa; a duração de cada etapa alimenta os histogramas de /metrics
+"""
+from observabilidade.metricas import registro
+import functools
+import os
+import time
+
+# Etapas na ordem do fluxo
+ETAPAS = ('recebido', 'enfileirado', 'desenfileirado', 'validado', 'persistido', 'notificado')
+
+_duracao_etapa = registro.histograma(
+    'agendamento_etapa_segundos',
+    'Tempo desde a etapa anterior do pedido (desenfileirado = espera na fila)',
+    rotulos=('etapa',)
+)
+_duracao_total = registro.histograma(
+    'agendamento_fluxo_segundos',
+    'Tempo do recebimento até a notificação de um agendamento confirmado'
+)
+_duracao_lambda = registro.histograma(
+    'lambda_duracao_segundos', 'Duração de cada invocação de Lambda', rotulos=('funcao',)
+)
+_invocacoes_lambda = registro.contador(
+    'lambda_invocacoes_total', 'Invocações de Lambda por status HTTP', rotulos=('funcao', 'status')
+)
+
+
+def novo_trace(trace_id=None):
+    """Trace de um pedido que acabou de chegar (etapa recebido)"""
+    return {'trace_id': trace_id or os.urandom(8).hex(), 'etapas': {'recebido': time.time()}}
+
+
+def marcar(trace, etapa):
+    """Registra a etapa no trace (dict da mensagem) e observa sua duração"""
+    if not trace:
+        return
+    agora = time.time()
+    etapas = trace.setdefault('etapas', {})
+    if etapas:
+        _duracao_etapa.observar(max(0.0, agora - max(etapas.values())), etapa=etapa)
+    etapas[etapa] = agora
+    if etapa == 'notificado' and 'recebido' in etapas:
+        _duracao_total.observar(agora - etapas['recebido'])
+
+
+def medir_lambda(nome):
+    """Decorator: duração e status (statusCode da resposta) de um handler"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def instrumentado(event):
+            inicio = time.perf_counter()
+            status = 'erro'
+            try:
+                resultado = handler(event)
+                if isinstance(resultado, dict):
+                    status = resultado.get('statusCode', status)
+                else:
+                    status = 'lote'
+                return resultado
+            finally:
+                _duracao_lambda.observar(time.perf_counter() - inicio, funcao=nome)
+                _invocacoes_lambda.inc(funcao=nome, status=status)
+        return instrumentado
+    return decorator
@@ -0,0 +1,291 @@
+"""
+Log de notificações do SNS com memória limitada
+As notificações recentes ficam em um buffer circular; as mais antigas são
+gravadas em segmentos compactados (gzip) que rotacionam no disco, por uma
+thread própria (quem publica nunca espera pela escrita)
+
+Configuração por variáveis de ambiente:
+    SNS_LOG_DIR - diretório dos segmentos (padrão database/data/notificacoes)
+    LOG_PII     - 1 grava os segmentos sem mascarar os dados pessoais
+"""
+from fila.buffer import BufferBloqueante
+from observabilidade.log import mascarar
+from datetime import datetime
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+FORMATO_TIMESTAMP = '%Y-%m-%d %H:%M:%S'
+
+# Segmentos ficam junto dos dados, fora do pacote (relativo ao diretório de trabalho)
+DIRETORIO_PADRAO = os.environ.get('SNS_LOG_DIR', 'database/data/notificacoes')
+
+
+def nomes_clientes(message):
+    """Clientes citados na notificação (agendamento ou lista do resumo)"""
+    agendamentos = message.get('agendamentos') or [message.get('agendamento') or {}]
+    return tuple(agendamento['cliente_nome'] for agendamento in agendamentos if agendamento.get('cliente_nome'))
+
+
+class RegistroNotificacao:
+    """Registro compacto de uma notificação"""
+
+    __slots__ = ('timestamp', 'tipo', 'destinatario', 'assunto', 'conteudo', 'nomes', 'chave')
+
+    def __init__(self, timestamp, tipo, destinatario, assunto, conteudo, nomes=(), chave=None):
+        self.timestamp = timestamp
+        self.tipo = tipo
+        self.destinatario = destinatario
+        self.assunto = assunto
+        self.conteudo = conteudo
+        # Nomes dos clientes citados, mascarados no texto ao gravar no disco
+        self.nomes = nomes
+        # Hash do destinatário original nos registros gravados mascarados (ver consultar)
+        self.chave = chave
+
+    @classmethod
+    def de_mensagem(cls, timestamp, message):
+        tipo = message.get('tipo')
+        conteudo = message.get('corpo') if tipo == 'email' else message.get('mensagem')
+        return cls(timestamp, tipo, message.get('destinatario'), message.get('assunto'), conteudo,
+                   nomes_clientes(message))
+
+    def para_dict(self):
+        """Formato das entradas de get_log: {'timestamp': str, 'message': dict}"""
+        message = {'tipo': self.tipo, 'destinatario': self.destinatario}
+        if self.tipo == 'email':
+            message['assunto'] = self.assunto
+            message['corpo'] = self.conteudo
+        else:
+            message['mensagem'] = self.conteudo
+        return {
+            'timestamp': datetime.fromtimestamp(self.timestamp).strftime(FORMATO_TIMESTAMP),
+            'message': message
+        }
+
+    def para_linha(self, mascarar_pii=False):
+        if not mascarar_pii:
+            return json.dumps([self.timestamp, self.tipo, self.destinatario, self.assunto, self.conteudo])
+        return json.dumps([self.timestamp, self.tipo, mascarar(self.destinatario),
+                           mascarar(self.assunto, self.nomes), mascarar(self.conteudo, self.nomes),
+                           (), chave_destinatario(self.destinatario)])
+
+    @classmethod
+    def de_linha(cls, linha):
+        return cls(*json.loads(linha))
+
+
+def chave_destinatario(destinatario):
+    """Identifica o destinatário nos segmentos mascarados sem guardar o valor"""
+    if destinatario is None:
+        return None
+    return hashlib.sha256(str(destinatario).encode('utf-8')).hexdigest()[:16]
+
+
+def _para_epoch(valor):
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    if isinstance(valor, str):
+        valor = datetime.strptime(valor, FORMATO_TIMESTAMP)
+    return valor.timestamp()
+
+
+class LogNotificacoes:
+    """
+    Log de notificações com capacidade fixa em memória
+
+    Args:
+        capacidade: quantidade de registros recentes mantidos em memória
+        diretorio: onde ficam os segmentos; None descarta os registros antigos
+        registros_por_segmento: registros em cada arquivo antes de rotacionar
+        max_segmentos: segmentos mantidos no disco (os mais antigos são apagados)
+        tamanho_bloco: registros antigos acumulados antes de cada escrita no disco
+        mascarar_pii: mascara e-mails, telefones e nomes dos clientes nos
+            segmentos (None: segue LOG_PII)
+
+    Cada processo grava e rotaciona só os seus segmentos (o pid faz parte do
+    nome do arquivo), então vários workers podem usar o mesmo diretório.
+
+    Cada bloco de registros antigos é só entregue à thread de escrita (criada
+    no primeiro bloco); a compactação, a rotação e a limpeza dos segmentos
+    acontecem nela, fora do lock de `adicionar`.
+    """
+
+    def __init__(self, capacidade=1000, diretorio=DIRETORIO_PADRAO, registros_por_segmento=10000,
+                 max_segmentos=10, tamanho_bloco=200, mascarar_pii=None):
+        self.capacidade = capacidade
+        self.diretorio = diretorio
+        if mascarar_pii is None:
+            mascarar_pii = os.environ.get('LOG_PII') != '1'
+        self.mascarar_pii = mascarar_pii
+        self.registros_por_segmento = registros_por_segmento
+        self.max_segmentos = max_segmentos
+        self.tamanho_bloco = tamanho_bloco
+
+        self._buffer = [None] * capacidade
+        self._inicio = 0
+        self._tamanho = 0
+        self._transbordo = []
+        self._segmento_atual = None
+        self._registros_no_segmento = 0
+        self._lock = threading.Lock()
+
+        # Blocos aguardando a thread de escrita
+        self._blocos = BufferBloqueante()
+        self._blocos_pendentes = 0
+        self._condicao_pendentes = threading.Condition()
+        self._escritor = None
+
+    def adicionar(self, registro):
+        with self._lock:
+            if self._tamanho < self.capacidade:
+                self._buffer[(self._inicio + self._tamanho) % self.capacidade] = registro
+                self._tamanho += 1
+                return
+
+            # Buffer cheio: o mais antigo sai da memória e vai para o disco
+            antigo = self._buffer[self._inicio]
+            self._buffer[self._inicio] = registro
+            self._inicio = (self._inicio + 1) % self.capacidade
+
+            if self.diretorio:
+                self._transbordo.append(antigo)
+                if len(self._transbordo) >= self.tamanho_bloco:
+                    self._enviar_transbordo()
+
+    def __len__(self):
+        return self._tamanho
+
+    def _recentes(self):
+        with self._lock:
+            return [self._buffer[(self._inicio + i) % self.capacidade] for i in range(self._tamanho)]
+
+    # Disco
+
+    def _segmentos(self):
+        """Segmentos deste processo, do mais antigo para o mais novo"""
+        if not self.diretorio:
+            return []
+        return sorted(glob.glob(os.path.join(self.diretorio, f'notificacoes-{os.getpid()}-*.jsonl.gz')))
+
+    @staticmethod
+    def _inicio_segmento(caminho):
+        return float(os.path.basename(caminho).split('-')[2])
+
+    def _enviar_transbordo(self):
+        """Passa o transbordo para a thread de escrita (chamado com self._lock)"""
+        bloco, self._transbordo = self._transbordo, []
+        if self._escritor is None:
+            self._escritor = threading.Thread(target=self._escrever, name='sns-log-escritor', daemon=True)
+            self._escritor.start()
+        with self._condicao_pendentes:
+            self._blocos_pendentes += 1
+        # Ainda sob self._lock: os blocos chegam ao escritor na ordem do log
+        self._blocos.put(bloco)
+
+    def _escrever(self):
+        while True:
+            bloco = self._blocos.get(timeout=60)
+            if bloco is None:
+                continue
+            try:
+                self._gravar(bloco)
+            except Exception:
+                pass
+            finally:
+                with self._condicao_pendentes:
+                    self._blocos_pendentes -= 1
+                    self._condicao_pendentes.notify_all()
+
+    def _gravar(self, registros):
+        while registros:
+            if self._segmento_atual is None or self._registros_no_segmento >= self.registros_por_segmento:
+                self._rotacionar(registros[0].timestamp)
+
+            espaco = self.registros_por_segmento - self._registros_no_segmento
+            bloco, registros = registros[:espaco], registros[espaco:]
+            # Cada bloco vira um membro gzip anexado ao arquivo (formato válido)
+            with gzip.open(self._segmento_atual, 'at', encoding='utf-8') as arquivo:
+                arquivo.write(''.join(registro.para_linha(self.mascarar_pii) + '\n' for registro in bloco))
+            self._registros_no_segmento += len(bloco)
+
+    def _rotacionar(self, timestamp):
+        os.makedirs(self.diretorio, exist_ok=True)
+        segmentos = self._segmentos()
+        sequencia = int(segmentos[-1].rsplit('-', 1)[1].split('.')[0]) + 1 if segmentos else 0
+        # Timestamp com largura fixa para que a ordem alfabética seja cronológica
+        self._segmento_atual = os.path.join(
+            self.diretorio, f"notificacoes-{os.getpid()}-{timestamp:017.6f}-{sequencia:06d}.jsonl.gz"
+        )
+        self._registros_no_segmento = 0
+
+        for antigo in segmentos[:max(0, len(segmentos) + 1 - self.max_segmentos)]:
+            os.remove(antigo)
+
+    def flush(self, timeout=None):
+        """Grava no disco os registros antigos ainda pendentes e espera a escrita"""
+        with self._lock:
+            if self._transbordo:
+                self._enviar_transbordo()
+        with self._condicao_pendentes:
+            return self._condicao_pendentes.wait_for(lambda: self._blocos_pendentes <= 0, timeout)
+
+    def _arquivados(self, inicio, fim):
+        """Lê os segmentos em streaming, pulando os que estão fora do intervalo"""
+        segmentos = self._segmentos()
+        for posicao, caminho in enumerate(segmentos):
+            if fim is not None and self._inicio_segmento(caminho) > fim:
+                break
+            if inicio is not None and posicao + 1 < len(segmentos) \
+                    and self._inicio_segmento(segmentos[posicao + 1]) < inicio:
+                continue
+            with gzip.open(caminho, 'rt', encoding='utf-8') as arquivo:
+                for linha in arquivo:
+                    yield RegistroNotificacao.de_linha(linha)
+
+    # Consulta
+
+    def consultar(self, destinatario=None, inicio=None, fim=None, limite=None, offset=0,
+                  incluir_arquivo=False):
+        """
+        Busca registros em ordem cronológica
+
+        Args:
+            destinatario: filtra pelo destinatário
+            inicio, fim: intervalo de tempo (datetime, epoch ou 'YYYY-MM-DD HH:MM:SS')
+            limite, offset: paginação sobre os registros filtrados
+            incluir_arquivo: também percorre os segmentos no disco
+
+        Returns:
+            list: entradas no formato {'timestamp': str, 'message': dict}
+        """
+        inicio = _para_epoch(inicio)
+        fim = _para_epoch(fim)
+
+        chave = chave_destinatario(destinatario)
+
+        def candidatos():
+            if incluir_arquivo:
+                self.flush()
+                yield from self._arquivados(inicio, fim)
+            yield from self._recentes()
+
+        resultado = []
+        for registro in candidatos():
+            if destinatario is not None and (registro.chave != chave if registro.chave
+                                             else registro.destinatario != destinatario):
+                continue
+            if inicio is not None and registro.timestamp < inicio:
+                continue
+            if fim is not None and registro.timestamp > fim:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            resultado.append(registro.para_dict())
+            if limite is not None and len(resultado) >= limite:
+                break
+        return resultado
@@ -0,0 +1,144 @@
+"""
+Agrupamento de notificações por destinatário em resumos
+As notificações de um mesmo destinatário são guardadas por uma janela de
+tempo (ou até juntar um número máximo) e saem como uma única mensagem,
+ex: "Você tem 7 novos agendamentos"
+"""
+from sns.templates import catalogo, diretorio_barbeiros
+from observabilidade.metricas import registro
+from observabilidade.log import obter_logger
+import os
+import threading
+import time
+
+# Janela (s) e máximo de notificações por resumo; RESUMO_JANELA=0 desliga o
+# agrupamento (o barbeiro recebe uma mensagem por agendamento)
+RESUMO_JANELA = float(os.environ.get('RESUMO_JANELA', 900))
+RESUMO_MAX_ITENS = int(os.environ.get('RESUMO_MAX_ITENS', 25))
+
+log = obter_logger('sns.resumo')
+
+_resumos = registro.contador('sns_resumos_total', 'Resumos enviados', rotulos=('canal',))
+_agrupadas = registro.contador(
+    'sns_notificacoes_agrupadas_total', 'Notificações entregues dentro de um resumo', rotulos=('canal',)
+)
+
+
+class AgregadorNotificacoes:
+    """
+    Junta as notificações de cada (canal, destinatario) e publica um resumo
+
+    Recebe os envelopes de uma assinatura sqs do tópico (`put`). O grupo de
+    um destinatário é publicado quando completa `max_itens` ou quando
+    passam `janela` segundos desde a primeira notificação; `flush` publica
+    todos os grupos pendentes (chamado no encerramento). Um grupo com uma
+    só notificação sai como a mensagem original.
+
+    Args:
+        publicar: função que entrega a mensagem (ex: sns_notifier.publish)
+        resumir: função (chave, envelopes) -> mensagem do resumo
+    """
+
+    def __init__(self, publicar, resumir, janela=RESUMO_JANELA, max_itens=RESUMO_MAX_ITENS):
+        self.publicar = publicar
+        self.resumir = resumir
+        self.janela = janela
+        self.max_itens = max_itens
+        # (canal, destinatario) -> (prazo, [envelopes])
+        self._grupos = {}
+        self._condicao = threading.Condition()
+        self._thread = None
+
+    def put(self, notificacao):
+        message = notificacao['Message']
+        chave = (message.get('tipo'), message.get('destinatario'))
+        completo = None
+        with self._condicao:
+            grupo = self._grupos.get(chave)
+            if grupo is None:
+                grupo = self._grupos[chave] = (time.monotonic() + self.janela, [])
+                self._iniciar()
+                self._condicao.notify()
+            grupo[1].append(notificacao)
+            if len(grupo[1]) >= self.max_itens:
+                completo = self._grupos.pop(chave)[1]
+        if completo:
+            self._emitir(chave, completo)
+        return True
+
+    def _iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._vencer, name='sns-resumo', daemon=True)
+            self._thread.start()
+
+    def _vencer(self):
+        """Loop da thread: publica os grupos cuja janela terminou"""
+        while True:
+            with self._condicao:
+                while True:
+                    agora = time.monotonic()
+                    vencidos = [chave for chave, (prazo, _) in self._grupos.items() if prazo <= agora]
+                    if vencidos:
+                        grupos = [(chave, self._grupos.pop(chave)[1]) for chave in vencidos]
+                        break
+                    proximo = min((prazo for prazo, _ in self._grupos.values()), default=None)
+                    self._condicao.wait(None if proximo is None else proximo - agora)
+            for chave, envelopes in grupos:
+                self._emitir(chave, envelopes)
+
+    def _emitir(self, chave, envelopes):
+        canal = chave[0]
+        try:
+            if len(envelopes) == 1:
+                self.publicar(envelopes[0]['Message'])
+                return
+            self.publicar(self.resumir(chave, envelopes))
+            _resumos.inc(canal=canal)
+            _agrupadas.inc(len(envelopes), canal=canal)
+        except Exception:
+            log.exception('falha ao publicar o resumo', canal=canal, destinatario=chave[1],
+                          quantidade=len(envelopes))
+
+    def flush(self):
+        """Publica agora todos os grupos pendentes"""
+        with self._condicao:
+            grupos = [(chave, envelopes) for chave, (_, envelopes) in self._grupos.items()]
+            self._grupos.clear()
+        for chave, envelopes in grupos:
+            self._emitir(chave, envelopes)
+
+    def __len__(self):
+        """Notificações aguardando o resumo"""
+        with self._condicao:
+            return sum(len(envelopes) for _, envelopes in self._grupos.values())
+
+
+def resumo_barbeiro(chave, envelopes):
+    """Mensagem de resumo dos novos agendamentos de um barbeiro (templates barbeiro_resumo_*)"""
+    canal, destinatario = chave
+    barbeiro = envelopes[0]['MessageAttributes'].get('barbeiro')
+    locale = diretorio_barbeiros.contato(barbeiro)['locale'] if barbeiro else None
+    agendamentos = sorted(
+        (envelope['Message'].get('agendamento') or {} for envelope in envelopes),
+        key=lambda agendamento: (agendamento.get('data') or '', agendamento.get('horario') or '')
+    )
+    itens = catalogo.obter('barbeiro_resumo_item', locale).renderizar_lote(agendamentos)
+    contexto = {
+        'barbeiro': barbeiro,
+        'quantidade': len(envelopes),
+        'itens': '\n'.join(itens)
+    }
+    if canal == 'sms':
+        return {
+            'tipo': 'sms',
+            'destinatario': destinatario,
+            'mensagem': catalogo.renderizar('barbeiro_resumo_sms', contexto, locale),
+            'agendamentos': agendamentos
+        }
+    return {
+        'tipo': 'email',
+        'destinatario': destinatario,
+        'assunto': catalogo.renderizar('barbeiro_resumo_assunto', contexto, locale),
+        'corpo': catalogo.renderizar('barbeiro_resumo_email', contexto, locale),
+        'agendamentos': agendamentos
+    }
@@ -1,18 +1,142 @@
 """
 Simulador de SNS (Simple Notification Service)
-Envia notificações via SMS e E-mail (simulado via print/log)
+Envia notificações via SMS e E-mail (simulado via log)
+
+A publicação só enfileira a notificação; a entrega (registro no log) é feita
+por um pool de workers por canal, que drena as filas em lotes. Com
+LOG_LEVEL=DEBUG o texto de cada notificação é registrado; com INFO, só a
+quantidade entregue em cada lote
+
+Mensagens publicadas em um tópico são distribuídas às assinaturas cuja
+política de filtro aceita os atributos da mensagem (ver sns/topicos.py).
+Assinaturas email e sms usam os canais acima; cada assinatura http ou sqs
+tem buffer e worker próprios, então um assinante lento não atrasa os
+outros nem quem publica
 """
-import json
+from fila.buffer import BufferBloqueante
+from sns.registro import LogNotificacoes, RegistroNotificacao, nomes_clientes
+from sns.topicos import Assinatura, Topico, ARN_PREFIXO
+from sns.resumo import AgregadorNotificacoes, resumo_barbeiro, RESUMO_JANELA
+from observabilidade.metricas import registro
+from observabilidade.log import obter_logger
 from datetime import datetime
+import json
+import logging
+import threading
+import time
+import uuid
+
+# Workers de entrega por canal
+WORKERS_POR_CANAL = {'email': 2, 'sms': 2}
+
+# Capacidade de cada fila de entrega e tempo máximo que publish espera por vaga
+# (só nos canais email e sms: o buffer cheio de uma assinatura http ou sqs
+# descarta a entrega em vez de bloquear quem publica)
+CAPACIDADE_CANAL = 1000
+TIMEOUT_PUBLICACAO = 5
+
+# Máximo de notificações entregues por escrita no console
+TAMANHO_LOTE = 50
+
+# Notificações recentes mantidas em memória (as antigas vão para SNS_LOG_DIR)
+CAPACIDADE_LOG = 1000
+
+log = obter_logger('sns')
+
+_notificacoes = registro.contador(
+    'sns_notificacoes_total', 'Notificações publicadas por canal', rotulos=('canal', 'resultado')
+)
+_duracao_entrega = registro.histograma(
+    'sns_entrega_segundos', 'Duração da entrega de um lote de notificações', rotulos=('canal',)
+)
 
 class SNSSimulator:
-    def __init__(self):
-        self.notifications_log = []
-    
-    def publish(self, message):
+    def __init__(self, workers_por_canal=None, capacidade=CAPACIDADE_CANAL,
+                 timeout_publicacao=TIMEOUT_PUBLICACAO, tamanho_lote=TAMANHO_LOTE,
+                 notifications_log=None):
+        self.notifications_log = notifications_log or LogNotificacoes(capacidade=CAPACIDADE_LOG)
+        self.workers_por_canal = workers_por_canal or WORKERS_POR_CANAL
+        self.timeout_publicacao = timeout_publicacao
+        self.tamanho_lote = tamanho_lote
+        self.canais = {
+            canal: BufferBloqueante(capacidade=capacidade)
+            for canal in self.workers_por_canal
+        }
+        self.capacidade = capacidade
+        self.workers = []
+        self.topicos = {}
+        self._assinaturas = {}
+        self._lock_topicos = threading.Lock()
+        self._pendentes = 0
+        self._condicao_pendentes = threading.Condition()
+        self._lock_workers = threading.Lock()
+
+    def create_topic(self, nome):
+        """Cria o tópico (ou devolve o existente) e retorna o seu ARN"""
+        with self._lock_topicos:
+            for topico in self.topicos.values():
+                if topico.nome == nome:
+                    return topico.arn
+            topico = Topico(nome)
+            self.topicos[topico.arn] = topico
+            return topico.arn
+
+    def _topico(self, topic_arn):
+        topico = self.topicos.get(topic_arn)
+        if topico is None:
+            raise ValueError(f"Tópico inexistente: {topic_arn}")
+        return topico
+
+    def subscribe(self, topic_arn, protocolo, endpoint=None, filter_policy=None):
         """
-        Publica uma notificação
-        
+        Assina um tópico
+
+        Args:
+            topic_arn: ARN devolvido por create_topic
+            protocolo: 'email', 'sms', 'http' ou 'sqs'
+            endpoint: destino da entrega (ver sns.topicos.Assinatura)
+            filter_policy: política de filtro sobre os atributos das
+                mensagens (ver sns.topicos.compilar_politica)
+
+        Returns:
+            str: ARN da assinatura
+        """
+        assinatura = Assinatura(topic_arn, protocolo, endpoint, filter_policy)
+        if protocolo in ('http', 'sqs'):
+            if endpoint is None:
+                raise ValueError(f"Assinatura {protocolo} precisa de endpoint")
+            assinatura.buffer = BufferBloqueante(capacidade=self.capacidade)
+        with self._lock_topicos:
+            self._topico(topic_arn).adicionar(assinatura)
+            self._assinaturas[assinatura.arn] = assinatura
+        if assinatura.buffer is not None:
+            thread = threading.Thread(
+                target=self._entregar_assinatura,
+                args=(assinatura,),
+                name=f"sns-{protocolo}-{len(self._assinaturas)}",
+                daemon=True
+            )
+            thread.start()
+        return assinatura.arn
+
+    def unsubscribe(self, subscription_arn):
+        """Remove a assinatura; as entregas já enfileiradas ainda são feitas"""
+        with self._lock_topicos:
+            assinatura = self._assinaturas.pop(subscription_arn, None)
+            if assinatura is None:
+                return False
+            self._topico(assinatura.topico_arn).remover(subscription_arn)
+        if assinatura.buffer is not None:
+            assinatura.buffer.fechar()
+        return True
+
+    def list_subscriptions_by_topic(self, topic_arn):
+        return [assinatura.para_dict() for assinatura in self._topico(topic_arn).assinaturas]
+
+    def publish(self, message, topic_arn=None, message_attributes=None):
+        """
+        Publica uma notificação (a entrega é assíncrona)
+
         Args:
             message: Dicionário com:
                 - tipo: 'email' ou 'sms'
@@ -20,39 +144,312 @@ class SNSSimulator:
                 - assunto: str (apenas para email)
                 - corpo: str (apenas para email)
                 - mensagem: str (apenas para sms)
+            topic_arn: publica no tópico em vez de entregar direto ao
+                destinatario
+            message_attributes: dict {nome: valor} avaliado pelas
+                políticas de filtro das assinaturas do tópico
+
+        Returns:
+            bool: False se a fila do canal continuou cheia por mais de
+                `timeout_publicacao` segundos (backpressure) ou, em um
+                tópico, se alguma entrega foi descartada
         """
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        if message.get('tipo') == 'email':
-            print("\n" + "="*60)
-            print(f"[SNS - EMAIL] {timestamp}")
-            print(f"Para: {message.get('destinatario')}")
-            print(f"Assunto: {message.get('assunto')}")
-            print("-" * 60)
-            print(message.get('corpo', ''))
-            print("="*60 + "\n")
-        
-        elif message.get('tipo') == 'sms':
-            print("\n" + "="*60)
-            print(f"[SNS - SMS] {timestamp}")
-            print(f"Para: {message.get('destinatario')}")
-            print("-" * 60)
-            print(message.get('mensagem', ''))
-            print("="*60 + "\n")
-        
+        if topic_arn is not None:
+            return self.publish_batch([message], topic_arn, [message_attributes])[0]
+
+        agora = time.time()
+        timestamp = datetime.fromtimestamp(agora).strftime('%Y-%m-%d %H:%M:%S')
+
+        canal = self.canais.get(message.get('tipo'))
+        if canal is not None:
+            self._iniciar_workers()
+            with self._condicao_pendentes:
+                self._pendentes += 1
+            if not canal.put((timestamp, message), timeout=self.timeout_publicacao):
+                self._concluir(1)
+                _notificacoes.inc(canal=message.get('tipo'), resultado='descartada')
+                log.warning('fila do canal cheia, notificação descartada', canal=message.get('tipo'))
+                return False
+
+        _notificacoes.inc(canal=message.get('tipo'), resultado='publicada')
+
         # Armazena no log
-        log_entry = {
-            'timestamp': timestamp,
-            'message': message
-        }
-        self.notifications_log.append(log_entry)
-        
+        self.notifications_log.adicionar(RegistroNotificacao.de_mensagem(agora, message))
+
         return True
-    
-    def get_log(self):
-        """Retorna o log de notificações"""
-        return self.notifications_log
 
-# Instância global do SNS
-sns_notifier = SNSSimulator()
+    def publish_batch(self, messages, topic_arn=None, message_attributes=None):
+        """
+        Publica várias notificações; retorna a lista de resultados de publish
+
+        Em um tópico, message_attributes é uma lista alinhada com messages e
+        as entregas de cada assinatura são enfileiradas de uma só vez.
+        """
+        if topic_arn is None:
+            return [self.publish(message) for message in messages]
+
+        topico = self._topico(topic_arn)
+        assinaturas = topico.assinaturas
+        atributos_lista = message_attributes or [None] * len(messages)
+        agora = time.time()
+        timestamp = datetime.fromtimestamp(agora).strftime('%Y-%m-%d %H:%M:%S')
+
+        # buffer -> (assinatura ou None nos canais email/sms, canal, [(posição, item)])
+        entregas = {}
+        for posicao, (message, atributos) in enumerate(zip(messages, atributos_lista)):
+            atributos = atributos or {}
+            notificacao = None
+            for assinatura in assinaturas:
+                if not assinatura.aceita(atributos):
+                    continue
+                if assinatura.buffer is None:
+                    entrega = self._para_canal(message, assinatura)
+                    buffer = self.canais[assinatura.protocolo]
+                    entregas.setdefault(buffer, (None, assinatura.protocolo, []))[2].append(
+                        (posicao, (timestamp, entrega))
+                    )
+                else:
+                    if notificacao is None:
+                        notificacao = self._notificacao(topico, message, atributos, agora)
+                    entregas.setdefault(assinatura.buffer, (assinatura, assinatura.protocolo, []))[2].append(
+                        (posicao, (timestamp, notificacao))
+                    )
+
+        resultados = [True] * len(messages)
+        if entregas:
+            self._iniciar_workers()
+        for buffer, (assinatura, canal, itens) in entregas.items():
+            with self._condicao_pendentes:
+                self._pendentes += len(itens)
+            timeout = self.timeout_publicacao if assinatura is None else 0
+            if not buffer.put_lote([item for _, item in itens], timeout=timeout):
+                self._concluir(len(itens))
+                _notificacoes.inc(len(itens), canal=canal, resultado='descartada')
+                log.warning('fila de entrega cheia, notificações descartadas', canal=canal,
+                            assinatura=assinatura.arn if assinatura else None, quantidade=len(itens))
+                for posicao, _ in itens:
+                    resultados[posicao] = False
+                continue
+            _notificacoes.inc(len(itens), canal=canal, resultado='publicada')
+            if assinatura is None:
+                for _, (_, entrega) in itens:
+                    self.notifications_log.adicionar(RegistroNotificacao.de_mensagem(agora, entrega))
+        return resultados
+
+    @staticmethod
+    def _para_canal(message, assinatura):
+        """Mensagem entregue por uma assinatura email/sms (endpoint fixo substitui o destinatario)"""
+        if assinatura.endpoint is None and message.get('tipo') == assinatura.protocolo:
+            return message
+        return {
+            **message,
+            'tipo': assinatura.protocolo,
+            'destinatario': assinatura.endpoint or message.get('destinatario')
+        }
+
+    @staticmethod
+    def _notificacao(topico, message, atributos, agora):
+        """Envelope entregue às assinaturas http e sqs (mesmos campos da notificação do SNS)"""
+        return {
+            'Type': 'Notification',
+            'MessageId': str(uuid.uuid4()),
+            'TopicArn': topico.arn,
+            'Subject': message.get('assunto'),
+            'Message': message,
+            'MessageAttributes': atributos,
+            'Timestamp': datetime.fromtimestamp(agora).isoformat(timespec='milliseconds')
+        }
+
+    @staticmethod
+    def _formatar(timestamp, message):
+        """Texto exibido no console para uma notificação"""
+        if message.get('tipo') == 'email':
+            return (
+                "\n" + "="*60 + "\n"
+                f"[SNS - EMAIL] {timestamp}\n"
+                f"Para: {message.get('destinatario')}\n"
+                f"Assunto: {message.get('assunto')}\n"
+                + "-" * 60 + "\n"
+                + message.get('corpo', '') + "\n"
+                + "="*60 + "\n\n"
+            )
+        return (
+            "\n" + "="*60 + "\n"
+            f"[SNS - SMS] {timestamp}\n"
+            f"Para: {message.get('destinatario')}\n"
+            + "-" * 60 + "\n"
+            + message.get('mensagem', '') + "\n"
+            + "="*60 + "\n\n"
+        )
+
+    def _iniciar_workers(self):
+        if self.workers:
+            return
+        with self._lock_workers:
+            if self.workers:
+                return
+            for canal, quantidade in self.workers_por_canal.items():
+                for indice in range(quantidade):
+                    thread = threading.Thread(
+                        target=self._entregar,
+                        args=(canal, self.canais[canal]),
+                        name=f"sns-{canal}-{indice}",
+                        daemon=True
+                    )
+                    thread.start()
+                    self.workers.append(thread)
+
+    def _entregar(self, nome, canal):
+        """Loop de um worker: drena o canal em lotes e registra as entregas no log"""
+        while True:
+            lote = canal.get_lote(self.tamanho_lote, timeout=60)
+            if not lote:
+                continue
+            try:
+                with _duracao_entrega.cronometrar(canal=nome):
+                    debug = log.isEnabledFor(logging.DEBUG)
+                    for timestamp, message in lote:
+                        # Os nomes dos clientes são mascarados também dentro do texto
+                        nomes = nomes_clientes(message)
+                        log.info('notificação entregue', canal=nome,
+                                 destinatario=message.get('destinatario'), cliente_nome=nomes)
+                        if debug:
+                            log.debug(self._formatar(timestamp, message), canal=nome,
+                                      destinatario=message.get('destinatario'), cliente_nome=nomes)
+            finally:
+                self._concluir(len(lote))
+
+    def _entregar_assinatura(self, assinatura):
+        """Loop do worker de uma assinatura http ou sqs (termina no unsubscribe)"""
+        buffer = assinatura.buffer
+        protocolo = assinatura.protocolo
+        while True:
+            lote = buffer.get_lote(self.tamanho_lote, timeout=60)
+            if not lote:
+                if buffer.fechado:
+                    return
+                continue
+            try:
+                with _duracao_entrega.cronometrar(canal=protocolo):
+                    for _, notificacao in lote:
+                        try:
+                            self._enviar_notificacao(assinatura, notificacao)
+                        except Exception as e:
+                            _notificacoes.inc(canal=protocolo, resultado='falha')
+                            log.warning('falha na entrega ao assinante', canal=protocolo,
+                                        assinatura=assinatura.arn, erro=str(e))
+            finally:
+                self._concluir(len(lote))
+
+    @staticmethod
+    def _enviar_notificacao(assinatura, notificacao):
+        endpoint = assinatura.endpoint
+        if assinatura.protocolo == 'http':
+            if callable(endpoint):
+                endpoint(notificacao)
+            else:
+                # Sem rede: o POST ao webhook é só registrado
+                log.info('webhook notificado', url=endpoint, message_id=notificacao['MessageId'])
+        elif hasattr(endpoint, 'send_message'):
+            endpoint.send_message(json.dumps(notificacao, ensure_ascii=False, default=str))
+        else:
+            endpoint.put(notificacao)
+
+    def _concluir(self, quantidade):
+        with self._condicao_pendentes:
+            self._pendentes -= quantidade
+            if self._pendentes <= 0:
+                self._condicao_pendentes.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Espera a entrega de todas as notificações já publicadas
+
+        Returns:
+            bool: False se o timeout expirou antes
+        """
+        with self._condicao_pendentes:
+            entregue = self._condicao_pendentes.wait_for(lambda: self._pendentes <= 0, timeout)
+        self.notifications_log.flush()
+        return entregue
+
+    def get_log(self, destinatario=None, inicio=None, fim=None, limite=None, offset=0,
+                incluir_arquivo=False):
+        """
+        Retorna o log de notificações (ver LogNotificacoes.consultar)
+
+        Sem argumentos retorna as notificações recentes mantidas em memória.
+        """
+        return self.notifications_log.consultar(
+            destinatario=destinatario, inicio=inicio, fim=fim,
+            limite=limite, offset=offset, incluir_arquivo=incluir_arquivo
+        )
+
+def _na_fila_por_canal(simulador):
+    na_fila = {canal: len(buffer) for canal, buffer in simulador.canais.items()}
+    for assinatura in list(simulador._assinaturas.values()):
+        if assinatura.buffer is not None:
+            na_fila[assinatura.protocolo] = na_fila.get(assinatura.protocolo, 0) + len(assinatura.buffer)
+    return na_fila
+
+# Instância global do SNS, criada no primeiro uso (obter_notificador)
+_notificador = None
+resumo_barbeiros = None
+_lock_notificador = threading.Lock()
+
+# Tópico dos eventos de agendamento (mesmo ARN devolvido por create_topic)
+TOPICO_AGENDAMENTOS = f"{ARN_PREFIXO}:agendamentos"
+
+def obter_notificador():
+    """
+    SNS global com o tópico de agendamentos e as assinaturas padrão
+
+    As assinaturas entregam as mensagens de e-mail e SMS aos destinatários
+    (atributo canal). Com o resumo ligado, as mensagens do barbeiro passam
+    pelo agregador e as do cliente continuam saindo na hora
+    """
+    global _notificador, resumo_barbeiros
+    if _notificador is not None:
+        return _notificador
+    with _lock_notificador:
+        if _notificador is not None:
+            return _notificador
+        notificador = SNSSimulator()
+        notificador.create_topic('agendamentos')
+        if RESUMO_JANELA > 0:
+            resumo_barbeiros = AgregadorNotificacoes(notificador.publish, resumo_barbeiro)
+            for canal in ('email', 'sms'):
+                notificador.subscribe(TOPICO_AGENDAMENTOS, canal,
+                                      filter_policy={'canal': [canal], 'publico': ['cliente']})
+            notificador.subscribe(TOPICO_AGENDAMENTOS, 'sqs', resumo_barbeiros,
+                                  filter_policy={'publico': ['barbeiro']})
+        else:
+            notificador.subscribe(TOPICO_AGENDAMENTOS, 'email', filter_policy={'canal': ['email']})
+            notificador.subscribe(TOPICO_AGENDAMENTOS, 'sms', filter_policy={'canal': ['sms']})
+        _notificador = notificador
+    return _notificador
+
+def __getattr__(nome):
+    # `from sns.sns_simulator import sns_notifier` continua funcionando (cria o SNS)
+    if nome == 'sns_notifier':
+        return obter_notificador()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+def encerrar(timeout=5):
+    """Entrega o que foi publicado, publica os resumos pendentes e entrega os resumos"""
+    if _notificador is None:
+        return
+    _notificador.flush(timeout=timeout)
+    if resumo_barbeiros is not None:
+        resumo_barbeiros.flush()
+        _notificador.flush(timeout=timeout)
 
+registro.medidor(
+    'sns_resumo_pendentes', 'Notificações aguardando o resumo do barbeiro',
+    funcao=lambda: len(resumo_barbeiros) if resumo_barbeiros is not None else 0
+)
+registro.medidor(
+    'sns_notificacoes_na_fila', 'Notificações aguardando entrega por canal', rotulos=('canal',),
+    funcao=lambda: _na_fila_por_canal(_notificador) if _notificador is not None else {}
+)
@@ -0,0 +1,235 @@
+"""
+Templates das notificações, compilados uma única vez na importação
+Cada template é um texto com campos {nome}. Compilar valida os campos e gera
+uma função com uma f-string equivalente, então renderizar não interpreta o
+texto de novo (como str.format faria a cada chamada)
+
+Variantes por idioma ficam em TEMPLATES[locale]; um template que não
+existe no idioma pedido usa o do LOCALE_PADRAO
+"""
+from string import Formatter
+import json
+import keyword
+import os
+
+LOCALE_PADRAO = os.environ.get('NOTIFICACAO_LOCALE', 'pt_BR')
+
+# Contatos dos barbeiros: {"Carlos": {"email": "...", "celular": "...", "locale": "pt_BR"}}
+BARBEIROS_PATH = os.environ.get('BARBEIROS_PATH', 'sns/barbeiros.json')
+
+# Domínio do e-mail dos barbeiros que não estão no arquivo de contatos
+DOMINIO_BARBEARIA = 'barbearia.com'
+
+TEMPLATES = {
+    'pt_BR': {
+        'cliente_email_assunto': 'Agendamento Confirmado - Barbearia',
+        'cliente_email': """Olá {cliente_nome},
+
+Seu agendamento foi confirmado com sucesso!
+
+Detalhes:
+- Barbeiro: {barbeiro}
+- Data: {data}
+- Horário: {horario}
+
+Aguardamos você!""",
+        'cliente_sms': 'Agendamento confirmado! Barbeiro: {barbeiro}, Data: {data}, Horário: {horario}',
+        'barbeiro_email_assunto': 'Novo Agendamento - Barbearia',
+        'barbeiro_email': """Olá {barbeiro},
+
+Você tem um novo agendamento!
+
+Detalhes:
+- Cliente: {cliente_nome}
+- Email: {cliente_email}
+- Celular: {cliente_celular}
+- Data: {data}
+- Horário: {horario}""",
+        'barbeiro_sms': 'Novo agendamento: {cliente_nome}, {data} às {horario}',
+        'barbeiro_resumo_assunto': '{quantidade} novos agendamentos - Barbearia',
+        'barbeiro_resumo_email': """Olá {barbeiro},
+
+Você tem {quantidade} novos agendamentos!
+
+{itens}""",
+        'barbeiro_resumo_item': '- {data} às {horario}: {cliente_nome} ({cliente_email}, {cliente_celular})',
+        'barbeiro_resumo_sms': 'Você tem {quantidade} novos agendamentos. Detalhes no seu e-mail.',
+    },
+    'en_US': {
+        'cliente_email_assunto': 'Appointment Confirmed - Barbershop',
+        'cliente_email': """Hello {cliente_nome},
+
+Your appointment has been confirmed!
+
+Details:
+- Barber: {barbeiro}
+- Date: {data}
+- Time: {horario}
+
+See you soon!""",
+        'cliente_sms': 'Appointment confirmed! Barber: {barbeiro}, Date: {data}, Time: {horario}',
+        'barbeiro_email_assunto': 'New Appointment - Barbershop',
+        'barbeiro_email': """Hello {barbeiro},
+
+You have a new appointment!
+
+Details:
+- Client: {cliente_nome}
+- Email: {cliente_email}
+- Phone: {cliente_celular}
+- Date: {data}
+- Time: {horario}""",
+        'barbeiro_sms': 'New appointment: {cliente_nome}, {data} at {horario}',
+        'barbeiro_resumo_assunto': '{quantidade} new appointments - Barbershop',
+        'barbeiro_resumo_email': """Hello {barbeiro},
+
+You have {quantidade} new appointments!
+
+{itens}""",
+        'barbeiro_resumo_item': '- {data} at {horario}: {cliente_nome} ({cliente_email}, {cliente_celular})',
+        'barbeiro_resumo_sms': 'You have {quantidade} new appointments. Details in your e-mail.',
+    },
+    'es': {
+        'cliente_email_assunto': 'Cita Confirmada - Barbería',
+        'cliente_email': """Hola {cliente_nome},
+
+¡Tu cita ha sido confirmada!
+
+Detalles:
+- Barbero: {barbeiro}
+- Fecha: {data}
+- Hora: {horario}
+
+¡Te esperamos!""",
+        'cliente_sms': '¡Cita confirmada! Barbero: {barbeiro}, Fecha: {data}, Hora: {horario}',
+    },
+}
+
+
+class _Contexto(dict):
+    """Campo ausente no agendamento vira texto vazio em vez de KeyError"""
+
+    def __missing__(self, chave):
+        return ''
+
+
+class TemplateCompilado:
+    """Template com os campos já validados, pronto para renderizar"""
+
+    __slots__ = ('nome', 'locale', 'campos', '_formatar')
+
+    def __init__(self, nome, locale, texto):
+        self.nome = nome
+        self.locale = locale
+        partes = []
+        campos = []
+        for literal, campo, especificacao, conversao in Formatter().parse(texto):
+            partes.append(literal.replace('{', '{{').replace('}', '}}'))
+            if campo is None:
+                continue
+            if (not campo.isidentifier() or keyword.iskeyword(campo) or campo.startswith('_')
+                    or especificacao or conversao):
+                raise ValueError(f"Template {locale}/{nome}: campo inválido {{{campo}}}")
+            campos.append(campo)
+            partes.append('{' + campo + '}')
+        self.campos = tuple(dict.fromkeys(campos))
+
+        # def _renderizar(_contexto):
+        #     cliente_nome = _contexto['cliente_nome']
+        #     return f'Olá {cliente_nome}...'
+        leituras = ''.join(f'    {campo} = _contexto[{campo!r}]\n' for campo in self.campos)
+        codigo = f"def _renderizar(_contexto):\n{leituras}    return f{''.join(partes)!r}\n"
+        namespace = {}
+        exec(compile(codigo, f'<template {locale}/{nome}>', 'exec'), namespace)
+        self._formatar = namespace['_renderizar']
+
+    def renderizar(self, contexto):
+        """Texto do template para um dict de campos"""
+        try:
+            return self._formatar(contexto)
+        except KeyError:
+            return self._formatar(_Contexto(contexto))
+
+    def renderizar_lote(self, contextos):
+        """Textos do template para vários dicts de campos, na mesma ordem"""
+        return [self.renderizar(contexto) for contexto in contextos]
+
+
+class CatalogoTemplates:
+    """Templates compilados por (locale, nome), com fallback para o locale padrão"""
+
+    def __init__(self, templates=None, locale_padrao=LOCALE_PADRAO):
+        templates = TEMPLATES if templates is None else templates
+        if locale_padrao not in templates:
+            raise ValueError(f"Locale padrão {locale_padrao} sem templates")
+        self.locale_padrao = locale_padrao
+        padrao = templates[locale_padrao]
+        # Cada locale já inclui os templates do padrão que ele não traduz
+        self._templates = {
+            locale: {
+                nome: TemplateCompilado(nome, locale if nome in textos else locale_padrao,
+                                        textos.get(nome, texto_padrao))
+                for nome, texto_padrao in padrao.items()
+            }
+            for locale, textos in templates.items()
+        }
+
+    @property
+    def locales(self):
+        return tuple(self._templates)
+
+    def obter(self, nome, locale=None):
+        """Template compilado; locale desconhecido ou vazio usa o padrão"""
+        templates = self._templates.get(locale) or self._templates[self.locale_padrao]
+        return templates[nome]
+
+    def renderizar(self, nome, contexto, locale=None):
+        return self.obter(nome, locale).renderizar(contexto)
+
+
+class DiretorioBarbeiros:
+    """
+    Contato (email, celular e locale) de cada barbeiro
+
+    Lido uma vez do arquivo de contatos; barbeiros que não estão no
+    arquivo recebem um e-mail derivado do nome. Esse contato não é
+    guardado: o nome vem do pedido, e guardá-lo faria o diretório
+    crescer sem limite com nomes arbitrários.
+    """
+
+    def __init__(self, caminho=BARBEIROS_PATH, locale_padrao=LOCALE_PADRAO):
+        self.locale_padrao = locale_padrao
+        self._contatos = {}
+        if caminho and os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                for barbeiro, contato in json.load(arquivo).items():
+                    self.registrar(barbeiro, **contato)
+
+    def registrar(self, barbeiro, email=None, celular=None, locale=None):
+        self._contatos[barbeiro] = {
+            'email': email or self._email_derivado(barbeiro),
+            'celular': celular,
+            'locale': locale or self.locale_padrao
+        }
+
+    @staticmethod
+    def _email_derivado(barbeiro):
+        return f"{barbeiro.lower().replace(' ', '')}@{DOMINIO_BARBEARIA}"
+
+    def contato(self, barbeiro):
+        contato = self._contatos.get(barbeiro)
+        if contato is None:
+            return {
+                'email': self._email_derivado(barbeiro),
+                'celular': None,
+                'locale': self.locale_padrao
+            }
+        return contato
+
+    def __len__(self):
+        return len(self._contatos)
+
+
+# Compilados na importação: um template com erro falha ao subir a aplicação
+catalogo = CatalogoTemplates()
+diretorio_barbeiros = DiretorioBarbeiros()
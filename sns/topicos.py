@@ -0,0 +1,129 @@
+"""
+Tópicos, assinaturas e políticas de filtro do simulador SNS
+Uma mensagem publicada em um tópico é entregue a cada assinatura cuja
+política de filtro aceita os atributos da mensagem
+"""
+import uuid
+
+# Protocolos aceitos em subscribe
+PROTOCOLOS = ('email', 'sms', 'http', 'sqs')
+
+ARN_PREFIXO = 'arn:aws:sns:local:000000000000'
+
+
+def compilar_politica(politica):
+    """
+    Converte uma política de filtro em uma função atributos -> bool
+
+    Mesmo formato das filter policies do SNS (subconjunto):
+
+        {"canal": ["email", "sms"],                 # um dos valores
+         "barbeiro": [{"anything-but": ["Carlos"]}], # qualquer valor exceto
+         "locale": [{"prefix": "pt"}],               # começa com
+         "publico": [{"exists": true}]}              # atributo presente (ou ausente)
+
+    Todas as chaves precisam ser atendidas; dentro de uma chave, basta uma
+    das condições. Sem política, todas as mensagens são aceitas.
+    """
+    if not politica:
+        return lambda atributos: True
+
+    condicoes = []
+    for atributo, regras in politica.items():
+        if not isinstance(regras, list):
+            regras = [regras]
+        valores = set()
+        testes = []
+        existe = None
+        for regra in regras:
+            if not isinstance(regra, dict):
+                valores.add(regra)
+                continue
+            if len(regra) != 1:
+                raise ValueError(f"Regra inválida para {atributo}: {regra}")
+            operador, argumento = next(iter(regra.items()))
+            if operador == 'exists':
+                existe = bool(argumento)
+            elif operador == 'prefix':
+                testes.append(lambda valor, prefixo=argumento: isinstance(valor, str) and valor.startswith(prefixo))
+            elif operador == 'anything-but':
+                excluidos = frozenset(argumento if isinstance(argumento, list) else [argumento])
+                testes.append(lambda valor, excluidos=excluidos: valor not in excluidos)
+            else:
+                raise ValueError(f"Operador de filtro não suportado: {operador}")
+        condicoes.append((atributo, frozenset(valores), tuple(testes), existe))
+
+    def aceita(atributos):
+        for atributo, valores, testes, existe in condicoes:
+            if atributo not in atributos:
+                if existe is False:
+                    continue
+                return False
+            valor = atributos[atributo]
+            if valor in valores or any(teste(valor) for teste in testes) or existe is True:
+                continue
+            return False
+        return True
+
+    return aceita
+
+
+class Assinatura:
+    """
+    Assinatura de um tópico
+
+    endpoint depende do protocolo:
+        email/sms - endereço ou telefone fixo; None entrega ao
+                    `destinatario` de cada mensagem
+        http      - função chamada com a notificação (substitui o POST do
+                    webhook) ou URL, apenas registrada no log
+        sqs       - fila com send_message (ex: SQSSimulator) ou put
+                    (ex: BufferBloqueante)
+    """
+
+    __slots__ = ('arn', 'topico_arn', 'protocolo', 'endpoint', 'politica', '_aceita', 'buffer')
+
+    def __init__(self, topico_arn, protocolo, endpoint=None, politica=None):
+        if protocolo not in PROTOCOLOS:
+            raise ValueError(f"Protocolo inválido: {protocolo} (use {', '.join(PROTOCOLOS)})")
+        self.arn = f"{topico_arn}:{uuid.uuid4()}"
+        self.topico_arn = topico_arn
+        self.protocolo = protocolo
+        self.endpoint = endpoint
+        self.politica = politica
+        self._aceita = compilar_politica(politica)
+        # Buffer de entrega próprio (http e sqs); email e sms usam o do canal
+        self.buffer = None
+
+    def aceita(self, atributos):
+        return self._aceita(atributos)
+
+    def para_dict(self):
+        endpoint = self.endpoint
+        if endpoint is not None and not isinstance(endpoint, str):
+            endpoint = repr(endpoint)
+        return {
+            'SubscriptionArn': self.arn,
+            'TopicArn': self.topico_arn,
+            'Protocol': self.protocolo,
+            'Endpoint': endpoint,
+            'FilterPolicy': self.politica
+        }
+
+
+class Topico:
+    """Tópico com a lista de assinaturas (substituída, nunca alterada, para leitura sem lock)"""
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.arn = f"{ARN_PREFIXO}:{nome}"
+        self.assinaturas = ()
+
+    def adicionar(self, assinatura):
+        self.assinaturas = self.assinaturas + (assinatura,)
+
+    def remover(self, assinatura_arn):
+        restantes = tuple(a for a in self.assinaturas if a.arn != assinatura_arn)
+        removida = len(restantes) != len(self.assinaturas)
+        self.assinaturas = restantes
+        return removida
@@ -0,0 +1,24 @@
+"""
+Fixtures compartilhadas pelos testes
+Execute na raiz do projeto: python -m pytest
+"""
+import pytest
+
+
+@pytest.fixture(scope='session')
+def banco(tmp_path_factory):
+    """
+    db_manager (TinyDB) aberto em um diretório temporário
+
+    O db_manager abre as tabelas uma única vez por processo, então o banco é
+    compartilhado pelos testes: cada teste usa barbeiros/datas próprios.
+    """
+    from database import db_manager
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(db_manager, 'DB_BACKEND', 'tinydb')
+        monkeypatch.setattr(db_manager, 'DATA_DIR', str(tmp_path_factory.mktemp('data')))
+        monkeypatch.setattr(db_manager, 'ARQUIVAMENTO_INTERVALO', 0)
+        db_manager.iniciar()
+        yield db_manager
+        db_manager.close()
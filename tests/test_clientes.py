@@ -0,0 +1,25 @@
+"""
+Cadastro de clientes: create_cliente e create_clientes_lote só retornam
+depois que os clientes estão no disco
+"""
+import json
+import os
+
+
+def _emails_no_disco(banco):
+    with open(os.path.join(banco.DATA_DIR, 'tabela_cliente.json'), encoding='utf-8') as arquivo:
+        return {cliente['email'] for cliente in json.load(arquivo).get('_default', {}).values()}
+
+
+def test_cliente_criado_ja_esta_no_disco(banco):
+    assert banco.create_cliente('Duda', 'Teste', 'duda.disco@teste.com', '11955556666')
+    assert 'duda.disco@teste.com' in _emails_no_disco(banco)
+
+
+def test_lote_de_clientes_criado_ja_esta_no_disco(banco):
+    ids = banco.create_clientes_lote([
+        {'nome': 'Eva', 'sobrenome': 'Teste', 'email': 'eva.disco@teste.com', 'celular': '11977778888'},
+        {'nome': 'Caio', 'sobrenome': 'Teste', 'email': 'caio.disco@teste.com', 'celular': '11999990000'}
+    ])
+    assert None not in ids
+    assert {'eva.disco@teste.com', 'caio.disco@teste.com'} <= _emails_no_disco(banco)
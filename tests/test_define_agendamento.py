@@ -0,0 +1,42 @@
+"""
+DefineAgendamento: a chave de idempotência é do cliente e do pedido
+"""
+from lambdas import define_agendamento
+from fila.sqs_simulator import obter_fila
+import pytest
+
+
+@pytest.fixture
+def clientes(banco):
+    for nome, email, celular in (('Ana', 'ana@teste.com', '11911112222'), ('Bruno', 'bruno@teste.com', '11933334444')):
+        if not banco.get_cliente_by_email(email):
+            banco.create_cliente(nome, 'Teste', email, celular)
+    return banco
+
+
+def _pedido(cliente_email, chave, horario='10:00'):
+    return {'cliente_email': cliente_email, 'barbeiro': 'Idempotente', 'data': '2031-04-01',
+            'horario': horario, 'idempotency_key': chave}
+
+
+def test_chave_repetida_por_outro_cliente_nao_devolve_a_resposta_do_primeiro(clientes):
+    enviadas = len(obter_fila())
+    primeira = define_agendamento.handler(_pedido('ana@teste.com', 'chave-compartilhada'))
+    segunda = define_agendamento.handler(_pedido('bruno@teste.com', 'chave-compartilhada', '11:00'))
+
+    assert primeira['statusCode'] == 200
+    assert segunda['statusCode'] == 200
+    assert 'duplicado' not in segunda['body']
+    assert segunda['body']['agendamento']['cliente_email'] == 'bruno@teste.com'
+    assert len(obter_fila()) == enviadas + 2
+
+
+def test_mesma_chave_com_outro_pedido_retorna_422(clientes):
+    primeira = define_agendamento.handler(_pedido('ana@teste.com', 'chave-reutilizada', '12:00'))
+    repetida = define_agendamento.handler(_pedido('ana@teste.com', 'chave-reutilizada', '12:00'))
+    alterada = define_agendamento.handler(_pedido('ana@teste.com', 'chave-reutilizada', '12:30'))
+
+    assert primeira['statusCode'] == 200
+    assert repetida['statusCode'] == 200 and repetida['body']['duplicado'] is True
+    assert repetida['body']['agendamento'] == primeira['body']['agendamento']
+    assert alterada['statusCode'] == 422
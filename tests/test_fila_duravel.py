@@ -0,0 +1,134 @@
+"""
+Fila durável: mensagens que falham max_receive_count vezes vão para a DLQ, e
+uma mensagem reentregue depois da reserva confirma o mesmo agendamento
+"""
+from fila.fila_duravel import DurableSQSSimulator
+import json
+import threading
+import time
+
+MAX_RECEBIMENTOS = 3
+
+
+def _fila(tmp_path):
+    return DurableSQSSimulator(str(tmp_path / 'fila.db'), visibility_timeout=0.05,
+                               max_receive_count=MAX_RECEBIMENTOS, wait_time_seconds=0.2)
+
+
+def test_mensagem_sem_confirmacao_vai_para_a_dlq(tmp_path):
+    fila = _fila(tmp_path)
+    fila.send_message(json.dumps({'id': 1}), message_group_id='Carlos')
+
+    for tentativa in range(1, MAX_RECEBIMENTOS + 1):
+        mensagem = fila.receive_message(wait_time_seconds=1)
+        assert mensagem['Attributes']['ApproximateReceiveCount'] == tentativa
+
+    # O recebimento seguinte move a mensagem em vez de entregá-la de novo
+    assert fila.receive_message(wait_time_seconds=0.2) is None
+    dlq = fila.listar_dlq()
+    assert [(json.loads(item['Body']), item['ReceiveCount']) for item in dlq] == [({'id': 1}, MAX_RECEBIMENTOS)]
+    assert len(fila) == 0
+
+
+def test_processador_manda_para_a_dlq_so_a_mensagem_que_falha(tmp_path):
+    fila = _fila(tmp_path)
+    tentativas = {}
+    lock = threading.Lock()
+
+    def callback_lote(corpos):
+        falhas = []
+        with lock:
+            for posicao, corpo in enumerate(corpos):
+                mensagem = json.loads(corpo)
+                tentativas[mensagem['id']] = tentativas.get(mensagem['id'], 0) + 1
+                if mensagem['falha']:
+                    falhas.append(posicao)
+        return falhas
+
+    fila.send_message_batch([
+        {'Id': str(numero), 'MessageBody': json.dumps({'id': numero, 'falha': numero == 2})}
+        for numero in range(1, 4)
+    ])
+    fila.start_processor(None, callback_lote)
+    try:
+        # Espera a mensagem com falha esgotar as tentativas
+        for _ in range(100):
+            if fila.listar_dlq():
+                break
+            time.sleep(0.05)
+    finally:
+        fila.stop_processor()
+
+    assert [json.loads(item['Body'])['id'] for item in fila.listar_dlq()] == [2]
+    assert tentativas == {1: 1, 2: MAX_RECEBIMENTOS, 3: 1}
+    assert len(fila) == 0
+
+
+def _esperar(condicao, tentativas=100):
+    for _ in range(tentativas):
+        if condicao():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_reentrega_depois_da_reserva_confirma_o_mesmo_agendamento(tmp_path, banco):
+    from lambdas import valida_agendamento
+
+    fila = _fila(tmp_path)
+    respostas = []
+
+    def callback(corpo):
+        resposta = valida_agendamento.handler(corpo)
+        respostas.append(resposta)
+        if len(respostas) == 1:
+            # Queda depois de reservar, antes de confirmar a mensagem
+            raise RuntimeError('queda')
+
+    fila.send_message(json.dumps({'cliente_email': 'reentrega@teste.com', 'barbeiro': 'Reentrega',
+                                  'data': '2031-08-01', 'horario': '09:00'}))
+    fila.start_processor(callback)
+    try:
+        assert _esperar(lambda: len(respostas) == 2 and len(fila) == 0)
+    finally:
+        fila.stop_processor()
+
+    assert [resposta['statusCode'] for resposta in respostas] == [200, 200]
+    assert respostas[1]['body']['agendamento_id'] == respostas[0]['body']['agendamento_id']
+    assert len(banco.get_agendamentos_by_barbeiro_data('Reentrega', '2031-08-01')) == 1
+    assert fila.listar_dlq() == []
+
+
+def test_reentrega_de_lote_confirma_so_os_horarios_do_proprio_cliente(tmp_path, banco):
+    from lambdas import valida_agendamento
+
+    fila = _fila(tmp_path)
+    respostas = []
+
+    def callback_lote(corpos):
+        respostas.append(valida_agendamento.handler_lote(corpos))
+        if len(respostas) == 1:
+            raise RuntimeError('queda')
+
+    pedidos = [
+        ('lote@teste.com', '09:00'),
+        ('lote@teste.com', '10:00'),
+        # Mesmo horário de outro cliente no mesmo lote: continua em conflito
+        ('outro@teste.com', '10:00'),
+    ]
+    fila.send_message_batch([
+        {'Id': str(posicao), 'MessageBody': json.dumps({'cliente_email': email, 'barbeiro': 'Reentrega',
+                                                         'data': '2031-08-02', 'horario': horario})}
+        for posicao, (email, horario) in enumerate(pedidos)
+    ])
+    fila.start_processor(None, callback_lote)
+    try:
+        assert _esperar(lambda: len(respostas) == 2 and len(fila) == 0)
+    finally:
+        fila.stop_processor()
+
+    primeira, segunda = ([resposta['statusCode'] for resposta in lote] for lote in respostas)
+    assert primeira == segunda == [200, 200, 409]
+    assert [resposta['body']['agendamento_id'] for resposta in respostas[1][:2]] == \
+        [resposta['body']['agendamento_id'] for resposta in respostas[0][:2]]
+    assert len(banco.get_agendamentos_by_barbeiro_data('Reentrega', '2031-08-02')) == 2
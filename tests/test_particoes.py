@@ -0,0 +1,146 @@
+"""
+Partições mensais de agendamentos: arquivamento, consulta sem reabrir o mês,
+reabertura e recuperação depois de uma queda no meio do arquivamento
+"""
+from database.particoes import TabelaParticionada
+from datetime import date
+import os
+import pytest
+
+
+def _agendamento(numero, mes='2030-01', barbeiro='Carlos'):
+    return {'cliente_email': f'cliente{numero % 5}@teste.com', 'barbeiro': barbeiro,
+            'data': f'{mes}-{1 + numero % 28:02d}', 'horario': f'{8 + numero % 10:02d}:00'}
+
+
+def _arquivos(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome != 'manifesto.json')
+
+
+def _conteudo(tabela):
+    return [(documento.doc_id, dict(documento)) for documento in tabela.todos()]
+
+
+@pytest.fixture
+def tabela(tmp_path):
+    tabela = TabelaParticionada(str(tmp_path / 'agendamentos'))
+    tabela.inserir([_agendamento(numero) for numero in range(40)])
+    tabela.inserir([_agendamento(numero, mes='2030-02') for numero in range(40, 60)])
+    tabela.sincronizar(['2030-01', '2030-02'])
+    yield tabela
+    tabela.close()
+
+
+def test_reserva_recusada_nao_reabre_o_mes_arquivado(banco):
+    diretorio = os.path.join(banco.DATA_DIR, 'agendamentos')
+    assert banco.reserve_slot('arquivo@teste.com', 'Arquivado', '2020-01-10', '09:00') is not None
+    assert banco.arquivar_meses_passados(hoje=date(2020, 2, 1)) == ['2020-01']
+    assert '2020-01.jsonl.gz' in os.listdir(diretorio)
+
+    # Leitura e reservas recusadas usam o gzip sem reabrir o mês
+    assert [a['horario'] for a in banco.get_agendamentos_by_barbeiro_data('Arquivado', '2020-01-10')] == ['09:00']
+    assert banco.reserve_slot('outro@teste.com', 'Arquivado', '2020-01-10', '09:00') is None
+    assert banco.reservar_slots_lote([{'cliente_email': 'outro@teste.com', 'barbeiro': 'Arquivado',
+                                       'data': '2020-01-10', 'horario': '09:00'}]) == [None]
+    assert banco.db_agendamentos.arquivada('2020-01')
+    assert '2020-01.jsonl.gz' in os.listdir(diretorio)
+    assert '2020-01.jsonl' not in os.listdir(diretorio)
+
+    # Uma reserva aceita reabre o mês
+    assert banco.reserve_slot('outro@teste.com', 'Arquivado', '2020-01-10', '10:00') is not None
+    assert not banco.db_agendamentos.arquivada('2020-01')
+    assert '2020-01.jsonl' in os.listdir(diretorio)
+    assert [a['horario'] for a in banco.get_agendamentos_by_barbeiro_data('Arquivado', '2020-01-10')] == ['09:00', '10:00']
+    banco.arquivar_meses_passados(hoje=date(2020, 2, 1))
+
+
+def test_arquivar_e_reabrir_preservam_os_documentos(tabela):
+    esperado = _conteudo(tabela)
+    assert tabela.arquivar('2030-01') == 40
+    assert _arquivos(tabela.diretorio) == ['2030-01.jsonl.gz', '2030-02.jsonl']
+    assert _conteudo(tabela) == esperado
+
+    assert tabela.reabrir('2030-01')
+    assert _arquivos(tabela.diretorio) == ['2030-01.jsonl', '2030-02.jsonl']
+    assert _conteudo(tabela) == esperado
+
+
+def test_manifesto_pula_meses_que_nao_podem_ter_resultados(tabela):
+    tabela.inserir([_agendamento(numero, mes='2030-03', barbeiro='Joao') for numero in range(60, 70)])
+    for mes in ('2030-01', '2030-02', '2030-03'):
+        tabela.arquivar(mes)
+
+    assert tabela.meses_arquivados() == ['2030-01', '2030-02', '2030-03']
+    assert tabela.meses_arquivados(barbeiro='Joao') == ['2030-03']
+    assert tabela.meses_arquivados(data_inicio='2030-02-01', data_fim='2030-02-28') == ['2030-02']
+    assert tabela.meses_arquivados(cliente_email='ninguem@teste.com') == []
+    # Meses inteiros antes do cursor ficam de fora
+    assert tabela.meses_arquivados(cursor=40) == ['2030-02', '2030-03']
+    assert [documento.doc_id for documento in tabela.iterar_arquivadas(['2030-02', '2030-03'], cursor=55)] == \
+        list(range(56, 71))
+
+
+def test_queda_antes_de_registrar_o_arquivamento_mantem_o_log(tabela, monkeypatch):
+    esperado = _conteudo(tabela)
+
+    def queda():
+        raise OSError('queda')
+
+    monkeypatch.setattr(tabela, '_gravar_manifesto', queda)
+    with pytest.raises(OSError):
+        tabela.arquivar('2030-01')
+    assert '2030-01.jsonl.gz' in _arquivos(tabela.diretorio)
+
+    reaberta = TabelaParticionada(tabela.diretorio)
+    try:
+        # O gzip não registrado no manifesto é descartado; vale o log
+        assert _arquivos(tabela.diretorio) == ['2030-01.jsonl', '2030-02.jsonl']
+        assert not reaberta.arquivada('2030-01')
+        assert _conteudo(reaberta) == esperado
+    finally:
+        reaberta.close()
+
+
+def test_queda_depois_de_registrar_o_arquivamento_mantem_o_gzip(tabela, monkeypatch):
+    esperado = _conteudo(tabela)
+    remove = os.remove
+
+    def queda(caminho):
+        if caminho.endswith('2030-01.jsonl'):
+            raise OSError('queda')
+        remove(caminho)
+
+    monkeypatch.setattr(os, 'remove', queda)
+    with pytest.raises(OSError):
+        tabela.arquivar('2030-01')
+    monkeypatch.setattr(os, 'remove', remove)
+    assert _arquivos(tabela.diretorio) == ['2030-01.jsonl', '2030-01.jsonl.gz', '2030-02.jsonl']
+
+    reaberta = TabelaParticionada(tabela.diretorio)
+    try:
+        # O manifesto já registra o mês: vale o gzip e o log que sobrou é descartado
+        assert _arquivos(tabela.diretorio) == ['2030-01.jsonl.gz', '2030-02.jsonl']
+        assert reaberta.arquivada('2030-01')
+        assert _conteudo(reaberta) == esperado
+    finally:
+        reaberta.close()
+
+
+def test_queda_no_meio_da_reabertura_mantem_o_gzip(tabela, monkeypatch):
+    esperado = _conteudo(tabela)
+    tabela.arquivar('2030-01')
+
+    def queda():
+        raise OSError('queda')
+
+    monkeypatch.setattr(tabela, '_gravar_manifesto', queda)
+    with pytest.raises(OSError):
+        tabela.reabrir('2030-01')
+    assert _arquivos(tabela.diretorio) == ['2030-01.jsonl', '2030-01.jsonl.gz', '2030-02.jsonl']
+
+    reaberta = TabelaParticionada(tabela.diretorio)
+    try:
+        assert _arquivos(tabela.diretorio) == ['2030-01.jsonl.gz', '2030-02.jsonl']
+        assert _conteudo(reaberta) == esperado
+    finally:
+        reaberta.close()
@@ -0,0 +1,52 @@
+"""
+Log de notificações do SNS: os registros antigos vão para segmentos no
+diretório configurado, com os dados pessoais mascarados, e cada processo
+rotaciona só os seus segmentos
+"""
+from sns.registro import LogNotificacoes, RegistroNotificacao
+import gzip
+import os
+
+
+def _mensagem(numero):
+    return {'tipo': 'email', 'destinatario': f'cliente{numero}@teste.com', 'assunto': 'Agendamento confirmado',
+            'corpo': f'Olá Mariana Souza, seu horário está confirmado. Dúvidas: 11988887{numero % 1000:03d}',
+            'agendamento': {'cliente_nome': 'Mariana Souza'}}
+
+
+def _preencher(log, quantidade):
+    for numero in range(quantidade):
+        log.adicionar(RegistroNotificacao.de_mensagem(1700000000 + numero, _mensagem(numero)))
+    assert log.flush(timeout=5)
+
+
+def test_transbordo_vai_para_o_diretorio_mascarado(tmp_path):
+    log = LogNotificacoes(capacidade=5, diretorio=str(tmp_path), tamanho_bloco=2, mascarar_pii=True)
+    _preencher(log, 9)
+
+    segmentos = os.listdir(tmp_path)
+    assert segmentos and all(nome.startswith(f'notificacoes-{os.getpid()}-') for nome in segmentos)
+    with gzip.open(os.path.join(tmp_path, segmentos[0]), 'rt', encoding='utf-8') as arquivo:
+        conteudo = arquivo.read()
+    assert '@teste.com' in conteudo
+    assert 'cliente0@' not in conteudo and 'Mariana' not in conteudo and 'Souza' not in conteudo
+    assert '11988887000' not in conteudo
+
+    # Em memória os registros recentes continuam completos; a busca pelo destinatário
+    # encontra só os registros dele entre os mascarados no disco
+    assert log.consultar(destinatario='cliente8@teste.com')[0]['message']['corpo'].startswith('Olá Mariana')
+    arquivados = log.consultar(destinatario='cliente1@teste.com', incluir_arquivo=True)
+    assert [entrada['message']['destinatario'] for entrada in arquivados] == ['c***@teste.com']
+    assert len(log.consultar(incluir_arquivo=True)) == 9
+
+
+def test_rotacao_nao_apaga_segmentos_de_outro_processo(tmp_path):
+    outro = tmp_path / 'notificacoes-1-1600000000.000000-000000.jsonl.gz'
+    outro.write_bytes(b'')
+    log = LogNotificacoes(capacidade=1, diretorio=str(tmp_path), registros_por_segmento=1,
+                          max_segmentos=2, tamanho_bloco=1)
+    _preencher(log, 6)
+
+    assert outro.exists()
+    assert len(os.listdir(tmp_path)) == 3
+    assert len(log.consultar(incluir_arquivo=True)) == 3
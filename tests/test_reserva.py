@@ -0,0 +1,108 @@
+"""
+Reserva atômica de horários (reserve_slot): reservas concorrentes do mesmo
+horário confirmam exatamente uma, e reservas de horários diferentes não
+esperam umas pelas outras
+"""
+from database.sqlite_backend import SQLiteBackend
+import os
+import threading
+
+RODADAS = 50
+
+
+def _disputar(reservar, barbeiro, data, horario):
+    """Duas threads reservam o mesmo horário ao mesmo tempo; retorna os dois resultados"""
+    largada = threading.Barrier(2)
+    resultados = [None, None]
+
+    def reservar_na_largada(posicao):
+        largada.wait()
+        resultados[posicao] = reservar(f'cliente{posicao}@teste.com', barbeiro, data, horario)
+
+    threads = [threading.Thread(target=reservar_na_largada, args=(posicao,)) for posicao in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def test_reserva_concorrente_confirma_uma_tinydb(banco):
+    for rodada in range(RODADAS):
+        horario = f'{9 + rodada // 10:02d}:{30 * (rodada % 2):02d}'
+        data = f'2031-01-{1 + rodada % 10:02d}'
+        resultados = _disputar(banco.reserve_slot, 'Concorrente', data, horario)
+
+        assert sum(resultado is not None for resultado in resultados) == 1
+        assert len(banco.get_agendamentos_by_barbeiro_data('Concorrente', data)) == 1 + rodada // 10
+
+
+def test_reserva_concorrente_confirma_uma_sqlite(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'barbearia.db'))
+    try:
+        for rodada in range(RODADAS):
+            resultados = _disputar(backend.reserve_slot, 'Concorrente', f'2031-02-{1 + rodada % 28:02d}',
+                                   f'{9 + rodada // 28:02d}:00')
+            assert sum(resultado is not None for resultado in resultados) == 1
+    finally:
+        backend.close()
+
+
+def _reservar_em_thread(banco, barbeiro, data, horario, **kwargs):
+    """Inicia a reserva em outra thread; retorna (thread, evento de término, resultado)"""
+    terminou = threading.Event()
+    resultado = []
+
+    def reservar():
+        resultado.append(banco.reserve_slot('paralelo@teste.com', barbeiro, data, horario, **kwargs))
+        terminou.set()
+
+    thread = threading.Thread(target=reservar)
+    thread.start()
+    return thread, terminou, resultado
+
+
+def test_reserva_nao_espera_a_listra_de_outro_horario(banco):
+    ocupado = ('Paralelo', '2031-06-01', '09:00')
+    # Um horário em outra listra
+    livre = next(('Paralelo', '2031-06-01', f'{hora:02d}:30') for hora in range(9, 20)
+                 if banco._listra(('Paralelo', '2031-06-01', f'{hora:02d}:30')) != banco._listra(ocupado))
+
+    with banco._segurando_listras([ocupado]):
+        thread, terminou, resultado = _reservar_em_thread(banco, *livre)
+        assert terminou.wait(5)
+        bloqueada, terminou_bloqueada, _ = _reservar_em_thread(banco, *ocupado)
+        # A reserva da mesma listra espera
+        assert not terminou_bloqueada.wait(0.2)
+    thread.join()
+    bloqueada.join()
+    assert resultado[0] is not None
+
+
+def test_reserva_nao_espera_a_gravacao_de_outra(banco, monkeypatch):
+    gravando = threading.Event()
+    liberar = threading.Event()
+    fsync = os.fsync
+
+    def fsync_lento(descritor):
+        if threading.current_thread().name == 'gravacao-lenta':
+            gravando.set()
+            liberar.wait(5)
+        fsync(descritor)
+
+    monkeypatch.setattr(os, 'fsync', fsync_lento)
+    lenta = threading.Thread(target=banco.reserve_slot, name='gravacao-lenta',
+                             args=('lento@teste.com', 'Paralelo', '2031-07-01', '09:00'))
+    lenta.start()
+    try:
+        assert gravando.wait(5)
+        # Mesmo mês, outro horário: insere enquanto a primeira reserva grava no disco
+        thread, terminou, resultado = _reservar_em_thread(banco, 'Paralelo', '2031-07-01', '10:00',
+                                                          sincronizar=False)
+        assert terminou.wait(1)
+        assert resultado[0] is not None
+    finally:
+        liberar.set()
+        lenta.join()
+    thread.join()
+    banco.sincronizar_agendamentos(['2031-07-01'])